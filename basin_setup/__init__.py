@@ -1,12 +1,5 @@
 import os
-
-from pkg_resources import DistributionNotFound, get_distribution
-
-try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
-    __version__ = 'unknown'
-
+import sys
 
 __veg_parameters__ = os.path.join(
     os.path.dirname(__file__),
@@ -19,3 +12,48 @@ __core_config__ = os.path.abspath(
     os.path.dirname(__file__) + '/CoreConfig.ini')
 __recipes__ = os.path.abspath(
     os.path.dirname(__file__) + '/recipes.ini')
+
+
+def _get_version():
+    """Version of the installed distribution, 'unknown' if basin_setup is
+    not installed
+    """
+
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # python < 3.8
+        from pkg_resources import DistributionNotFound as PackageNotFoundError
+        from pkg_resources import get_distribution
+
+        def version(name):
+            return get_distribution(name).version
+
+    try:
+        return version(__name__)
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def __getattr__(name):
+    # The version is looked up on first access, pkg_resources takes longer
+    # to import than the command line tools take to parse their arguments
+    if name == '__version__':
+        global __version__
+        __version__ = _get_version()
+        return __version__
+
+    # inicheck looks up the custom checkers module in sys.modules, import
+    # it only when the master config asks for it
+    if name == '__config_checkers__':
+        import basin_setup.utils.checkers  # noqa: F401
+        return 'utils.checkers'
+
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__ (PEP 562) is only used by python 3.7+, resolve
+    # the attributes when the package is imported instead
+    __version__ = __getattr__('__version__')
+    __config_checkers__ = __getattr__('__config_checkers__')
@@ -0,0 +1,188 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main():
+
+    p = argparse.ArgumentParser(description='Delineates a new basin for'
+                                ' SMRF/AWSM/Streamflow')
+
+    p.add_argument("-d", "--dem", dest="dem",
+                   required=True,
+                   help="Path to dem")
+    p.add_argument("-p", "--pour", dest="pour_points",
+                   required=True,
+                   help="Path to a .bna of pour points")
+    p.add_argument("-o", "--output", dest="output",
+                   required=False,
+                   help="Path to output folder")
+    p.add_argument("-t", "--threshold", dest="threshold",
+                   nargs="+", default=[100],
+                   help="List of thresholds to use for defining streams from"
+                         " the flow accumulation, default=100")
+    p.add_argument("-n", "--nthreads", dest="nthreads",
+                   required=False,
+                   help="Cores to use when processing the data")
+    p.add_argument("-re", "--rerun", dest="rerun",
+                   required=False, action='store_true',
+                   help="Boolean Flag that determines whether to run the "
+                   "script from the beginning or assume that the flow "
+                   "accumulation has been completed once")
+    p.add_argument("-db", "--debug", dest="debug",
+                   required=False, action='store_true')
+    p.add_argument('-strm', '--streamflow', dest='streamflow', required=False,
+                   action='store_true', help='Use to'
+                   ' output the necessary files for'
+                   ' streamflow modeling')
+    p.add_argument('-pk', '--package', dest='package', default='link',
+                   choices=['link', 'copy', 'move'],
+                   help='How the streamflow files are put in the streamflow'
+                   ' folder. link hardlinks or reflinks the files and falls'
+                   ' back to copying, move leaves nothing in the temp folder,'
+                   ' default=link')
+    p.add_argument('-sr', '--snap-rule', dest='snap_rule',
+                   default='downslope', choices=['downslope', 'nearest'],
+                   help='How pour points are moved onto the streams.'
+                   ' downslope follows the flow direction like TauDEM'
+                   ' moveoutletstostrm, nearest moves them to the closest'
+                   ' stream cell, default=downslope')
+    p.add_argument('-sd', '--snap-distance', dest='snap_distance', type=int,
+                   default=50,
+                   help='Number of cells to search for a stream when moving'
+                   ' the pour points, default=50')
+    p.add_argument('-net', '--network', dest='network', default='taudem',
+                   choices=['native', 'taudem'],
+                   help='How the watersheds and stream network are made.'
+                   ' native labels them in process from the flow'
+                   ' directions, taudem runs aread8, threshold and'
+                   ' streamnet, default=taudem')
+    p.add_argument('-c', '--clip', dest='clip', action='store_true',
+                   help='Clip the DEM to the area draining to the pour points'
+                   ' before running TauDEM, the area is found on a coarse'
+                   ' DEM and the clip is widened if any drainage crosses'
+                   ' its edges')
+    p.add_argument('-cf', '--clip-factor', dest='clip_factor', type=int,
+                   default=10,
+                   help='Number of cells in each direction averaged into a'
+                   ' coarse cell to find the area to clip, default=10')
+    p.add_argument('-cb', '--clip-buffer', dest='clip_buffer', type=int,
+                   default=5,
+                   help='Number of coarse cells added around the area to'
+                   ' clip, default=5')
+    p.add_argument('-acc', '--accumulation', dest='accumulation',
+                   default='taudem', choices=['taudem', 'tiled'],
+                   help='How the drainage area is calculated. taudem runs'
+                   ' aread8, tiled accumulates the flow directions in tiles'
+                   ' across --nthreads processes for DEMs larger than'
+                   ' memory, default=taudem')
+    p.add_argument('-ts', '--tile-size', dest='tile_size', type=int,
+                   default=2048,
+                   help='Number of rows and columns in each tile for the tiled'
+                   ' drainage area, default=2048')
+    target = p.add_mutually_exclusive_group()
+    target.add_argument('-sb', '--subbasins', dest='subbasins', type=int,
+                        help='Number of subbasins to make, the threshold is'
+                        ' searched for in place of --threshold')
+    target.add_argument('-ma', '--mean-area', dest='mean_area', type=float,
+                        help='Mean subbasin area to make in the DEM units,'
+                        ' the threshold is searched for in place of'
+                        ' --threshold')
+    p.add_argument('-hd', '--hand', dest='flow_products',
+                   action='store_true',
+                   help='Write the height above nearest drainage and the flow'
+                   ' distance to the outlet with the streamflow files,'
+                   ' requires --streamflow')
+    args = p.parse_args()
+
+    if args.flow_products and not args.streamflow:
+        p.error('--hand requires --streamflow')
+
+    # Only import the TauDEM wrapper once the arguments are parsed so --help
+    # and argument errors return straight away
+    from basin_setup import __version__, delineate
+    from basin_setup.delineate import cleanup, ernestafy, out
+
+    # Global debug variable
+    delineate.DEBUG = args.debug
+
+    start = time.time()
+
+    # Print a nice header
+    msg = "Basin Delineation Tool v{0}".format(__version__)
+    m = "=" * (2 * len(msg) + 1)
+    out.msg(m, 'header')
+    out.msg(msg, 'header')
+    out.msg(m, 'header')
+
+    rerun = args.rerun
+
+    # Make sure our output folder exists
+    if args.output is None:
+        output = './delineation'
+    else:
+        output = args.output
+
+    temp = os.path.join(output, 'temp')
+    if not os.path.isdir(output):
+        os.mkdir(output)
+    else:
+        cleanup(output, at_start=True)
+
+    if not os.path.isdir(temp):
+        os.mkdir(temp)
+
+    # A single delineation when searching for the threshold
+    thresholds = args.threshold
+    if args.subbasins is not None or args.mean_area is not None:
+        thresholds = [None]
+
+    # The streamflow ascii grids are written in threads while TauDEM
+    # delineates the next threshold
+    executor = None
+    if args.streamflow and len(thresholds) > 1:
+        executor = ThreadPoolExecutor(max_workers=len(thresholds))
+
+    # Cycle through all the thresholds provided
+    futures = []
+    for i, tr in enumerate(thresholds):
+        if i > 0:
+            rerun = True
+
+        futures += ernestafy(args.dem, args.pour_points, output=output,
+                             temp=temp,
+                             threshold=tr,
+                             rerun=rerun,
+                             nthreads=args.nthreads,
+                             out_streams=args.streamflow,
+                             executor=executor,
+                             package=args.package,
+                             snap_rule=args.snap_rule,
+                             snap_distance=args.snap_distance,
+                             network=args.network,
+                             clip=args.clip,
+                             clip_factor=args.clip_factor,
+                             clip_buffer=args.clip_buffer,
+                             accumulation=args.accumulation,
+                             tile_size=args.tile_size,
+                             subbasins=args.subbasins,
+                             mean_area=args.mean_area,
+                             flow_products=args.flow_products)
+
+    # Wait for the ascii grids before the temp files are removed
+    for future in futures:
+        future.result()
+
+    if executor is not None:
+        executor.shutdown()
+    if not args.debug:
+        cleanup(output, at_start=False)
+
+    stop = time.time()
+    out.msg("Basin Delineation Complete. Elapsed Time {0}s".format(
+        int(stop - start)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,7 @@
 import argparse
 
-from basin_setup.generate_topo import GenerateTopo
 
-
-def main():
+def main(argv=None):
 
     # Parge command line arguments
     p = argparse.ArgumentParser(
@@ -13,12 +11,33 @@ def main():
         ' topo.nc containing: dem, mask, veg height,'
         ' veg type, veg tau, and veg k')
 
-    p.add_argument(dest='config_file',
-                   help="Path to configuration file")
+    p.add_argument(dest='config_file', nargs='+',
+                   help="Path to configuration file. Multiple files will "
+                   "process each basin reading the shared DEM and vegetation "
+                   "files once")
+
+    p.add_argument('-p', '--processes', dest='processes', type=int,
+                   default=1,
+                   help="Number of basins to process at once when multiple "
+                   "configuration files are given")
+
+    p.add_argument('-r', '--resume', dest='resume', action='store_true',
+                   help="Resume a failed run, stages with unchanged inputs "
+                   "are restored from the checkpoint in the temp folder")
+
+    args = p.parse_args(argv)
+
+    # Import after parsing, GenerateTopo pulls in the whole geospatial stack
+    if len(args.config_file) > 1:
+        from basin_setup.generate_topo.batch import run_batch
+
+        run_batch(args.config_file, processes=args.processes,
+                  resume=args.resume)
+        return
 
-    args = p.parse_args()
+    from basin_setup.generate_topo import GenerateTopo
 
-    gt = GenerateTopo(args.config_file)
+    gt = GenerateTopo(args.config_file[0], resume=args.resume)
     gt.run()
 
 
@@ -0,0 +1,172 @@
+import argparse
+import logging
+import os
+import shutil
+import time
+
+
+def main(argv=None):
+
+    p = argparse.ArgumentParser(description="Modifies existing images to a"
+                                            " different scale and shifts the"
+                                            " grid to match modeling domains"
+                                            " for SMRF/AWSM")
+
+    p.add_argument("-t", "--topo", dest="topo",
+                   required=True,
+                   help="Path to the topo.nc file used for modeling")
+
+    p.add_argument("-i", "--images", dest="images",
+                   required=True, nargs='+',
+                   help="Path(s) to lidar images for processing")
+
+    p.add_argument("-b", "--basin", dest="basin",
+                   required=True, choices=['brb', 'kaweah', 'kings', 'lakes',
+                                           'merced', 'sanjoaquin', 'tuolumne'],
+                   help="Name of the basin to use for metadata")
+
+    p.add_argument("-o", "--output", dest="output",
+                   required=False, default='output',
+                   help="Path to output folder")
+
+    p.add_argument("-d", "--debug", dest="debug",
+                   required=False, action='store_true',
+                   help="Outputs more information and does not delete any"
+                         " working files generated during runs")
+
+    p.add_argument("-dt", "--dates", dest="dates",
+                   required=False, default=[], nargs='+',
+                   help="Enables user to directly control the date(s). Should "
+                        " be a list as long as the images argument. If left"
+                        " empty GRM will attempt to find the date in the file"
+                        " name of the image")
+
+    p.add_argument("-e", "--allow_exceptions", dest="allow_exceptions",
+                   required=False, action="store_true",
+                   help="For Development purposes, allows it to be debugging"
+                   " but also enables the errors to NOT catch, which is useful"
+                   " for batch processing.")
+
+    p.add_argument("-r", "--resample", dest="resample",
+                   choices=['near', 'bilinear', 'cubic', 'cubicspline',
+                            'lanczos', 'average', 'mode', 'max', 'min',
+                            'med', 'Q1', 'Q3'],
+                   required=False, default="bilinear",
+                   help="Pass through the resample technique to use in"
+                         " gdalwarp. average, min, max, med and mode are"
+                         " reduced in blocks without gdalwarp for images"
+                         " aligned to the gdalwarp grid with an integer"
+                         " ratio of cell sizes.")
+
+    p.add_argument("-bs", "--band-size", dest="band_size",
+                   required=False, default=100.0, type=float,
+                   help="Height of the elevation bands to summarize the"
+                        " depths of each flight by.")
+
+    args = p.parse_args(argv)
+
+    # netCDF4, pandas and spatialnc are slow to import, wait until the
+    # arguments are parsed
+    import coloredlogs
+
+    from basin_setup import __version__
+    from basin_setup.grm import parse_fname_date, run_grm
+
+    DEBUG = args.debug
+
+    start = time.time()
+    skips = 0
+
+    # Make sure our output folder exists
+    output = args.output
+
+    # Make the output folder
+    if not os.path.isdir(output):
+        os.mkdir(output)
+
+    # Make the temp folder inside the output folder
+    temp = os.path.join(output, 'tmp')
+    if not os.path.isdir(temp):
+        os.mkdir(temp)
+
+    if not isinstance(args.images, list):
+        args.images = [args.images]
+
+    # Get logger and add color with a simple format
+    log = logging.getLogger('basin_setup.grm')
+    coloredlogs.install(fmt='%(levelname)-5s %(message)s', level="INFO",
+                        logger=log)
+    # Print a nice header with version number
+    msg = "\n\nGrid Resizing and Matching Script v{}".format(__version__)
+    header = "=" * (len(msg) + 1)
+    log.info(msg + "\n" + header + "\n")
+
+    # We need to sort the images by date so create a dictionary of the two here
+    log.info("Calculating dates and sorting images for processing...")
+    if args.dates:
+        dates = args.dates
+
+    else:
+        dates = [parse_fname_date(f) for f in args.images]
+
+    # Confirm there as many dates as images
+    if len(dates) != len(args.images):
+        raise Exception("Provided dates must either be in the image filename"
+                        " in the format YYYYMMDD or provided using --date."
+                        " If using the date flag, there must be as many dates"
+                        " as images.")
+
+    image_dict = {k: v for (k, v) in zip(dates, args.images)}
+
+    # Loop through all images provided
+    log.info("Number of images being processed: {}".format(len(args.images)))
+
+    for d in sorted(image_dict.keys()):
+        f = image_dict[d]
+
+        log.info("")
+        log.info("Processing {}".format(os.path.basename(f)))
+
+        kwargs = {'image': f, 'topo': args.topo, 'basin': args.basin,
+                  'debug': args.debug,
+                  'output': output,
+                  'temp': temp,
+                  'resample': args.resample,
+                  'band_size': args.band_size,
+                  'date': d,
+                  'log': log}
+
+        if not DEBUG or args.allow_exceptions:
+            try:
+                run_grm(**kwargs)
+
+            except Exception as e:
+                log.warning("Skipping {} due to error".format(
+                    os.path.basename(f)))
+                log.error(e)
+                skips += 1
+
+        else:
+            run_grm(**kwargs)
+
+    stop = time.time()
+
+    # Throw a warning when all get skipped
+    if skips == len(args.images):
+        log.warning("No images were processed!")
+
+    log.info("Grid Resizing and Matching Complete. {1}/{2} files processed."
+             " Elapsed Time {0:0.1f}s"
+             "".format(
+                 stop - start,
+                 len(args.images) - skips,
+                 len(args.images)
+             ))
+
+    if not DEBUG:
+        log.info('Cleaning up temporary files.')
+        shutil.rmtree(temp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+
+
+def main(argv=None):
+
+    p = argparse.ArgumentParser(
+        description='Long running worker for generate_topo and grm jobs.'
+        ' The worker keeps the imports and the parsed CoreConfig warm'
+        ' between jobs submitted over a Unix socket.')
+
+    p.add_argument('-s', '--socket', dest='socket', default=None,
+                   help="Path to the worker's Unix socket, defaults to "
+                   "basin_setup_worker.sock in the temp folder")
+
+    # required isn't a keyword of add_subparsers in python 3.6
+    subparsers = p.add_subparsers(dest='action')
+    subparsers.required = True
+
+    subparsers.add_parser('serve', help='Start a worker')
+
+    submit = subparsers.add_parser(
+        'submit', help='Submit a job and wait for it to finish')
+    submit.add_argument('command', choices=['generate_topo', 'grm'],
+                        help='Command to run')
+    submit.add_argument('args', nargs=argparse.REMAINDER,
+                        help='Arguments for the command')
+    submit.add_argument('-t', '--timeout', dest='timeout', type=float,
+                        default=None,
+                        help='Seconds to wait for the job, waits until it '
+                        'finishes by default')
+
+    subparsers.add_parser('stop', help='Stop a running worker')
+
+    args = p.parse_args(argv)
+
+    from basin_setup import worker
+
+    socket_path = args.socket or worker.DEFAULT_SOCKET
+
+    if args.action == 'serve':
+        import coloredlogs
+
+        from basin_setup.utils.logger import BasinSetupLogger
+
+        coloredlogs.install(level='INFO', fmt=BasinSetupLogger.FMT)
+
+        with worker.Worker(socket_path) as server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        return
+
+    if not os.path.exists(socket_path):
+        sys.exit('No worker running on {}'.format(socket_path))
+
+    if args.action == 'stop':
+        worker.submit('shutdown', [], socket_path)
+        return
+
+    response = worker.submit(
+        args.command, args.args, socket_path, timeout=args.timeout)
+
+    if response['status'] != 'ok':
+        sys.stderr.write(response.get('traceback', ''))
+        sys.exit(response['error'])
+
+    print('{} finished in {:0.1f}s'.format(
+        args.command, response['elapsed']))
+
+
+if __name__ == '__main__':
+    main()
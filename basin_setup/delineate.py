@@ -1,15 +1,11 @@
 #!/usr/bin/env python3
 
-import argparse
 import datetime
 import os
 import shutil
 import sys
-import time
 from subprocess import check_output
 
-import geopandas as gpd
-import numpy as np
 from colorama import Fore, Style, init
 
 from basin_setup import __version__
@@ -136,6 +132,69 @@ def run_cmd(cmd, nthreads=None):
     out.dbg(s)
 
 
+def clip_to_basin(demfile, pour_points, outfile, factor=10, buffer=5):
+    """
+    STEP #0 Clip the DEM to the area draining to the pour points, found on a
+    coarse DEM averaged over blocks of cells, so TauDEM only runs where it's
+    needed.
+
+    Args:
+        demfile: Path to tif of the DEM.
+        pour_points: Path to pour point locations
+        outfile: Path to write the clipped DEM.
+        factor: Number of cells in each direction of a coarse block
+        buffer: Number of coarse blocks to add around the contributing area
+
+    Returns:
+        list: Whether the top, bottom, left and right edges of the DEM were
+            clipped
+    """
+    out.msg("Clipping the DEM to the contributing area...")
+
+    check_path(demfile)
+    check_path(pour_points)
+    check_path(outfile, outfile=True)
+
+    # rasterio is slow to import, only load it once it's needed
+    from basin_setup.hydrology.clip import clip_dem, clip_window, clipped_edges
+
+    window = clip_window(demfile, pour_points, factor=factor, buffer=buffer)
+    clip_dem(demfile, window, outfile)
+    out.dbg("Clipped the DEM to {} by {} cells".format(
+        window.height, window.width))
+
+    return clipped_edges(demfile, window)
+
+
+def check_clip(d8flowdir, pour_points, edges, rule='downslope',
+               max_distance=50):
+    """
+    Check that none of the area draining to the pour points is cut off by
+    the clipped DEM edges, wherever the pour points get snapped to.
+
+    Args:
+        d8flowdir: Path to the D8 Flow direction image of the clipped DEM
+        pour_points: Path to pour point locations
+        edges: Whether the top, bottom, left and right edges were clipped
+        rule: Snapping rule used for the pour points
+        max_distance: Number of cells to search for a stream
+
+    Returns:
+        bool: True if the clip has to be widened
+    """
+    check_path(d8flowdir)
+
+    from basin_setup.hydrology.clip import drains_across
+
+    crosses = drains_across(d8flowdir, pour_points, edges, rule=rule,
+                            max_distance=max_distance)
+    if crosses:
+        out.warn("The contributing area reaches the edge of the clipped DEM,"
+                 " widening the clip...")
+
+    return crosses
+
+
 def pitremove(demfile, outfile=None, nthreads=None):
     """
     STEP #1
@@ -187,7 +246,8 @@ def calcD8Flow(filled_dem, d8dir_file=None, d8slope_file=None, nthreads=None):
     run_cmd(CMD, nthreads=nthreads)
 
 
-def calcD8DrainageArea(d8flowdir, areaD8_out=None, nthreads=None):
+def calcD8DrainageArea(d8flowdir, areaD8_out=None, nthreads=None,
+                       backend='taudem', tile_size=2048):
     """
     STEP #3
     Calculates D8 Contributing area to each cell in the DEM.
@@ -195,10 +255,26 @@ def calcD8DrainageArea(d8flowdir, areaD8_out=None, nthreads=None):
     Args:
         d8flowdir: Path to the D8 Flow direction image
         areaD8_out: Path to output the Drainage area image
-        nthreads: Number of cores to use for mpiexec
+        nthreads: Number of cores to use for mpiexec, or processes for the
+                  tiles
+        backend: taudem runs aread8, tiled accumulates the flow directions
+                 in tiles so the raster doesn't have to fit in memory
+        tile_size: Number of rows and columns in each tile
     """
     check_path(d8flowdir)
     check_path(areaD8_out, outfile=True)
+
+    if backend == 'tiled':
+        out.msg("Calculating drainage area in tiles...")
+
+        # rasterio is slow to import, only load it once it's needed
+        from basin_setup.hydrology.accumulation import tiled_flow_accumulation
+
+        processes = int(nthreads) if nthreads is not None else None
+        tiled_flow_accumulation(d8flowdir, areaD8_out, tile_size=tile_size,
+                                processes=processes)
+        return
+
     CMD = "aread8 -p {0} -ad8 {1}".format(d8flowdir, areaD8_out)
 
     run_cmd(CMD, nthreads=nthreads)
@@ -233,31 +309,42 @@ def defineStreamsByThreshold(areaD8, threshold_streams_out=None, threshold=100,
 
 def outlets_2_streams(d8flowdir, threshold_streams, pour_points,
                       new_pour_points=None,
-                      nthreads=None):
+                      nthreads=None, rule='downslope', max_distance=50):
     """
     STEP #5  Move Outlets to Streams, so as to move the catchment outlet point
     on one of the DEM cells identified by TauDEM as belonging to the
-    stream network
+    stream network. All the points are snapped in process in one array
+    query instead of TauDEM moveoutletstostrm.
 
     Args:
         d8flowdir: Path to the D8 Flow direction image
         threshold_streams: Path to output the thresholded stream image
         pour_points: Path to pour point locations in a list
         new_pour_points: Path to output the new list of points
-        nthreads: Number of cores to use for mpiexec
+        nthreads: Not used, kept for compatibility
+        rule: downslope follows the flow direction like moveoutletstostrm,
+              nearest moves the points to the closest stream cell
+        max_distance: Number of cells to search for a stream
     """
 
     check_path(d8flowdir)
     check_path(threshold_streams)
     check_path(pour_points)
     check_path(new_pour_points, outfile=True)
-    CMD = 'moveoutletstostrm -p {0} -src {1} -o {2} -om {3}'.format(
-        d8flowdir,
-        threshold_streams,
-        pour_points,
-        new_pour_points)
 
-    run_cmd(CMD, nthreads=nthreads)
+    # geopandas and rasterio are slow to import, only load them once needed
+    from basin_setup.hydrology.outlets import move_outlets_to_streams
+
+    points = move_outlets_to_streams(d8flowdir, threshold_streams,
+                                     pour_points, new_pour_points,
+                                     rule=rule, max_distance=max_distance)
+
+    for name, distance in zip(points['Primary ID'], points['Dist_moved']):
+        if distance < 0:
+            out.warn("No stream found within {} cells of {}, the pour point"
+                     " was not moved".format(max_distance, name))
+        else:
+            out.dbg("Moved {} {:g} cells".format(name, distance))
 
 
 def calcD8DrainageAreaBasin(d8flowdir, basin_outlets_moved, areaD8_out=None,
@@ -336,16 +423,104 @@ def delineate_streams(dem, d8flowdir, basin_drain_area, threshold_streams,
     run_cmd(CMD, nthreads=nthreads)
 
 
-def convert2ascii(infile, outfile=None):
+def label_watersheds(d8flowdir, threshold_streams, basin_outlets_moved,
+                     wfile=None):
     """
-    Convert to ascii
+    STEPS #6-8 Watersheds in process, every cell is labelled with the stream
+    link it drains to in one sweep up the reverse flow direction graph
+    instead of running aread8, threshold and streamnet again. The flow
+    graph is built once and reused for every threshold.
+
+    Args:
+        d8flowdir: Path to the D8 Flow direction image
+        threshold_streams: streams defintion image defined by a threshold
+        basin_outlets_moved: Path to the pour points corrected to be on the
+                             streams
+        wfile: Name of the image to output subbasin definitions.
+
+    Returns:
+        np.ndarray: Subbasin number of each cell, -1 outside the basin
+    """
+
+    out.msg("Creating watersheds...")
+
+    check_path(d8flowdir)
+    check_path(threshold_streams)
+    check_path(basin_outlets_moved)
+    check_path(wfile, outfile=True)
+
+    # rasterio is slow to import, only load it once it's needed
+    from basin_setup.hydrology.watersheds import delineate_watersheds
+
+    return delineate_watersheds(d8flowdir, threshold_streams,
+                                basin_outlets_moved, output=wfile)
+
+
+def stream_network(d8flowdir, threshold_streams, basin_outlets_moved,
+                   wfile=None, netfile=None, linkfile=None):
+    """
+    STEPS #6-8 Stream Reach And Watershed in process, the watersheds are
+    labelled like `label_watersheds` and the links, Strahler order,
+    downstream links and link lines are derived from the same traversal
+    instead of running streamnet.
+
+    Args:
+        d8flowdir: Path to the D8 Flow direction image
+        threshold_streams: streams defintion image defined by a threshold
+        basin_outlets_moved: Path to the pour points corrected to be on the
+                             streams
+        wfile: Name of the image to output subbasin definitions.
+        netfile: Name of the shapefile to output the stream network, with
+                 the same fields as streamnet
+        linkfile: Name of the csv to output the link table
+
+    Returns:
+        pd.DataFrame: Link table with the downstream and upstream links,
+            Strahler order, magnitude, length and contributing area
+    """
+
+    out.msg("Creating watersheds and stream network...")
+
+    check_path(d8flowdir)
+    check_path(threshold_streams)
+    check_path(basin_outlets_moved)
+    for f in [wfile, netfile, linkfile]:
+        if f is not None:
+            check_path(f, outfile=True)
+
+    # rasterio is slow to import, only load it once it's needed
+    from basin_setup.hydrology.network import delineate_network
+
+    return delineate_network(d8flowdir, threshold_streams,
+                             basin_outlets_moved, watersheds=wfile,
+                             network=netfile, links=linkfile)[1]
+
+
+def convert2ascii(infile, outfile=None, executor=None):
+    """
+    Convert to ascii in process, the output is the same as
+    gdal_translate -of AAIGrid
+
+    Args:
+        infile: Path to the tif to convert
+        outfile: Path to the .asc file
+        executor: Optional executor to run the conversion in, i.e. a thread
+                  pool shared by multiple thresholds
+
+    Returns:
+        Future of the conversion when an executor is given
     """
     check_path(infile)
     check_path(outfile, outfile=True)
 
-    # convert wfile files to ascii
-    CMD = 'gdal_translate -of AAIGrid {0} {1}'.format(infile, outfile)
-    run_cmd(CMD)
+    # rasterio is slow to import, only load it once it's needed
+    from basin_setup.utils.ascii_grid import write_ascii_grid
+
+    out.dbg('Converting {} to ascii'.format(infile))
+    if executor is not None:
+        return executor.submit(write_ascii_grid, infile, outfile)
+
+    write_ascii_grid(infile, outfile)
 
 
 def produce_shapefiles(watershed_tif, corrected_points,
@@ -371,6 +546,10 @@ def produce_shapefiles(watershed_tif, corrected_points,
                                                                 watershed_shp)
     run_cmd(CMD)
 
+    # geopandas is slow to import, only load it once it's needed
+    import geopandas as gpd
+    import numpy as np
+
     # Read in and identify the names of the pour points with the subbasins
     ptdf = gpd.read_file(corrected_points)
 
@@ -509,11 +688,139 @@ def confirm_norerun(non_thresholdkeys, imgs):
     return move_forward
 
 
-def create_ars_streamflow_files(treefile, coordfile, threshold, wshp, netdir,
-                                output='basin_catchments.csv'):
+def read_tree(treefile):
+    """Read the TauDEM streamnet tree file, one row for each stream link
+
+    Args:
+        treefile: Path to the tree .dat file
+
+    Returns:
+        pd.DataFrame: start and end point in the coord file, downstream and
+            upstream links (-1 for none), strahler order, monitoring point
+            and network magnitude indexed by the link number
+    """
+    import pandas as pd
+
+    names = ['link', 'start', 'end', 'downstream', 'upstream_1',
+             'upstream_2', 'order', 'monitor_point', 'magnitude']
+
+    return pd.read_csv(treefile, sep=r'\s+', header=None,
+                       names=names).set_index('link')
+
+
+def read_coord(coordfile):
+    """Read the TauDEM streamnet coordinates file, one row for each point
+    along the stream links
+
+    Args:
+        coordfile: Path to the coord .dat file
+
+    Returns:
+        pd.DataFrame: x, y, distance to the outlet, elevation and
+            contributing area of each point
+    """
+    import pandas as pd
+
+    names = ['x', 'y', 'distance', 'elevation', 'contributing_area']
+
+    return pd.read_csv(coordfile, sep=r'\s+', header=None, names=names)
+
+
+def tree_links(treefile, coordfile):
+    """Link table from the TauDEM streamnet tree and coordinates files
+
+    Args:
+        treefile: Path to the streamnet tree .dat file
+        coordfile: Path to the streamnet coord .dat file
+
+    Returns:
+        pd.DataFrame: the tree, see `read_tree`, with the contributing area
+            at the bottom of each link, the largest of the link's points
+    """
+    import numpy as np
+
+    tree = read_tree(treefile)
+    coord = read_coord(coordfile)
+
+    lengths = (tree['end'] - tree['start'] + 1).values
+    offsets = np.cumsum(lengths) - lengths
+    points = np.repeat(tree['start'].values, lengths) + \
+        np.arange(lengths.sum()) - np.repeat(offsets, lengths)
+    tree['contributing_area'] = np.maximum.reduceat(
+        coord['contributing_area'].values[points], offsets) \
+        if len(tree) else []
+
+    return tree
+
+
+def catchment_table(watersheds, demfile, treefile=None, coordfile=None,
+                    links=None):
+    """Catchment table computed from the watershed raster and the DEM with
+    zonal reductions, each watershed is numbered with the stream link
+    draining it.
+
+    Args:
+        watersheds: Path to the watershed tif
+        demfile: Path to the DEM tif on the same grid as the watersheds
+        treefile: Path to the streamnet tree .dat file
+        coordfile: Path to the streamnet coord .dat file
+        links: Link table with the downstream link and contributing area
+               in place of the tree and coord files, see `stream_network`
+
+    Returns:
+        pd.DataFrame: area, cell count, mean, min and max elevation,
+            downstream link (-1 for the outlets) and contributing area at
+            the end of the link, indexed by the watershed number DN
+    """
+    import numpy as np
+    import rasterio
+
+    from basin_setup.utils.zonal import zonal_stats
+
+    with rasterio.open(watersheds) as src:
+        labels = src.read(1)
+        nodata = src.nodata
+        cell_area = abs(src.transform.a * src.transform.e)
+
+    with rasterio.open(demfile) as src:
+        dem = src.read(1, masked=True).astype(np.float64).filled(np.nan)
+
+    df = zonal_stats(labels, dem, nodata=nodata, cell_area=cell_area)
+    df = df.rename(columns={
+        'mean': 'mean_elevation',
+        'min': 'min_elevation',
+        'max': 'max_elevation'
+    })
+    df.index.name = 'DN'
+
+    # collect down stream info. and the contributing area at the bottom of
+    # each link
+    if links is None:
+        links = tree_links(treefile, coordfile)
+
+    df['downstream'] = links['downstream'].reindex(df.index, fill_value=-1)
+    df['contributing_area'] = links['contributing_area'].reindex(df.index)
+
+    return df
+
+
+def create_ars_streamflow_files(treefile, coordfile, threshold, watersheds,
+                                demfile, output='basin_catchments.csv',
+                                links=None):
     """
     Takes in the Tree file and the Coordinates file to produce a csv of the
-    downstream catchment, the elevation of a catchment, and contributing area
+    downstream catchment, the elevation of a catchment, and contributing area.
+    The catchments are summarized directly from the watershed raster and the
+    DEM, see `catchment_table`.
+
+    Args:
+        treefile: Path to the streamnet tree .dat file
+        coordfile: Path to the streamnet coord .dat file
+        threshold: threshold used for creating subbasins
+        watersheds: Path to the streamnet watershed tif
+        demfile: Path to the DEM tif used for the delineation
+        output: Path to the output csv
+        links: Link table used in place of the tree and coord files
     """
     today = (datetime.datetime.today().date()).isoformat()
 
@@ -531,38 +838,14 @@ def create_ars_streamflow_files(treefile, coordfile, threshold, wshp, netdir,
         fp.write(header)
         fp.close()
 
-    # tree_names = ['link', 'start number', 'end number', 'downstream',
-    #               'upstream',
-    #               'strahler',
-    #               'monitor point',
-    #               'network magnitude']
-    # coord_names = ['dummy', 'x', 'y', 'distance', 'elevation', 'area']
-
-    # dftree = pd.read_csv(treefile, delimiter='\t', names=tree_names)
-    # dfcoord = pd.read_csv(coordfile, delimiter='\t', names=coord_names)
-    dfwshp = gpd.read_file(wshp)
-
-    # Get the network shpapefile which lives under a folder named after the
-    # tif.
-    name = os.path.split(netdir)[-1].split('.')[0] + '.shp'
-    netshp = os.path.join(netdir, name)
-    dfnet = gpd.read_file(netshp)
-
-    dfnet = dfnet.set_index('WSNO')
-
-    # Collect the area of each basin
-    dfwshp['area'] = dfwshp.area
-    # handle individual cells acting as subbasins
-    dfwshp = dfwshp.groupby('DN').sum()
-
-    # Collect down stream info.
-    dfwshp['downstream'] = dfnet['DSLINKNO']
+    df = catchment_table(watersheds, demfile, treefile, coordfile,
+                         links=links)
+    df.to_csv(output, mode='a')
 
-    dfwshp.to_csv(output, mode='a')
 
-
-def output_streamflow(imgs, threshold, wshp, temp="temp",
-                      output_dir='streamflow'):
+def output_streamflow(imgs, threshold, demfile, temp="temp",
+                      output_dir='streamflow', executor=None, package='link',
+                      links=None, flow_products=False):
     """
     Outputs files necessary for streamflow modeling. This will create a file
     structure under a folder defined by output_dir and the threshold.
@@ -571,11 +854,24 @@ def output_streamflow(imgs, threshold, wshp, temp="temp",
     Args:
         imgs: Dictionary containing a files to be outputted.
         threshold: threshold used for creating subbasins
-        wshp: Watershed shapefile
+        demfile: DEM tif used for the delineation
         output_dir: Location to output files
+        executor: Optional executor to convert the watersheds to ascii in
+        package: How the files are put in the output folder, link (hardlink
+                 or reflink falling back to copying), copy or move
+        links: Link table of the native stream network, the streamnet tree
+               and coord files are used when not given
+        flow_products: Write the height above nearest drainage and the flow
+                       distance to the outlet
+
+    Returns:
+        list: Futures of the ascii conversion when an executor is given
     """
+    from basin_setup.utils.files import link_or_copy
+
     # Dictionary to grab filenames for ARS streamflow
     dat = {}
+    futures = []
     out.msg("Creating streamflow files...")
 
     final_output = os.path.join(output_dir, "thresh_{}".format(threshold))
@@ -588,9 +884,30 @@ def output_streamflow(imgs, threshold, wshp, temp="temp",
         out.msg("Making streamflow threshold directory...")
         os.mkdir(final_output)
 
+    # Before packaging, moving takes the corrected points out of the work
+    # folder
+    if flow_products:
+        out.msg("Creating height above nearest drainage and flow distance"
+                " files...")
+
+        # rasterio is slow to import, only load it once it's needed
+        from basin_setup.hydrology.distance import write_flow_products
+
+        write_flow_products(imgs['flow_dir'], imgs['filled'],
+                            imgs['thresh_streams'], imgs['corrected_points'],
+                            hand=os.path.join(final_output, 'hand.tif'),
+                            distance=os.path.join(final_output,
+                                                  'flow_distance.tif'))
+
+    keys = ['corrected_points', 'watersheds']
+    if links is None:
+        keys += ['coord', 'tree']
+    else:
+        keys += ['links']
+
     # Convert the watersheds to ascii and move files to streamflow folder for
     # SLF streamflow
-    for k in ['corrected_points', 'watersheds', 'coord', 'tree']:
+    for k in keys:
 
         name = os.path.basename(imgs[k])
 
@@ -602,30 +919,126 @@ def output_streamflow(imgs, threshold, wshp, temp="temp",
 
         if k == 'watersheds':
             outfile = os.path.join(final_output, k + '.asc')
-            convert2ascii(imgs[k], outfile)
+            future = convert2ascii(imgs[k], outfile, executor=executor)
+            if future is not None:
+                futures.append(future)
 
         else:
-            shutil.copy(imgs[k], outfile)
+            link_or_copy(imgs[k], outfile, strategy=package)
 
     # Copy over threshold files
     for f in os.listdir(imgs['net']):
         to_f = os.path.join(final_output, os.path.basename(f))
-        shutil.copy(os.path.join(imgs["net"], f), to_f)
+        link_or_copy(os.path.join(imgs["net"], f), to_f, strategy=package)
 
     # Create the files for ARS Streamflow
-    create_ars_streamflow_files(dat['tree'],
-                                dat['coord'],
+    create_ars_streamflow_files(dat.get('tree'),
+                                dat.get('coord'),
                                 threshold,
-                                wshp,
-                                imgs['net'],
+                                imgs['watersheds'],
+                                demfile,
                                 output=os.path.join(final_output,
-                                                    'basin_catchments.csv'))
+                                                    'basin_catchments.csv'),
+                                links=links)
+
+    return futures
+
+
+def file_paths(filekeys, thresholdkeys, output, temp, threshold):
+    """
+    File paths of the delineation outputs
+
+    Args:
+        filekeys: Keys of every output file
+        thresholdkeys: Keys of the files made for each threshold, these go
+                       in the temp folder with the threshold in the name
+        output: Output folder
+        temp: Temp folder
+        threshold: Threshold for the stream definition
+
+    Returns:
+        dict: Path of each file
+    """
+    imgs = {}
+    for k in filekeys:
+        base = os.path.join(output, k)
+
+        # Add the threshold to the filename if need be
+        if k in thresholdkeys:
+            base = os.path.join(temp, k)
+            base += '_thresh_{}'.format(threshold)
+
+        # Watchout for shapefiles
+        if 'points' in k:
+            imgs[k] = base + '.shp'
+        # Files we need for streamflow
+        elif k in ['coord', 'tree']:
+            imgs[k] = base + '.dat'
+        elif k == 'links':
+            imgs[k] = base + '.csv'
+        else:
+            imgs[k] = base + '.tif'
+
+    return imgs
+
+
+def choose_threshold(d8flowdir, areaD8, pour_points, subbasins=None,
+                     mean_area=None, rule='downslope', max_distance=50):
+    """
+    Bisect the stream thresholds for the one making the number of subbasins
+    or the mean subbasin area closest to the target. The subbasins of each
+    threshold are counted from the drainage area and the streams it
+    defines without running the rest of the delineation.
+
+    Args:
+        d8flowdir: Path to the D8 Flow direction image
+        areaD8: Path to the D8 Drainage area image
+        pour_points: Path to pour point locations
+        subbasins: Number of subbasins to target
+        mean_area: Mean subbasin area to target in the DEM units
+        rule: Snapping rule used for the pour points
+        max_distance: Number of cells to search for a stream
+
+    Returns:
+        int: The threshold
+    """
+    out.msg("Searching for the stream threshold...")
+    check_path(d8flowdir)
+    check_path(areaD8)
+    check_path(pour_points)
+
+    # rasterio is slow to import, only load it once it's needed
+    from basin_setup.hydrology.threshold import ThresholdSearch
+
+    search = ThresholdSearch(d8flowdir, areaD8, pour_points, rule=rule,
+                             max_distance=max_distance)
+    threshold = search.search(subbasins=subbasins, mean_area=mean_area)
+    out.dbg(search.table().to_string())
+
+    count, area = search.subbasins(threshold)
+    out.respond("Using a threshold of {} for {} subbasins with a mean area of"
+                " {:g}".format(threshold, count, area))
+
+    return threshold
 
 
 def ernestafy(demfile, pour_points, output=None, temp=None, threshold=100,
               rerun=False,
               nthreads=None,
-              out_streams=False):
+              out_streams=False,
+              executor=None,
+              package='link',
+              snap_rule='downslope',
+              snap_distance=50,
+              network='taudem',
+              clip=False,
+              clip_factor=10,
+              clip_buffer=5,
+              accumulation='taudem',
+              tile_size=2048,
+              subbasins=None,
+              mean_area=None,
+              flow_products=False):
     """
     Run TauDEM using the script Ernesto Made.... therefore we will
     ernestafy this basin.
@@ -638,44 +1051,50 @@ def ernestafy(demfile, pour_points, output=None, temp=None, threshold=100,
         rerun: boolean indicating whether to avoid re-doing steps 1-3
         out_streams: Boolean determining whether to output the files for
                      streamflow modeling
+        executor: Optional executor to write the streamflow ascii grids in
+                  while the next threshold is delineated
+        package: How the streamflow files are put in the streamflow folder,
+                 see `output_streamflow`
+        snap_rule: How pour points are moved to the streams, downslope or
+                   nearest
+        snap_distance: Number of cells to search for a stream
+        network: native labels the watersheds and stream network in process,
+                 taudem runs aread8, threshold and streamnet
+        clip: Clip the DEM to the area draining to the pour points before
+              running TauDEM, the clip is widened until no drainage crosses
+              its edges
+        clip_factor: Number of cells in each direction of the coarse blocks
+                     used to find the area draining to the pour points
+        clip_buffer: Number of coarse blocks to add around the area draining
+                     to the pour points
+        accumulation: taudem runs aread8 for the drainage area, tiled
+                      accumulates it in tiles for rasters larger than memory
+        tile_size: Number of rows and columns in each tile
+
+    Returns:
+        list: Futures of the streamflow ascii grids when an executor is given
     """
 
     create_readme(sys.argv, output)
 
     # Output File keys without a threshold in the filename
     non_thresholdkeys = ['filled', 'flow_dir', 'slope', 'drain_area',
-                         'basin_drain_area']
+                         'basin_drain_area', 'clipped']
 
     # Output File keys WITH a threshold in the filename
     thresholdkeys = ['thresh_streams', 'thresh_basin_streams', 'order', 'tree',
                      'coord', 'net', 'watersheds', 'basin_outline',
-                     'corrected_points']
+                     'corrected_points', 'links']
 
     filekeys = non_thresholdkeys + thresholdkeys
 
     # Create file paths for the output file management
-    imgs = {}
-    for k in filekeys:
-        base = os.path.join(output, k)
+    imgs = file_paths(filekeys, thresholdkeys, output, temp, threshold)
 
-        # Add the threshold to the filename if need be
-        if k in thresholdkeys:
-            base = os.path.join(temp, k)
-            base += '_thresh_{}'.format(threshold)
-
-        # Watchout for shapefiles
-        if 'points' in k:
-            imgs[k] = base + '.shp'
-        # Files we need for streamflow
-        elif k in ['coord', 'tree']:
-            imgs[k] = base + '.dat'
-        else:
-            imgs[k] = base + '.tif'
-
-    # This file if it already exists causes problems
-    if os.path.isfile(imgs['net']):
-        out.msg("Removing pre-existing stream network file...")
-        os.remove(imgs['net'])
+    # Delineate the clipped DEM, made on the first threshold
+    original_dem = demfile
+    if clip:
+        demfile = imgs['clipped']
 
     # If we rerun we don't want to run steps 1-3 again
     if rerun:
@@ -685,19 +1104,36 @@ def ernestafy(demfile, pour_points, output=None, temp=None, threshold=100,
         move_forward = confirm_norerun(non_thresholdkeys, imgs)
 
         if move_forward:
-            # 1. Pit Remove in order to fill the pits in the DEM
-            pitremove(demfile, outfile=imgs['filled'], nthreads=nthreads)
-
-            # 2. D8 Flow Directions in order to compute the flow direction in
-            #    each DEM cell
-            calcD8Flow(imgs['filled'], d8dir_file=imgs['flow_dir'],
-                       d8slope_file=imgs['slope'],
-                       nthreads=nthreads)
-
-            # 3. D8 Contributing Area so as to compute the drainage area in
-            #    each DEM cell
-            calcD8DrainageArea(imgs['flow_dir'], areaD8_out=imgs['drain_area'],
-                               nthreads=nthreads)
+            buffer = clip_buffer
+            while True:
+                # 0. Clip the DEM to the area draining to the pour points
+                if clip:
+                    edges = clip_to_basin(original_dem, pour_points,
+                                          imgs['clipped'], factor=clip_factor,
+                                          buffer=buffer)
+
+                # 1. Pit Remove in order to fill the pits in the DEM
+                pitremove(demfile, outfile=imgs['filled'], nthreads=nthreads)
+
+                # 2. D8 Flow Directions in order to compute the flow direction
+                #    in each DEM cell
+                calcD8Flow(imgs['filled'], d8dir_file=imgs['flow_dir'],
+                           d8slope_file=imgs['slope'],
+                           nthreads=nthreads)
+
+                # 3. D8 Contributing Area so as to compute the drainage area
+                #    in each DEM cell
+                calcD8DrainageArea(imgs['flow_dir'],
+                                   areaD8_out=imgs['drain_area'],
+                                   nthreads=nthreads, backend=accumulation,
+                                   tile_size=tile_size)
+
+                if not clip or not check_clip(imgs['flow_dir'], pour_points,
+                                              edges, rule=snap_rule,
+                                              max_distance=snap_distance):
+                    break
+
+                buffer *= 2
         else:
             out.msg("Please use the '--rerun' flag to perform a rerun.\n")
             sys.exit()
@@ -706,6 +1142,22 @@ def ernestafy(demfile, pour_points, output=None, temp=None, threshold=100,
     # This section and below gets run every call. (STEPS 4-8)
     ##########################################################################
 
+    # Pick the threshold making the number or size of subbasins asked for
+    if subbasins is not None or mean_area is not None:
+        threshold = choose_threshold(imgs['flow_dir'], imgs['drain_area'],
+                                     pour_points, subbasins=subbasins,
+                                     mean_area=mean_area, rule=snap_rule,
+                                     max_distance=snap_distance)
+        imgs = file_paths(filekeys, thresholdkeys, output, temp, threshold)
+
+    # This file if it already exists causes problems
+    if os.path.isfile(imgs['net']):
+        out.msg("Removing pre-existing stream network file...")
+        os.remove(imgs['net'])
+    elif os.path.isdir(imgs['net']):
+        out.msg("Removing pre-existing stream network file...")
+        shutil.rmtree(imgs['net'])
+
     # 4. Stream Definition by Threshold, in order to extract a first version of
     #    the stream network
     defineStreamsByThreshold(imgs['drain_area'],
@@ -717,116 +1169,57 @@ def ernestafy(demfile, pour_points, output=None, temp=None, threshold=100,
     #    network
     outlets_2_streams(imgs['flow_dir'], imgs['thresh_streams'], pour_points,
                       new_pour_points=imgs['corrected_points'],
-                      nthreads=nthreads)
-
-    # 6. D8 Contributing Area again, but with the catchment outlet point as
-    #    additional input data
-    calcD8DrainageAreaBasin(imgs['flow_dir'], imgs['corrected_points'],
-                            areaD8_out=imgs['basin_drain_area'],
-                            nthreads=nthreads)
-
-    # 7. Stream Definition by Threshold again, but with the catchment outlet
-    #    point as additional input data
-    defineStreamsByThreshold(imgs['basin_drain_area'],
-                             threshold_streams_out=imgs['thresh_basin_streams'],  # noqa
-                             threshold=threshold,
-                             nthreads=nthreads)
-
-    # 8. Stream Reach And Watershed
-    delineate_streams(demfile, imgs['flow_dir'], imgs['basin_drain_area'],
-                      imgs['thresh_basin_streams'], imgs['corrected_points'],
-                      stream_orderfile=imgs['order'], treefile=imgs['tree'],
-                      coordfile=imgs['coord'], netfile=imgs['net'],
-                      wfile=imgs['watersheds'], nthreads=nthreads)
+                      nthreads=nthreads, rule=snap_rule,
+                      max_distance=snap_distance)
+
+    links = None
+    if network == 'taudem':
+        # 6. D8 Contributing Area again, but with the catchment outlet point
+        #    as additional input data
+        calcD8DrainageAreaBasin(imgs['flow_dir'], imgs['corrected_points'],
+                                areaD8_out=imgs['basin_drain_area'],
+                                nthreads=nthreads)
+
+        # 7. Stream Definition by Threshold again, but with the catchment
+        #    outlet point as additional input data
+        defineStreamsByThreshold(imgs['basin_drain_area'],
+                                 threshold_streams_out=imgs['thresh_basin_streams'],  # noqa
+                                 threshold=threshold,
+                                 nthreads=nthreads)
+
+        # 8. Stream Reach And Watershed
+        delineate_streams(demfile, imgs['flow_dir'],
+                          imgs['basin_drain_area'],
+                          imgs['thresh_basin_streams'],
+                          imgs['corrected_points'],
+                          stream_orderfile=imgs['order'],
+                          treefile=imgs['tree'],
+                          coordfile=imgs['coord'], netfile=imgs['net'],
+                          wfile=imgs['watersheds'], nthreads=nthreads)
+    elif out_streams:
+        # 6-8. Watersheds and stream network of the stream links draining to
+        #      the outlets
+        links = stream_network(imgs['flow_dir'], imgs['thresh_streams'],
+                               imgs['corrected_points'],
+                               wfile=imgs['watersheds'], netfile=imgs['net'],
+                               linkfile=imgs['links'])
+    else:
+        # 6-8. Watersheds of the stream links draining to the outlets
+        label_watersheds(imgs['flow_dir'], imgs['thresh_streams'],
+                         imgs['corrected_points'], wfile=imgs['watersheds'])
 
     # Output the shapefiles of the watershed
-    wshp = produce_shapefiles(imgs['watersheds'], imgs['corrected_points'],
-                              output_dir=output)
+    produce_shapefiles(imgs['watersheds'], imgs['corrected_points'],
+                       output_dir=output)
     if out_streams:
-        output_streamflow(imgs, threshold, wshp, temp=temp,
-                          output_dir=os.path.join(output, 'streamflow'))
-
-
-def main():
-
-    p = argparse.ArgumentParser(description='Delineates a new basin for'
-                                ' SMRF/AWSM/Streamflow')
-
-    p.add_argument("-d", "--dem", dest="dem",
-                   required=True,
-                   help="Path to dem")
-    p.add_argument("-p", "--pour", dest="pour_points",
-                   required=True,
-                   help="Path to a .bna of pour points")
-    p.add_argument("-o", "--output", dest="output",
-                   required=False,
-                   help="Path to output folder")
-    p.add_argument("-t", "--threshold", dest="threshold",
-                   nargs="+", default=[100],
-                   help="List of thresholds to use for defining streams from"
-                         " the flow accumulation, default=100")
-    p.add_argument("-n", "--nthreads", dest="nthreads",
-                   required=False,
-                   help="Cores to use when processing the data")
-    p.add_argument("-re", "--rerun", dest="rerun",
-                   required=False, action='store_true',
-                   help="Boolean Flag that determines whether to run the "
-                   "script from the beginning or assume that the flow "
-                   "accumulation has been completed once")
-    p.add_argument("-db", "--debug", dest="debug",
-                   required=False, action='store_true')
-    p.add_argument('-strm', '--streamflow', dest='streamflow', required=False,
-                   action='store_true', help='Use to'
-                   ' output the necessary files for'
-                   ' streamflow modeling')
-    args = p.parse_args()
-    # Global debug variable
-    global DEBUG
-    DEBUG = args.debug
-
-    start = time.time()
-
-    # Print a nice header
-    msg = "Basin Delineation Tool v{0}".format(__version__)
-    m = "=" * (2 * len(msg) + 1)
-    out.msg(m, 'header')
-    out.msg(msg, 'header')
-    out.msg(m, 'header')
-
-    rerun = args.rerun
-
-    # Make sure our output folder exists
-    if args.output is None:
-        output = './delineation'
-    else:
-        output = args.output
-
-    temp = os.path.join(output, 'temp')
-    if not os.path.isdir(output):
-        os.mkdir(output)
-    else:
-        cleanup(output, at_start=True)
-
-    if not os.path.isdir(temp):
-        os.mkdir(temp)
-
-    # Cycle through all the thresholds provided
-    for i, tr in enumerate(args.threshold):
-        if i > 0:
-            rerun = True
-
-        ernestafy(args.dem, args.pour_points, output=output, temp=temp,
-                  threshold=tr,
-                  rerun=rerun,
-                  nthreads=args.nthreads,
-                  out_streams=args.streamflow)
-    if not args.debug:
-        cleanup(output, at_start=False)
+        return output_streamflow(imgs, threshold, demfile, temp=temp,
+                                 output_dir=os.path.join(output, 'streamflow'),
+                                 executor=executor, package=package,
+                                 links=links, flow_products=flow_products)
 
-    stop = time.time()
-    out.msg("Basin Delineation Complete. Elapsed Time {0}s".format(
-        int(stop - start)))
+    return []
 
 
 if __name__ == '__main__':
+    from basin_setup.cli.delineate import main
     main()
@@ -0,0 +1,236 @@
+import itertools
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+from rasterio.warp import transform_bounds
+from rasterio.windows import bounds
+
+from basin_setup.utils import domain_extent, gdal
+
+# Source cells added around the union window so the resampling kernels
+# at the edge of each basin have all their neighbors
+SOURCE_PAD = 2
+
+# Basins share a subset only if the subset is at most this many times the
+# combined area of the basins, basins far apart read the source on their own
+MAX_UNION_RATIO = 2
+
+
+def cluster_domains(source, domains, max_ratio=MAX_UNION_RATIO):
+    """Group the domains that are close enough to share a subset of the
+    source. Groups are merged while the bounding box of the merged group is
+    at most `max_ratio` times the combined area of its domains.
+
+    Args:
+        source (str): path to the source image
+        domains (list): tuples of (crs, extents) for each domain, extents
+            are [left, bottom, right, top]
+        max_ratio (float, optional): maximum ratio of the union area to the
+            combined domain area. Defaults to MAX_UNION_RATIO.
+
+    Returns:
+        list: list of indexes into `domains` for each group
+    """
+
+    with rasterio.open(source) as src:
+        boxes = np.array([
+            transform_bounds(crs, src.crs, *extents, densify_pts=21)
+            for crs, extents in domains
+        ])
+
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    def union_area(group):
+        left, bottom = boxes[group, :2].min(axis=0)
+        right, top = boxes[group, 2:].max(axis=0)
+        return (right - left) * (top - bottom)
+
+    groups = [[i] for i in range(len(domains))]
+    merged = True
+    while merged:
+        merged = False
+        for a, b in itertools.combinations(range(len(groups)), 2):
+            group = groups[a] + groups[b]
+            if union_area(group) <= max_ratio * areas[group].sum():
+                groups[a] = sorted(group)
+                del groups[b]
+                merged = True
+                break
+
+    return groups
+
+
+def source_window(source, domains, pad=SOURCE_PAD):
+    """Bounds of the source image that cover all the domains. The domain
+    extents are transformed to the source projection, combined and snapped
+    outwards to the source grid.
+
+    Args:
+        source (str): path to the source image
+        domains (list): tuples of (crs, extents) for each domain, extents
+            are [left, bottom, right, top]
+        pad (int, optional): number of source cells to add to each side.
+            Defaults to SOURCE_PAD.
+
+    Returns:
+        list: extents of the window [left, bottom, right, top] in the
+            source projection
+    """
+
+    with rasterio.open(source) as src:
+        domain_bounds = np.array([
+            transform_bounds(crs, src.crs, *extents, densify_pts=21)
+            for crs, extents in domains
+        ])
+
+        window = domain_extent.bounds_window(
+            np.concatenate([
+                domain_bounds[:, :2].min(axis=0),
+                domain_bounds[:, 2:].max(axis=0)
+            ]),
+            src.transform,
+            src.width,
+            src.height,
+            pad=pad
+        )
+
+        if window is None:
+            raise ValueError(
+                'Basin extents do not overlap {}'.format(source))
+
+        return list(bounds(window, src.transform))
+
+
+def shared_sources(topos, temp_dir, logger=None):
+    """Subset the source images that are used by more than one basin to the
+    union of the basins. Each source is read once and every basin then
+    reprojects from the much smaller subset. Basins that are far apart, see
+    `cluster_domains`, get their own subset or read the source directly.
+
+    Args:
+        topos (list): `GenerateTopo` instances with the extents and
+            shapefiles loaded
+        temp_dir (str): folder for the subsets
+        logger (logging, optional): Log information to the logger if provided.
+            Defaults to None.
+
+    Returns:
+        list: `sources` dictionary for each basin in `topos`
+    """
+
+    domains = {}
+    for index, gt in enumerate(topos):
+        for image in gt.source_images().values():
+            domains.setdefault(os.path.abspath(image), []).append(
+                (index, (gt.crs['init'], gt.extents)))
+
+    sources = [{} for _ in topos]
+    for i, (source, source_domains) in enumerate(domains.items()):
+        # directories and globs of tiles are mosaicked per basin
+        if len(source_domains) < 2 or not os.path.isfile(source):
+            continue
+
+        indexes, basin_domains = zip(*source_domains)
+        groups = cluster_domains(source, basin_domains)
+
+        for j, group in enumerate(groups):
+            if len(group) < 2:
+                continue
+
+            subset = os.path.join(
+                temp_dir,
+                'source_{}_{}_{}.tif'.format(
+                    i, j, os.path.splitext(os.path.basename(source))[0])
+            )
+
+            if logger is not None:
+                logger.info('Subsetting {} for {} basins'.format(
+                    source, len(group)))
+
+            gdal.gdal_translate(
+                source,
+                subset,
+                source_window(source, [basin_domains[k] for k in group]),
+                logger=logger
+            )
+
+            for k in group:
+                gt = topos[indexes[k]]
+                for name, image in gt.source_images().items():
+                    if os.path.abspath(image) == source:
+                        sources[indexes[k]][name] = subset
+
+    return sources
+
+
+def run_basin(config_file, sources, resume=False):
+    """Run `GenerateTopo` for a single basin using the shared sources
+
+    Args:
+        config_file (str): path to the basin config file
+        sources (dict): source images to use in place of the config paths
+        resume (bool, optional): restore the stages from the checkpoint.
+            Defaults to False.
+
+    Returns:
+        str: path to the basin topo.nc
+    """
+
+    # import here to avoid a circular import with `GenerateTopo`
+    from basin_setup.generate_topo import GenerateTopo
+
+    gt = GenerateTopo(config_file, resume=resume)
+    gt.sources = sources
+    gt.run()
+
+    return os.path.join(gt.config['output_folder'], 'topo.nc')
+
+
+def run_batch(config_files, processes=1, resume=False):
+    """Run `GenerateTopo` for multiple basins that share the same DEM and
+    vegetation sources. The sources are subset once to the union of all the
+    basins, then each basin is reprojected, masked and written in parallel
+    if `processes` is greater than 1.
+
+    Args:
+        config_files (list): config file for each basin
+        processes (int, optional): number of processes. Defaults to 1.
+        resume (bool, optional): restore the stages of each basin from
+            their checkpoint. Defaults to False.
+
+    Returns:
+        list: path to the topo.nc for each basin
+    """
+
+    from basin_setup.generate_topo import GenerateTopo
+
+    logger = logging.getLogger(__name__)
+
+    topos = []
+    for config_file in config_files:
+        gt = GenerateTopo(config_file)
+        gt.set_extents()
+        gt.load_basin_shapefiles()
+        topos.append(gt)
+
+    # the subsets are large, keep them with the output instead of the system
+    # temp folder
+    with tempfile.TemporaryDirectory(
+            prefix='batch_', dir=topos[0].temp_dir) as temp_dir:
+        sources = shared_sources(topos, temp_dir, logger=logger)
+
+        logger.info('Processing {} basins using {} processes'.format(
+            len(config_files), processes))
+
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                return list(executor.map(
+                    run_basin, config_files, sources,
+                    [resume] * len(config_files)))
+
+        return [run_basin(config_file, basin_sources, resume)
+                for config_file, basin_sources in zip(config_files, sources)]
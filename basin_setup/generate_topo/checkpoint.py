@@ -0,0 +1,206 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+import xarray as xr
+
+from basin_setup.utils.tile_index import source_files
+
+
+def file_fingerprint(path):
+    """Size and modification time of the files for a path. Shapefiles
+    include all their sidecar files, directories and globs include all the
+    raster tiles.
+
+    Args:
+        path (str): file, directory or glob pattern
+
+    Returns:
+        list: [path, size, mtime] for each file, empty if nothing exists
+    """
+
+    if path is None:
+        return []
+
+    if os.path.splitext(path)[1].lower() == '.shp':
+        files = sorted(glob.glob(os.path.splitext(path)[0] + '.*'))
+    else:
+        files = source_files(path)
+
+    fingerprint = []
+    for f in files:
+        stat = os.stat(f)
+        fingerprint.append([os.path.abspath(f), stat.st_size, stat.st_mtime])
+
+    return fingerprint
+
+
+def fingerprint(*values):
+    """Hash of json serializable values, anything else is converted to a
+    string
+
+    Returns:
+        str: sha256 hex digest
+    """
+
+    return hashlib.sha256(
+        json.dumps(values, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def load_dataset(path):
+    """Load a checkpointed dataset into memory and close the file. The
+    coordinates encoding is removed so the spatial_ref isn't added to the
+    variable attributes in the topo.nc.
+
+    Args:
+        path (str): netcdf file
+
+    Returns:
+        xr.Dataset: dataset with the grid mapping decoded like rioxarray
+    """
+
+    with xr.open_dataset(path, decode_coords='all') as ds:
+        ds = ds.load()
+
+    for variable in ds.variables.values():
+        variable.encoding.pop('coordinates', None)
+
+    return ds
+
+
+def save_dem(gt, path):
+    gt.dem.to_dataset().to_netcdf(path)
+
+
+def restore_dem(gt, path):
+    gt.dem = load_dataset(path)['dem']
+
+
+def save_vegetation(gt, path):
+    xr.merge([gt.veg.veg_tau_k, gt.veg.veg_height.to_dataset()]).to_netcdf(
+        path)
+
+
+def restore_vegetation(gt, path):
+    ds = load_dataset(path)
+
+    veg = gt.vegetation()
+    veg.veg_tau_k = ds[['veg_type', 'veg_tau', 'veg_k']]
+    veg.veg_height = ds['veg_height']
+    gt.veg = veg
+
+
+def save_masks(gt, path):
+    gt.masks.to_netcdf(path)
+
+
+def restore_masks(gt, path):
+    gt.masks = load_dataset(path)
+
+
+# Functions to save and restore the result of each stage, the topo.nc is
+# the result of create_netcdf
+STAGES = {
+    'load_dem': (save_dem, restore_dem),
+    'load_vegetation': (save_vegetation, restore_vegetation),
+    'create_masks': (save_masks, restore_masks),
+    'create_netcdf': (None, None),
+}
+
+
+class Checkpoint():
+    """Results of the `GenerateTopo` stages saved in a folder with a json
+    manifest of the fingerprint of each stage's inputs. A stage can be
+    restored if the fingerprint is the same and the saved files exist.
+
+    Args:
+        folder (str): folder for the manifest and stage results
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, folder) -> None:
+        self.folder = folder
+        self.manifest_file = os.path.join(folder, self.MANIFEST)
+
+        self.manifest = {}
+        if os.path.isfile(self.manifest_file):
+            with open(self.manifest_file) as f:
+                self.manifest = json.load(f)
+
+    def path(self, stage):
+        return os.path.join(self.folder, '{}.nc'.format(stage))
+
+    def valid(self, stage, stage_fingerprint):
+        """Check if a stage can be restored
+
+        Args:
+            stage (str): stage name
+            stage_fingerprint (str): fingerprint of the current inputs
+
+        Returns:
+            bool: True if the stage was saved with the same inputs
+        """
+
+        entry = self.manifest.get(stage)
+
+        return entry is not None and \
+            entry['fingerprint'] == stage_fingerprint and \
+            all([os.path.isfile(f) for f in entry['files']])
+
+    def save(self, gt, stage, stage_fingerprint, files=None):
+        """Save the result of a stage and record it in the manifest
+
+        Args:
+            gt (GenerateTopo): instance that ran the stage
+            stage (str): stage name
+            stage_fingerprint (str): fingerprint of the stage inputs
+            files (list, optional): files created by the stage that are
+                not saved by the checkpoint. Defaults to None.
+        """
+
+        os.makedirs(self.folder, exist_ok=True)
+
+        # remove the stage first so a failed save can't be restored
+        self.manifest.pop(stage, None)
+        self.write()
+
+        files = list(files or [])
+        save, _ = STAGES[stage]
+        if save is not None:
+            save(gt, self.path(stage))
+            files.append(self.path(stage))
+
+        self.manifest[stage] = {
+            'fingerprint': stage_fingerprint,
+            'files': files
+        }
+        self.write()
+
+    def restore(self, gt, stage):
+        """Restore the result of a stage onto the `GenerateTopo` instance
+
+        Args:
+            gt (GenerateTopo): instance to restore the stage onto
+            stage (str): stage name
+        """
+
+        _, restore = STAGES[stage]
+        if restore is not None:
+            restore(gt, self.path(stage))
+
+    def write(self):
+        temp_file = self.manifest_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_file, self.manifest_file)
+
+    def clear(self):
+        """Remove the checkpoint folder"""
+
+        self.manifest = {}
+        if os.path.isdir(self.folder):
+            shutil.rmtree(self.folder)
@@ -1,20 +1,29 @@
 import logging
 import os
+import shutil
 from datetime import datetime
 
+import numpy as np
+import rasterio
 import rioxarray
 import xarray as xr
 
 from basin_setup import __version__
 from basin_setup.generate_topo import vegetation
-from basin_setup.generate_topo.shapefile import Shapefile
+from basin_setup.generate_topo.checkpoint import (Checkpoint, file_fingerprint,
+                                                  fingerprint)
+from basin_setup.generate_topo.shapefile import (Shapefile, overlap_layers,
+                                                 rasterize_masks)
+from basin_setup.generate_topo.tiles import run_tiles, stitch
 from basin_setup.utils import config, domain_extent, gdal
-from basin_setup.utils.logger import BasinSetupLogger
+from basin_setup.utils.logger import BasinSetupLogger, log_peak_memory
+from basin_setup.utils.tile_index import TileIndex
+from basin_setup.utils.zonal import hypsometry, zonal_stats
 
 
 class GenerateTopo():
 
-    def __init__(self, config_file):
+    def __init__(self, config_file, resume=False):
 
         self.ucfg, self.configFile = config.read(config_file)
         self.config = self.ucfg.cfg['generate_topo']
@@ -34,15 +43,150 @@ class GenerateTopo():
 
         self.images = {}
 
+        # Paths to use in place of the source images in the config, set by
+        # the batch run to subsets shared by multiple basins
+        self.sources = {}
+
+        # The tiles run the stages in their own folders and the summary
+        # needs the whole domain
+        if self.config['tile_size'] is not None:
+            for option, value in [('checkpoint', self.config['checkpoint']),
+                                  ('resume', resume),
+                                  ('zonal_summary',
+                                   self.config['zonal_summary'])]:
+                if value:
+                    raise ValueError(
+                        '{} is not available with tile_size'.format(option))
+
+        # Stage results are saved to restore them with `resume`
+        self.resume = resume
+        self.checkpoint = None
+        if self.config['checkpoint'] or resume:
+            self.checkpoint = Checkpoint(
+                os.path.join(self.temp_dir, 'checkpoint'))
+
     def run(self):
         """Helper method to run the full workflow for `GenerateTopo`
         """
 
         self.set_extents()
+
+        if self.config['tile_size'] is not None:
+            self.run_tiled()
+            return
+
         self.load_basin_shapefiles()
-        self.load_dem()
-        self.load_vegetation()
-        self.create_netcdf()
+        self.run_stage('load_dem')
+        self.run_stage('load_vegetation')
+        self.run_stage('create_masks')
+        self.run_stage('create_netcdf')
+
+        if self.checkpoint is not None and not self.debug:
+            self.checkpoint.clear()
+
+    def run_stage(self, stage):
+        """Run a stage and save the result to the checkpoint. When resuming,
+        the stage is restored from the checkpoint instead if its inputs
+        have not changed.
+
+        Args:
+            stage (str): name of the stage method
+        """
+
+        if self.checkpoint is None:
+            getattr(self, stage)()
+            return
+
+        stage_fingerprint = self.stage_fingerprint(stage)
+        if self.resume and self.checkpoint.valid(stage, stage_fingerprint):
+            self._logger.info('Restoring {} from the checkpoint'.format(stage))
+            self.checkpoint.restore(self, stage)
+            return
+
+        getattr(self, stage)()
+
+        files = None
+        if stage == 'create_netcdf':
+            files = [os.path.join(self.config['output_folder'], 'topo.nc')]
+        self.checkpoint.save(self, stage, stage_fingerprint, files=files)
+
+    def stage_fingerprint(self, stage):
+        """Fingerprint of the config values and files a stage depends on.
+        All stages depend on the domain and the basin shapefile, the
+        fingerprint for `create_netcdf` includes all the other stages.
+
+        Args:
+            stage (str): name of the stage method
+
+        Returns:
+            str: fingerprint of the stage inputs
+        """
+
+        inputs = [
+            stage,
+            self.extents,
+            self.cell_size,
+            str(self.crs),
+            file_fingerprint(self.config['basin_shapefile']),
+        ]
+
+        if stage == 'load_dem':
+            inputs.append(self.source_fingerprint('dem'))
+
+        elif stage == 'load_vegetation':
+            # the vegetation class sets the default veg_params_csv
+            veg = self.vegetation()
+            inputs += [
+                self.config['vegetation_dataset'],
+                self.config['bypass_veg_check'],
+                file_fingerprint(self.config['veg_params_csv']),
+                self.source_fingerprint('veg_type'),
+                self.source_fingerprint('veg_height'),
+            ]
+            if self.config['vegetation_dataset'] is not None:
+                inputs.append(file_fingerprint(veg.veg_height_csv))
+
+        elif stage == 'create_masks':
+            inputs += [
+                self.config['basin_name'],
+                self.config['subbasin_encoding'],
+            ]
+            inputs += [file_fingerprint(f)
+                       for f in self.config['sub_basin_files'] or []]
+
+        elif stage == 'create_netcdf':
+            inputs += [
+                self.stage_fingerprint(previous)
+                for previous in ['load_dem', 'load_vegetation', 'create_masks']
+            ]
+            inputs += [
+                self.config['zonal_summary'],
+                self.config['elevation_band_size'],
+            ]
+            inputs.append(__version__)
+
+        return fingerprint(*inputs)
+
+    def source_fingerprint(self, name):
+        """Fingerprint of a source image. The subsets shared by a batch run
+        are new files every run, so a subset is fingerprinted by its
+        original source and its bounds.
+
+        Args:
+            name (str): `dem`, `veg_type` or `veg_height`
+
+        Returns:
+            list: fingerprint of the source
+        """
+
+        source = self.source_images(subsets=False).get(name)
+        inputs = [file_fingerprint(source)]
+
+        if name in self.sources:
+            with rasterio.open(self.sources[name]) as src:
+                inputs.append(list(src.bounds))
+
+        return inputs
 
     def set_extents(self):
         """Set the extents to clip the rasters to. This will either use
@@ -77,6 +221,49 @@ class GenerateTopo():
         self.transform, self.x, self.y = domain_extent.affine_transform_from_extents(  # noqa
             extents, self.cell_size)
 
+    def run_tiled(self):
+        """Run the workflow in tiles of `tile_size` cells, each tile is
+        processed independently (optionally in parallel) with a halo of
+        `tile_halo` cells. The tiles are then stitched into a single
+        chunked topo.nc without the halos.
+        """
+
+        tiles = domain_extent.tile_extents(
+            self.extents,
+            self.cell_size,
+            self.config['tile_size'],
+            halo=self.config['tile_halo']
+        )
+
+        self._logger.info('Processing {} tiles using {} processes'.format(
+            len(tiles), self.config['processes']))
+
+        tile_files = run_tiles(
+            self.ucfg,
+            tiles,
+            self.temp_dir,
+            processes=self.config['processes'],
+            sources=self.sources
+        )
+
+        output_path = os.path.join(self.config['output_folder'], 'topo.nc')
+        stitch(
+            tile_files,
+            tiles,
+            self.transform,
+            len(self.x),
+            len(self.y),
+            output_path,
+            self.config['tile_size']
+        )
+
+        if not self.debug:
+            for tile_file in tile_files:
+                shutil.rmtree(os.path.dirname(tile_file))
+
+        self._logger.info('topo.nc file at {}'.format(output_path))
+
+    @log_peak_memory
     def load_basin_shapefiles(self):
         """ Load the basin and sub basin shapefiles into `Shapefile` class
         """
@@ -94,6 +281,7 @@ class GenerateTopo():
             for sub_basin_file in self.config['sub_basin_files']:
                 self.basin_shapefiles.append(Shapefile(sub_basin_file))
 
+    @log_peak_memory
     def load_dem(self):
         """Reproject and crop the DEM file to a new image
         """
@@ -102,8 +290,12 @@ class GenerateTopo():
 
         self.images['dem'] = os.path.join(self.temp_dir, 'clipped_dem.tif')
 
+        dem_file = self.sources.get('dem', self.config['dem_file'])
+        if not os.path.isfile(dem_file):
+            dem_file = self.mosaic_dem(dem_file)
+
         gdal.gdalwarp(
-            self.config['dem_file'],
+            dem_file,
             self.images['dem'],
             self.crs['init'],
             self.extents,
@@ -123,6 +315,70 @@ class GenerateTopo():
         if not self.debug:
             os.remove(self.images['dem'])
 
+    def mosaic_dem(self, source):
+        """Mosaic the DEM tiles that intersect the domain into a VRT
+
+        Args:
+            source (str): directory or glob pattern of DEM tiles
+
+        Returns:
+            str: path to the VRT
+        """
+
+        index = TileIndex(source)
+        tiles = index.intersecting(self.extents, self.crs['init'])
+
+        self._logger.info('Mosaicking {} of {} DEM tiles'.format(
+            len(tiles), len(index.tiles)))
+
+        vrt = os.path.join(self.temp_dir, 'dem_mosaic.vrt')
+        gdal.gdalbuildvrt(tiles, vrt, logger=self._logger)
+
+        return vrt
+
+    def vegetation(self, sources=None):
+        """Vegetation class for the `vegetation_dataset`
+
+        Args:
+            sources (dict, optional): paths to use in place of the config
+                paths. Defaults to `sources`.
+
+        Returns:
+            BaseVegetation: vegetation instance for the dataset
+        """
+
+        if sources is None:
+            sources = self.sources
+
+        if self.config['vegetation_dataset'] == 'landfire_1.4.0':
+            return vegetation.Landfire140(self.config, sources=sources)
+        elif self.config['vegetation_dataset'] == 'landfire_2.0.0':
+            return vegetation.Landfire200(self.config, sources=sources)
+
+        return vegetation.BaseVegetation(self.config, sources=sources)
+
+    def source_images(self, subsets=True):
+        """Source rasters that are reprojected and cropped to the domain
+
+        Args:
+            subsets (bool, optional): include the paths overridden in
+                `sources`. Defaults to True.
+
+        Returns:
+            dict: path to the source for `dem`, `veg_type` and `veg_height`
+        """
+
+        sources = self.sources if subsets else {}
+        images = {'dem': sources.get('dem', self.config['dem_file'])}
+
+        if self.config['vegetation_dataset'] is not None:
+            veg = self.vegetation(sources)
+            images['veg_type'] = veg.veg_type_image
+            images['veg_height'] = veg.veg_height_image
+
+        return images
+
+    @log_peak_memory
     def load_vegetation(self):
         """Load the vegetation images and parse based on which dataset
         is desired
@@ -130,16 +386,12 @@ class GenerateTopo():
 
         self._logger.info('Loading vegetation dataset')
 
+        veg = self.vegetation()
+
         if self.config['vegetation_dataset'] is None:
-            veg = vegetation.BaseVegetation(self.config)
             veg.empty(self.dem)
 
-        elif 'landfire' in self.config['vegetation_dataset']:
-            if self.config['vegetation_dataset'] == 'landfire_1.4.0':
-                veg = vegetation.Landfire140(self.config)
-            elif self.config['vegetation_dataset'] == 'landfire_2.0.0':
-                veg = vegetation.Landfire200(self.config)
-
+        else:
             veg.reproject(self.extents, self.cell_size, self.crs['init'])
             veg.load_clipped_images()
             veg.calculate_tau_and_k()
@@ -148,18 +400,31 @@ class GenerateTopo():
         veg.set_attributes()
         self.veg = veg
 
-    def create_netcdf(self):
-        """Create a netcdf topo.nc file.
+    @log_peak_memory
+    def create_masks(self):
+        """Rasterize the basin and sub basin shapefiles. The sub basins
+        are either a mask per sub basin or a single `subbasin_id` raster
+        depending on `subbasin_encoding`.
         """
 
-        self._logger.info('Create and output netcdf for topo.nc')
+        self._logger.info('Creating the basin masks')
+
+        labels = self.config['subbasin_encoding'] == 'labels'
+        shapefiles = self.basin_shapefiles[:1] if labels \
+            else self.basin_shapefiles
+
+        layers = rasterize_masks(
+            shapefiles,
+            len(self.x),
+            len(self.y),
+            self.transform,
+            processes=self.config['processes']
+        )
 
         # convert the basin mask to DataArray, will be encoded as ubyte
         mask = []
-        for i, shapefile in enumerate(self.basin_shapefiles):
-            basin = self.dem.copy()
-            basin.values = shapefile.mask(
-                len(self.x), len(self.y), self.transform)
+        for i, layer in enumerate(layers):
+            basin = self.dem.copy(data=layer)
 
             if i == 0:
                 basin.name = 'mask'
@@ -171,18 +436,216 @@ class GenerateTopo():
                     'long_name': config.proper_name('Sub basin name')}
 
             mask.append(basin.to_dataset())
-        mask = xr.combine_by_coords(mask)
+
+        if labels and len(self.basin_shapefiles) > 1:
+            mask.append(self.subbasin_labels(self.basin_shapefiles[1:]))
+
+        self.masks = xr.combine_by_coords(mask)
+
+    def subbasin_labels(self, shapefiles):
+        """Encode the sub basins as labelled rasters. Cells in the n-th sub
+        basin have a `subbasin_id` of n and 0 is outside all sub basins.
+        Sub basins that overlap, i.e. nested gauges, are put on separate
+        `subbasin_layer` layers so no sub basin is truncated. The
+        `subbasin_name` and `subbasin_layer_index` lookup tables hold the
+        name and layer of each sub basin in order.
+
+        Args:
+            shapefiles (list): sub basin `Shapefile` instances
+
+        Returns:
+            xr.Dataset: dataset with `subbasin_id`, `subbasin_name` and
+                `subbasin_layer_index`
+        """
+
+        ids = np.arange(1, len(shapefiles) + 1)
+        names = [
+            config.proper_name(
+                os.path.splitext(os.path.basename(shapefile.file_name))[0])
+            for shapefile in shapefiles
+        ]
+
+        # overlaps less than half a cell are slivers between neighbours
+        layers = overlap_layers(
+            shapefiles, min_area=0.5 * self.cell_size**2)
+        self._logger.debug('{} sub basins on {} layers'.format(
+            len(shapefiles), max(layers) + 1))
+
+        labels = xr.DataArray(
+            np.zeros((max(layers) + 1,) + self.dem.shape, dtype=np.uint16),
+            coords=self.dem.coords,
+            dims=('subbasin_layer',) + self.dem.dims
+        )
+        for subbasin_id, layer, shapefile in zip(ids, layers, shapefiles):
+            inside = shapefile.mask(
+                len(self.x), len(self.y), self.transform) == 1
+            labels.values[layer][inside] = subbasin_id
+
+        labels.name = 'subbasin_id'
+        labels.attrs = {
+            'long_name': 'Sub basin id',
+            'flag_values': ids.astype(np.uint16),
+            'flag_meanings': ' '.join(
+                [name.replace(' ', '_') for name in names])
+        }
+
+        ds = labels.to_dataset()
+        ds['subbasin_name'] = xr.DataArray(
+            np.array(names, dtype=object),
+            coords={'subbasin': ids},
+            dims='subbasin',
+            attrs={'long_name': 'Sub basin name'}
+        )
+        ds['subbasin_layer_index'] = xr.DataArray(
+            np.array(layers, dtype=np.uint16),
+            coords={'subbasin': ids},
+            dims='subbasin',
+            attrs={'long_name': 'Sub basin layer in subbasin_id'}
+        )
+
+        return ds
+
+    def zone_labels(self, ds):
+        """Label rasters of the basin and sub basins, a sub basin is
+        labelled on the `subbasin_id` layer it is on or by its own
+        `subbasin_mask`
+
+        Args:
+            ds (xr.Dataset): topo dataset
+
+        Returns:
+            tuple: zone names and a list of the label raster with the zone
+                of each of its labels
+        """
+
+        names = [ds['mask'].attrs['long_name']]
+        rasters = [(ds['mask'].values, {1: 0})]
+
+        if 'subbasin_id' in ds:
+            layers = ds['subbasin_layer_index'].values
+            ids = ds['subbasin'].values
+            for layer in np.unique(layers):
+                zones = {}
+                for subbasin_id in ids[layers == layer]:
+                    zones[subbasin_id] = len(names)
+                    names.append(str(ds['subbasin_name'].sel(
+                        subbasin=subbasin_id).values))
+                rasters.append(
+                    (ds['subbasin_id'].isel(subbasin_layer=layer).values,
+                     zones))
+
+        elif 'subbasin_mask' in ds:
+            rasters.append((ds['subbasin_mask'].values, {1: len(names)}))
+            names.append(ds['subbasin_mask'].attrs['long_name'])
+
+        return names, rasters
+
+    def zonal_summary(self, ds):
+        """Area, elevation, mean vegetation parameters and hypsometry of
+        the basin and every sub basin. Each statistic is a `np.bincount`
+        over the label rasters so consumers don't need to read the grids.
+
+        Args:
+            ds (xr.Dataset): topo dataset
+
+        Returns:
+            xr.Dataset: summary variables on the `zone` and
+                `elevation_band` dimensions
+        """
+
+        self._logger.info('Calculating the basin and sub basin statistics')
+
+        band_size = self.config['elevation_band_size']
+        dem = ds['dem'].values
+        origin = np.floor(np.nanmin(dem) / band_size) * band_size
+        n_bands = int((np.nanmax(dem) - origin) // band_size) + 1
+        bands = origin + np.arange(n_bands) * band_size
+
+        names, rasters = self.zone_labels(ds)
+        n = len(names)
+
+        stats = {
+            'area': np.zeros(n),
+            'dem_mean': np.full(n, np.nan),
+            'dem_min': np.full(n, np.nan),
+            'dem_max': np.full(n, np.nan),
+            'veg_height_mean': np.full(n, np.nan),
+            'veg_tau_mean': np.full(n, np.nan),
+            'veg_k_mean': np.full(n, np.nan),
+        }
+        fractions = np.zeros((n, n_bands))
+
+        for labels, zones in rasters:
+            df = zonal_stats(labels, dem, nodata=0,
+                             cell_area=self.cell_size**2)
+            for key in ['veg_height', 'veg_tau', 'veg_k']:
+                df[key] = zonal_stats(labels, ds[key].values,
+                                      nodata=0)['mean']
+            df = df.reindex(list(zones))
+
+            index = list(zones.values())
+            stats['area'][index] = df['area'].fillna(0)
+            for key in ['mean', 'min', 'max']:
+                stats['dem_' + key][index] = df[key]
+            for key in ['veg_height', 'veg_tau', 'veg_k']:
+                stats[key + '_mean'][index] = df[key]
+
+            hyps = hypsometry(labels, dem, band_size, origin=origin,
+                              nodata=0).reindex(list(zones), fill_value=0)
+            fractions[index, :hyps.shape[1]] = hyps.values
+
+        attrs = {
+            'area': {'long_name': 'Area', 'units': 'm^2'},
+            'dem_mean': {'long_name': 'Mean elevation', 'units': 'meters'},
+            'dem_min': {'long_name': 'Minimum elevation', 'units': 'meters'},
+            'dem_max': {'long_name': 'Maximum elevation', 'units': 'meters'},
+            'veg_height_mean': {'long_name': 'Mean vegetation height',
+                                'units': 'meters'},
+            'veg_tau_mean': {'long_name': 'Mean vegetation tau'},
+            'veg_k_mean': {'long_name': 'Mean vegetation k'},
+        }
+
+        zone = np.arange(n)
+        summary = xr.Dataset(coords={
+            'zone': zone,
+            'elevation_band': xr.DataArray(
+                bands, dims='elevation_band',
+                attrs={'long_name': 'Bottom of the elevation band',
+                       'units': 'meters',
+                       'band_size': band_size})
+        })
+        summary['zone_name'] = xr.DataArray(
+            np.array(names, dtype=object), dims='zone',
+            attrs={'long_name': 'Basin or sub basin name'})
+        for key, values in stats.items():
+            summary['zone_' + key] = xr.DataArray(
+                values, dims='zone', attrs=attrs[key])
+        summary['zone_hypsometry'] = xr.DataArray(
+            fractions, dims=('zone', 'elevation_band'),
+            attrs={'long_name': 'Area fraction in each elevation band'})
+
+        return summary
+
+    @log_peak_memory
+    def create_netcdf(self):
+        """Create a netcdf topo.nc file.
+        """
+
+        self._logger.info('Create and output netcdf for topo.nc')
 
         output = xr.combine_by_coords([
             self.dem.to_dataset(),
             self.veg.veg_tau_k,
             self.veg.veg_height.to_dataset(),
-            mask
+            self.masks
         ])
 
+        if self.config['zonal_summary']:
+            output = output.merge(self.zonal_summary(output))
+
         # The shapefile are the basis for the projection
         # Also change to projection to keep in line with other topo.nc files
-        output['projection'] = mask['spatial_ref']
+        output['projection'] = self.masks['spatial_ref']
         del output['spatial_ref']
 
         # set attributes for x/y dimensions
@@ -200,7 +663,10 @@ class GenerateTopo():
         }
 
         for key in list(output.keys()):
-            output[key].attrs["grid_mapping"] = "projection"
+            if 'x' in output[key].dims and 'y' in output[key].dims:
+                # rioxarray keeps the grid mapping in the encoding
+                output[key].encoding.pop('grid_mapping', None)
+                output[key].attrs["grid_mapping"] = "projection"
 
         # Global attributes
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -215,18 +681,23 @@ class GenerateTopo():
                             'Watershed Research Center')
         }
 
+        encoding = {
+            "x": {"dtype": "f4"},
+            "y": {"dtype": "f4"},
+            "veg_type": {"dtype": 'u2'},
+            "veg_height": {"dtype": "f4"},
+            "veg_tau": {"dtype": "f4"},
+            "veg_k": {"dtype": "f4"},
+        }
+        if 'subbasin_id' in output:
+            encoding['subbasin_id'] = {"dtype": "u2"}
+            encoding['subbasin_layer_index'] = {"dtype": "u2"}
+
         output_path = os.path.join(self.config['output_folder'], 'topo.nc')
         output.to_netcdf(
             output_path,
             format='NETCDF4',
-            encoding={
-                "x": {"dtype": "f4"},
-                "y": {"dtype": "f4"},
-                "veg_type": {"dtype": 'u2'},
-                "veg_height": {"dtype": "f4"},
-                "veg_tau": {"dtype": "f4"},
-                "veg_k": {"dtype": "f4"},
-            }
+            encoding=encoding
         )
 
         self._logger.info('topo.nc file at {}'.format(output_path))
@@ -1,9 +1,20 @@
+from concurrent.futures import ProcessPoolExecutor
+
 import geopandas as gpd
-from rasterio import features
+import numpy as np
+from rasterio import features, windows
+
+from basin_setup.utils import domain_extent
 
 
 class Shapefile():
 
+    # Fraction of the cell size to simplify the geometries by before
+    # rasterizing them, i.e. 0.05. A cell center close to the boundary can
+    # still change sides so it defaults to 0, the full resolution
+    # geometries.
+    SIMPLIFY_TOLERANCE = 0
+
     def __init__(self, file_name) -> None:
         self.file_name = file_name
         self.polygon = gpd.read_file(self.file_name)
@@ -24,9 +35,149 @@ class Shapefile():
             np.ndarray: 1 for locations inside the mask, 0 for outside
         """
 
-        return features.rasterize(
-            self.polygon.geometry,
-            out_shape=(ny, nx),
+        mask = np.zeros((ny, nx), dtype=np.uint8)
+        burn(list(self.polygon.geometry), mask, transform)
+
+        return mask
+
+
+def simplify(geometry, cell_size):
+    """Simplify a geometry relative to the cell size it will be rasterized
+    at with `Shapefile.SIMPLIFY_TOLERANCE`, keeping the topology so the
+    geometry stays valid.
+
+    Args:
+        geometry (shapely.geometry): geometry to simplify
+        cell_size (float): cell size of the grid
+
+    Returns:
+        shapely.geometry: simplified geometry
+    """
+
+    tolerance = abs(cell_size) * Shapefile.SIMPLIFY_TOLERANCE
+    if tolerance == 0:
+        return geometry
+
+    return geometry.simplify(tolerance, preserve_topology=True)
+
+
+def burn(geometries, out, transform):
+    """Rasterize each geometry into `out` only inside the geometry's
+    bounding box window of the grid. The geometries are simplified before
+    rasterizing when `Shapefile.SIMPLIFY_TOLERANCE` is set.
+
+    Args:
+        geometries (list): shapely geometries
+        out (np.ndarray): uint8 grid to set to 1 inside the geometries
+        transform (list): Affine transformation of `out`
+    """
+
+    ny, nx = out.shape
+    for geometry in geometries:
+        if geometry is None or geometry.is_empty:
+            continue
+
+        window = domain_extent.bounds_window(
+            geometry.bounds, transform, nx, ny)
+        if window is None:
+            continue
+
+        rows, cols = window.toslices()
+        out[rows, cols] |= features.rasterize(
+            [simplify(geometry, transform.a)],
+            out_shape=(window.height, window.width),
             fill=0,
-            transform=transform
+            transform=windows.transform(window, transform),
+            dtype=np.uint8
         )
+
+
+def overlap_layers(shapefiles, min_area=0):
+    """Assign each shapefile to the first layer where it does not overlap
+    the shapefiles already on that layer, i.e. nested sub basins are put
+    on separate layers. The layers only depend on the polygons so every
+    tile of a domain gets the same layers.
+
+    Args:
+        shapefiles (list): `Shapefile` instances
+        min_area (float, optional): polygons that overlap by this area or
+            less can share a layer, i.e. slivers along shared
+            boundaries. Defaults to 0.
+
+    Returns:
+        list: layer index for each shapefile
+    """
+
+    layers = []
+    members = []
+    for shapefile in shapefiles:
+        geometry = shapefile.polygon.geometry.unary_union
+
+        for layer, others in enumerate(members):
+            if not any([
+                geometry.intersects(other) and
+                geometry.intersection(other).area > min_area
+                for other in others
+            ]):
+                break
+        else:
+            layer = len(members)
+            members.append([])
+
+        members[layer].append(geometry)
+        layers.append(layer)
+
+    return layers
+
+
+def _rasterize_layer(grid, layer, geometries):
+    """Rasterize the geometries into a layer of the shared grid"""
+
+    burn(geometries, grid.array[layer], grid.transform)
+
+
+def rasterize_masks(shapefiles, nx, ny, transform, processes=1):
+    """Create a mask for each shapefile. With more than one process each
+    shapefile is rasterized in a separate process directly into a memory
+    mapped grid, so the masks are not pickled back from the workers. The
+    masks returned are views of the grid.
+
+    Args:
+        shapefiles (list): `Shapefile` instances
+        nx (int): number of x cells
+        ny (int): number of y cells
+        transform (list): Affine transformation
+        processes (int, optional): number of processes. Defaults to 1.
+
+    Returns:
+        list: mask for each shapefile, 1 inside and 0 outside
+    """
+
+    if processes <= 1 or len(shapefiles) < 2:
+        return [shapefile.mask(nx, ny, transform) for shapefile in shapefiles]
+
+    from basin_setup.utils.shared_grid import MEMORY_DIRECTORY, SharedGrid
+
+    n = len(shapefiles)
+    grid = SharedGrid.create(
+        (n, ny, nx),
+        np.uint8,
+        backend='memmap',
+        directory=MEMORY_DIRECTORY,
+        transform=transform
+    )
+
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            list(executor.map(
+                _rasterize_layer,
+                [grid] * n,
+                range(n),
+                [list(shapefile.polygon.geometry) for shapefile in shapefiles]
+            ))
+    except Exception:
+        grid.close()
+        grid.unlink()
+        raise
+
+    return list(np.asarray(grid.detach()))
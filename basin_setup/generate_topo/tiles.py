@@ -0,0 +1,164 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+
+import netCDF4 as nc
+import numpy as np
+
+
+def run_tile(ucfg, tile, output_folder, sources=None):
+    """Run `GenerateTopo` for a single tile. The tile is a full
+    `GenerateTopo` run with the extents set to the tile's halo extents
+    and the output in it's own folder.
+
+    Args:
+        ucfg (UserConfig): user config for the full domain
+        tile (Tile): tile to process
+        output_folder (str): folder for the tile topo.nc
+        sources (dict, optional): source images to use in place of the
+            config paths. Defaults to None.
+
+    Returns:
+        str: path to the tile topo.nc
+    """
+
+    # import here to avoid a circular import with `GenerateTopo`
+    from basin_setup.generate_topo import GenerateTopo
+
+    ucfg = deepcopy(ucfg)
+    os.makedirs(output_folder, exist_ok=True)
+    ucfg.cfg['generate_topo'].update({
+        'coordinate_extent': tile.halo_extents,
+        'output_folder': output_folder,
+        'tile_size': None,
+        'processes': 1,
+        'checkpoint': False,
+        'zonal_summary': False,
+    })
+
+    gt = GenerateTopo(ucfg)
+    gt.sources = sources or {}
+    gt.run()
+
+    return os.path.join(output_folder, 'topo.nc')
+
+
+def run_tiles(ucfg, tiles, temp_dir, processes=1, sources=None):
+    """Run all the tiles, in parallel if `processes` is greater than 1
+
+    Args:
+        ucfg (UserConfig): user config for the full domain
+        tiles (list): list of `Tile` to process
+        temp_dir (str): folder to put the tile output folders in
+        processes (int, optional): number of processes. Defaults to 1.
+        sources (dict, optional): source images to use in place of the
+            config paths. Defaults to None.
+
+    Returns:
+        list: path to the topo.nc for each tile
+    """
+
+    folders = [
+        os.path.join(temp_dir, 'tile_{}_{}'.format(tile.row, tile.col))
+        for tile in tiles
+    ]
+
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return list(executor.map(
+                run_tile, [ucfg] * len(tiles), tiles, folders,
+                [sources] * len(tiles)))
+
+    return [run_tile(ucfg, tile, folder, sources)
+            for tile, folder in zip(tiles, folders)]
+
+
+def is_grid(variable):
+    """Check if the last two dimensions of a netcdf variable are y and x"""
+
+    return variable.dimensions[-2:] == ('y', 'x')
+
+
+def stitch(tile_files, tiles, transform, nx, ny, output_path, tile_size):
+    """Stitch the tile topo.nc files into a single chunked topo.nc. The
+    variables, attributes and encoding are taken from the first tile, then
+    the core of each tile (without the halo) is copied into the output one
+    tile at a time. Variables without the y and x dimensions, i.e. the sub
+    basin lookup tables, are the same in every tile and copied from the
+    first tile.
+
+    Args:
+        tile_files (list): topo.nc for each tile
+        tiles (list): `Tile` for each file in `tile_files`
+        transform (Affine): transform of the full domain
+        nx (int): number of x cells in the full domain
+        ny (int): number of y cells in the full domain
+        output_path (str): path for the stitched topo.nc
+        tile_size (int): number of cells on each side of a tile, used for
+            the chunk sizes
+    """
+
+    logger = logging.getLogger(__name__)
+    logger.info('Stitching {} tiles into {}'.format(
+        len(tiles), output_path))
+
+    # cell centers, same as rioxarray
+    coords = {
+        'x': transform.c + (np.arange(nx) + 0.5) * transform.a,
+        'y': transform.f + (np.arange(ny) + 0.5) * transform.e,
+    }
+
+    dst = nc.Dataset(output_path, 'w', format='NETCDF4')
+    dst.set_auto_maskandscale(False)
+
+    with nc.Dataset(tile_files[0]) as src:
+        dst.setncatts(src.__dict__)
+        for name, dimension in src.dimensions.items():
+            size = {'y': ny, 'x': nx}.get(name, len(dimension))
+            dst.createDimension(name, None if dimension.isunlimited()
+                                else size)
+
+        for name, variable in src.variables.items():
+            chunksizes = None
+            if is_grid(variable):
+                chunksizes = (1,) * (len(variable.dimensions) - 2) + \
+                    (min(tile_size, ny), min(tile_size, nx))
+
+            attrs = variable.__dict__.copy()
+            var = dst.createVariable(
+                name,
+                variable.datatype,
+                variable.dimensions,
+                fill_value=attrs.pop('_FillValue', None),
+                chunksizes=chunksizes
+            )
+
+            if name == 'projection' and 'GeoTransform' in attrs:
+                attrs['GeoTransform'] = ' '.join(
+                    [str(v) for v in transform.to_gdal()])
+            var.setncatts(attrs)
+
+            if name in coords:
+                var[:] = coords[name]
+            elif variable.dimensions == ():
+                var.assignValue(variable.getValue())
+            elif not is_grid(variable):
+                var[:] = variable[:]
+
+    for tile, tile_file in zip(tiles, tile_files):
+        logger.debug('Adding tile {}, {}'.format(tile.row, tile.col))
+
+        window = tile.window
+        rows = slice(window.row_off, window.row_off + window.height)
+        cols = slice(window.col_off, window.col_off + window.width)
+
+        with nc.Dataset(tile_file) as src:
+            src.set_auto_maskandscale(False)
+
+            for name, variable in src.variables.items():
+                if is_grid(variable):
+                    dst[name][..., rows, cols] = \
+                        variable[(Ellipsis,) + tuple(tile.core)]
+
+    dst.close()
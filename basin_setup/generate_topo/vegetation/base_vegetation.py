@@ -1,3 +1,4 @@
+import functools
 import logging
 import os
 import pathlib
@@ -11,6 +12,86 @@ import xarray as xr
 from basin_setup.utils import gdal
 
 
+def class_lookup(values, classes, table):
+    """Map an integer class image to float32 values with a lookup table
+    indexed by the class value. Only the float32 output is allocated for
+    each cell, the classes index the table directly unless there are
+    negative classes.
+
+    Args:
+        values (np.ndarray): integer class image
+        classes (np.ndarray): sorted classes in `values`
+        table (np.ndarray): value for each class
+
+    Returns:
+        np.ndarray: float32 image of the class values
+    """
+
+    offset = min(int(classes[0]), 0)
+    lut = np.zeros(int(classes[-1]) - offset + 1, dtype=np.float32)
+    lut[classes - offset] = table
+
+    if offset < 0:
+        values = values - offset
+
+    return lut[values]
+
+
+def read_veg_params(path, index):
+    """Vegetation parameters csv indexed by the vegetation class. The table
+    is cached until the file changes so a worker only parses it once.
+
+    Args:
+        path (str): vegetation parameters csv
+        index (str): column of the vegetation class, the dataset name
+
+    Returns:
+        pd.DataFrame: parameters for each class, shared between calls
+    """
+
+    stat = os.stat(path)
+    return _read_veg_params(
+        os.path.abspath(path), index, stat.st_mtime, stat.st_size)
+
+
+@functools.lru_cache(maxsize=16)
+def _read_veg_params(path, index, mtime, size):
+    return pd.read_csv(path).set_index(index)
+
+
+def read_veg_heights(path):
+    """Vegetation height for each class parsed from the class names in the
+    Landfire csv. The heights are cached until the file changes.
+
+    Args:
+        path (str): Landfire vegetation height csv
+
+    Returns:
+        pd.Series: height for each class, shared between calls
+    """
+
+    stat = os.stat(path)
+    return _read_veg_heights(
+        os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+
+@functools.lru_cache(maxsize=16)
+def _read_veg_heights(path, mtime, size):
+    veg_df = pd.read_csv(path)
+    veg_df.set_index('VALUE', inplace=True)
+
+    # match whole numbers and decimals in the line
+    regex = re.compile(r"(?<!\*)(\d*\.?\d+)(?!\*)")
+    veg_df['height'] = 0  # see assumption in calculate_height
+    for idx, row in veg_df.iterrows():
+        matches = regex.findall(row.CLASSNAMES)
+        if len(matches) > 0:
+            veg_df.loc[idx, 'height'] = np.mean(
+                np.array([float(x) for x in matches]))
+
+    return veg_df['height']
+
+
 class BaseVegetation():
     """Base class for vegetation classes"""
 
@@ -21,10 +102,19 @@ class BaseVegetation():
         'veg_height'
     ]
 
-    def __init__(self, config) -> None:
+    def __init__(self, config, sources=None) -> None:
+        """
+        Args:
+            config (dict): generate_topo section of the user config
+            sources (dict, optional): paths to use in place of the
+                `veg_type` and `veg_height` images in the vegetation
+                folder, i.e. subsets shared between basins. Defaults
+                to None.
+        """
 
         self._logger = logging.getLogger(self.__class__.__module__)
         self.config = config
+        self.sources = sources or {}
 
         if self.config['veg_params_csv'] is None:
             self.config['veg_params_csv'] = os.path.join(
@@ -37,17 +127,17 @@ class BaseVegetation():
 
     @property
     def veg_type_image(self):
-        return os.path.join(
+        return self.sources.get('veg_type', os.path.join(
             self.config['vegetation_folder'],
             self.VEGETATION_TYPE
-        )
+        ))
 
     @property
     def veg_height_image(self):
-        return os.path.join(
+        return self.sources.get('veg_height', os.path.join(
             self.config['vegetation_folder'],
             self.VEGETATION_HEIGHT
-        )
+        ))
 
     @property
     def veg_height_csv(self):
@@ -127,15 +217,11 @@ class BaseVegetation():
         self._logger.debug('Calculating veg tau and k')
 
         # Open the key provided by Landfire to assign values in Tau and K
-        veg_df = pd.read_csv(self.config['veg_params_csv'])
-        veg_df.set_index(self.DATASET, inplace=True)
+        veg_df = read_veg_params(self.config['veg_params_csv'], self.DATASET)
 
-        # create NaN filled DataArray's to populate
-        veg_tau = self.ds['veg_type'].copy() * np.NaN
-        veg_k = self.ds['veg_type'].copy() * np.NaN
+        veg_types = np.unique(self.ds['veg_type'].values)
 
         # check for missing values
-        veg_types = np.unique(self.ds['veg_type'])
         check = veg_df.loc[veg_types, 'tau']
         missing = check[check.isnull()]
 
@@ -145,17 +231,20 @@ class BaseVegetation():
                     list(missing.index)
                 ))
 
-        for veg_type in veg_types:
-            idx = self.ds['veg_type'].values == veg_type
-            veg_tau.values[idx] = veg_df.loc[veg_type, 'tau']
-            veg_k.values[idx] = veg_df.loc[veg_type, 'k']
+        # populate directly in the float32 storage type
+        values = self.ds['veg_type'].values
+        veg_type = self.ds['veg_type'].astype(np.uint16)
+        veg_tau = veg_type.copy(data=class_lookup(
+            values, veg_types, veg_df.loc[veg_types, 'tau'].values))
+        veg_k = veg_type.copy(data=class_lookup(
+            values, veg_types, veg_df.loc[veg_types, 'k'].values))
 
         # sanity check to make sure that there are no NaN values in the images
         assert np.sum(np.isnan(veg_tau.values)) == 0
         assert np.sum(np.isnan(veg_k.values)) == 0
 
         self.veg_tau_k = xr.combine_by_coords([
-            self.ds['veg_type'].to_dataset(),
+            veg_type.to_dataset(),
             veg_tau.to_dataset(name='veg_tau'),
             veg_k.to_dataset(name='veg_k')
         ])
@@ -171,28 +260,23 @@ class BaseVegetation():
 
         self._logger.debug('Calculating veg height')
 
-        veg_df = pd.read_csv(self.veg_height_csv)
-        veg_df.set_index('VALUE', inplace=True)
-
-        # match whole numbers and decimals in the line
-        regex = re.compile(r"(?<!\*)(\d*\.?\d+)(?!\*)")
-        veg_df['height'] = 0  # see assumption below
-        for idx, row in veg_df.iterrows():
-            matches = regex.findall(row.CLASSNAMES)
-            if len(matches) > 0:
-                veg_df.loc[idx, 'height'] = np.mean(
-                    np.array([float(x) for x in matches]))
-
-        # create an image that is full of 0 values. This makes the assumption
-        # that any value that is not found in the csv file will have a
-        # height of 0 meters. This will work most of the time except in
-        # developed or agriculture but there isn't snow there anyways...
-        height = self.ds['veg_height'].copy() * 0
-        veg_heights = np.unique(self.ds['veg_height'])
-
-        for veg_height in veg_heights:
-            idx = self.ds['veg_height'].values == veg_height
-            height.values[idx] = veg_df.loc[veg_height, 'height']
+        class_heights = read_veg_heights(self.veg_height_csv)
+
+        # any value that is not found in the csv file will have a height of
+        # 0 meters. This will work most of the time except in developed or
+        # agriculture but there isn't snow there anyways...
+        values = self.ds['veg_height'].values
+        veg_heights = np.unique(values)
+        heights = class_heights.loc[veg_heights].values
+
+        # heights were truncated to whole meters when they were assigned into
+        # the integer veg_height image, keep the same values in float32
+        height = xr.DataArray(
+            class_lookup(values, veg_heights, np.trunc(heights)),
+            coords=self.ds['veg_height'].coords,
+            dims=self.ds['veg_height'].dims,
+            name='veg_height'
+        )
 
         # sanity check
         assert np.sum(np.isnan(height.values)) == 0
@@ -217,7 +301,7 @@ class BaseVegetation():
 
         images = []
         for image in self.VEG_IMAGES:
-            veg = dem.copy() * np.NaN
+            veg = xr.full_like(dem, np.nan, dtype=np.float32)
             veg.name = image
             images.append(veg.to_dataset())
 
@@ -12,5 +12,5 @@ class Landfire140(BaseVegetation):
 
     VEG_HEIGHT_CSV = 'US_140EVH_20180618/CSV_Data/LF_140EVH_05092014.csv'
 
-    def __init__(self, config) -> None:
-        super().__init__(config)
+    def __init__(self, config, sources=None) -> None:
+        super().__init__(config, sources=sources)
@@ -12,5 +12,5 @@ class Landfire200(BaseVegetation):
 
     VEG_HEIGHT_CSV = 'LF2016_EVH_200_CONUS/LF2016_EVH_200_CONUS/CSV_Data/LF16_EVH_200.csv'  # noqa
 
-    def __init__(self, config) -> None:
-        super().__init__(config)
+    def __init__(self, config, sources=None) -> None:
+        super().__init__(config, sources=sources)
@@ -1,24 +1,25 @@
 #!/usr/bin/env python3
 
-import argparse
 import datetime
 import logging
 import os
-import shutil
-import time
 from subprocess import check_output
 
 import coloredlogs
 import netCDF4 as nc
 import numpy as np
 import pandas as pd
+import rasterio
 from inicheck.utilities import mk_lst, remove_chars
+from rasterio.windows import Window
 from spatialnc.topo import get_topo_stats
 from spatialnc.utilities import copy_nc, mask_nc
 
 from basin_setup import __version__
+from basin_setup.utils.band_index import cached_band_index
 
-DEBUG = False
+# Resample options of gdalwarp that are reduced in blocks for aligned grids
+BLOCK_RESAMPLE = ['average', 'min', 'max', 'med', 'mode']
 
 
 def parse_fname_date(fname):
@@ -100,6 +101,152 @@ def parse_gdalinfo(fname):
     return image_info
 
 
+def warp_grid(ts):
+    """
+    Finds the grid gdalwarp resamples the image to for a topo. The extent
+    is the truncated coordinates of the outer topo cell centers, split
+    into the same number of cells as the topo.
+
+    Args:
+        ts: Dictionary of the topo stats from get_topo_stats
+
+    Return:
+        grid: Tuple of the extent as left, bottom, right and top and the
+              cell width and height
+    """
+
+    extent = (int(np.min(ts['x'])), int(np.min(ts['y'])),
+              int(np.max(ts['x'])), int(np.max(ts['y'])))
+    dx = (extent[2] - extent[0]) / ts['nx']
+    dy = (extent[3] - extent[1]) / ts['ny']
+
+    return extent, dx, dy
+
+
+def aligned_factor(image_info, ts):
+    """
+    Finds the number of image cells in each cell of the gdalwarp grid when
+    it is aligned to the image grid and its cells are an integer number of
+    image cells, see warp_grid.
+
+    Args:
+        image_info: Dictionary of the image pixel size and origin from
+                    parse_gdalinfo
+        ts: Dictionary of the topo stats from get_topo_stats
+
+    Return:
+        factor: Tuple of the rows and columns of image cells in a grid cell
+                and the row and column of the image the grid starts at,
+                otherwise None
+    """
+
+    dx, dy = [abs(d) for d in image_info['pixel size']]
+    x0, y0 = image_info['origin']
+    (left, _, _, top), cell_dx, cell_dy = warp_grid(ts)
+
+    result = []
+    for ratio in [cell_dy / dy, cell_dx / dx, (y0 - top) / dy,
+                  (left - x0) / dx]:
+        if abs(ratio - round(ratio)) > 1e-6:
+            return None
+        result.append(int(round(ratio)))
+
+    if result[0] < 1 or result[1] < 1:
+        return None
+
+    return tuple(result)
+
+
+def whole_blocks(factor, shape, ts):
+    """
+    Checks every block of image cells in the gdalwarp grid is either all on
+    the image or all off of it.
+
+    Args:
+        factor: Tuple from aligned_factor
+        shape: Tuple of the image rows and columns
+        ts: Dictionary of the topo stats from get_topo_stats
+
+    Return:
+        whole: True when no block is partly on the image
+    """
+
+    fy, fx, row, col = factor
+    for start, size, f, n in [(row, shape[0], fy, ts['ny']),
+                              (col, shape[1], fx, ts['nx'])]:
+        # edges of the image in the cells of the grid
+        for edge in [-start, size - start]:
+            if 0 < edge < n * f and edge % f:
+                return False
+
+    return True
+
+
+def block_reduce(data, factor, resample):
+    """
+    Reduces blocks of cells ignoring NaNs, the same as gdalwarp for grids
+    that are aligned. The median is the lower of the middle two values and
+    the mode is the value that is first to reach the highest count in row
+    major order, like GDAL. Blocks without any values are NaN.
+
+    Args:
+        data: 2D array with NaN for no data and a multiple of factor in
+              each dimension
+        factor: Tuple of rows and columns in a block
+        resample: One of BLOCK_RESAMPLE
+
+    Return:
+        result: 2D array of the reduced blocks
+    """
+
+    fy, fx = factor
+    ny, nx = data.shape[0] // fy, data.shape[1] // fx
+    blocks = data.reshape(ny, fy, nx, fx).swapaxes(1, 2).reshape(
+        ny * nx, fy * fx).astype(np.float64)
+
+    # NaNs are sorted last in every block
+    order = np.argsort(blocks, axis=1, kind='stable')
+    values = np.take_along_axis(blocks, order, axis=1)
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=1)
+    rows = np.arange(len(values))
+    last = np.maximum(count - 1, 0)
+
+    if resample == 'average':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = np.where(valid, values, 0).sum(axis=1) / count
+
+    elif resample == 'min':
+        result = values[:, 0]
+
+    elif resample == 'max':
+        result = values[rows, last]
+
+    elif resample == 'med':
+        result = values[rows, last // 2]
+
+    elif resample == 'mode':
+        # rank of each value among the equal values before it
+        cols = np.arange(values.shape[1])
+        starts = np.ones_like(valid)
+        starts[:, 1:] = values[:, 1:] != values[:, :-1]
+        first = np.maximum.accumulate(np.where(starts, cols, 0), axis=1)
+        rank = np.where(valid, cols - first + 1, 0)
+
+        # the value reaching the highest count first in the block
+        reached = rank == rank.max(axis=1, keepdims=True)
+        position = np.where(reached & valid, order, values.shape[1])
+        result = values[rows, np.argmin(position, axis=1)]
+
+    else:
+        raise ValueError('{} is not a block resample option, use one of {}'
+                         ''.format(resample, ', '.join(BLOCK_RESAMPLE)))
+
+    result = np.where(count > 0, result, np.nan)
+
+    return result.reshape(ny, nx)
+
+
 class GRM(object):
 
     def __init__(self, **kwargs):
@@ -121,6 +268,10 @@ class GRM(object):
             else:
                 self.debug = False
 
+        # Height of the elevation bands in the flight summaries
+        if not hasattr(self, 'band_size'):
+            self.band_size = 100
+
         # Assign some colors and formats
         coloredlogs.install(fmt='%(levelname)-5s %(message)s', level=level,
                             logger=self.log)
@@ -157,7 +308,10 @@ class GRM(object):
 
     def grid_match(self):
         """
-        Interpolates the newly scaled grid to the current grid
+        Interpolates the newly scaled grid to the current grid. When the
+        gdalwarp grid is aligned to the image with an integer resolution
+        ratio the image is reduced in blocks, giving the same result as
+        gdalwarp, otherwise gdalwarp is used.
         """
 
         outfile = os.path.basename(self.image)
@@ -172,16 +326,28 @@ class GRM(object):
         outfile = os.path.join(self.temp, outfile)
 
         self.log.debug("Writing grid adjusted image to:\n{}".format(outfile))
+
+        factor = aligned_factor(self.image_info, self.ts)
+
+        # gdalwarp doesn't weight the cells of a block partly on the image
+        # evenly in the average
+        if factor is not None and self.resample == 'average':
+            with rasterio.open(self.image) as src:
+                if not whole_blocks(factor, src.shape, self.ts):
+                    factor = None
+
+        if self.resample in BLOCK_RESAMPLE and factor is not None:
+            self.block_match(outfile, factor)
+            self.working_file = outfile
+            return
+
         cmd = ["gdalwarp",
                "-r {}".format(self.resample),
                "-of NETCDF",
                "-overwrite",
                "-srcnodata -9999",
                "-dstnodata -9999",
-               "-te {} {} {} {}".format(int(np.min(self.ts["x"])),
-                                        int(np.min(self.ts["y"])),
-                                        int(np.max(self.ts["x"])),
-                                        int(np.max(self.ts["y"]))),
+               "-te {} {} {} {}".format(*warp_grid(self.ts)[0]),
                "-ts {} {}".format(self.ts['nx'], self.ts['ny']),
                self.image,
                outfile]
@@ -191,6 +357,43 @@ class GRM(object):
 
         self.working_file = outfile
 
+    def block_match(self, outfile, factor):
+        """
+        Reduces the image to the gdalwarp grid in blocks and writes it like
+        the gdalwarp netcdf output, with the rows from south to north.
+        """
+
+        fy, fx, row, col = factor
+        self.log.info("Image is aligned to the grid, reducing {} x {} blocks"
+                      " using {}".format(fy, fx, self.resample))
+
+        ny, nx = self.ts['ny'], self.ts['nx']
+        window = Window(col, row, nx * fx, ny * fy)
+
+        with rasterio.open(self.image) as src:
+            data = src.read(1, window=window, boundless=True, masked=True,
+                            fill_value=src.nodata)
+
+        data = np.ma.filled(data.astype(np.float64), np.nan)
+        data[data == -9999] = np.nan
+
+        result = block_reduce(data, (fy, fx), self.resample)
+
+        # cell centers of the gdalwarp grid
+        (left, bottom, _, _), dx, dy = warp_grid(self.ts)
+        x = left + (np.arange(nx) + 0.5) * dx
+        y = bottom + (np.arange(ny) + 0.5) * dy
+
+        with nc.Dataset(outfile, 'w') as ds:
+            ds.createDimension('x', nx)
+            ds.createDimension('y', ny)
+            ds.createVariable('x', 'f8', ('x',))[:] = x
+            ds.createVariable('y', 'f8', ('y',))[:] = y
+
+            band = ds.createVariable('Band1', 'f4', ('y', 'x'),
+                                     fill_value=-9999)
+            band[:] = np.ma.masked_invalid(np.flipud(result))
+
     def create_lidar_netcdf(self):
         """
         Creates a new lidar netcdf to contain all the flights for one
@@ -344,13 +547,88 @@ class GRM(object):
             "Adding masked lidar data to {}".format(
                 self.ds.filepath()))
 
-        self.ds.variables['depth'][index, :] = new_ds.variables['Band1'][:]
+        depth = new_ds.variables['Band1'][:]
+        self.ds.variables['depth'][index, :] = depth
+
+        self.log.info("Summarizing the depths by elevation band...")
+        self.add_summary(index, depth)
         self.ds.sync()
 
         self.ds.close()
         new_ds.close()
         self.topo_ds.close()
 
+    def create_summary(self, band_index):
+        """
+        Adds the variables for the elevation band and sub basin summaries of
+        each flight to the lidar netcdf.
+        """
+
+        self.ds.createDimension("elevation_band", len(band_index.bands))
+        self.ds.createVariable("elevation_band", "f", ("elevation_band"))
+        self.ds['elevation_band'][:] = band_index.bands
+        self.ds['elevation_band'].setncatts({
+            "units": "meters",
+            "long_name": "Bottom of the elevation band",
+            "band_size": band_index.band_size
+        })
+
+        dims = {"basin": ("time",), "band": ("time", "elevation_band")}
+
+        if band_index.subbasin_names:
+            self.ds.createDimension("subbasin", len(band_index.subbasin_names))
+            self.ds.createVariable("subbasin_name", str, ("subbasin"))
+            for i, name in enumerate(band_index.subbasin_names):
+                self.ds['subbasin_name'][i] = name
+            dims["subbasin"] = ("time", "subbasin")
+
+        names = {"basin": "the basin",
+                 "band": "each elevation band",
+                 "subbasin": "each sub basin"}
+
+        for key, dim in dims.items():
+            self.ds.createVariable("{}_depth".format(key), "f", dim,
+                                   fill_value=np.nan)
+            self.ds["{}_depth".format(key)].setncatts({
+                "units": "meters",
+                "long_name": "Mean snow depth in {}".format(names[key])
+            })
+
+            self.ds.createVariable("{}_coverage".format(key), "f", dim,
+                                   fill_value=np.nan)
+            self.ds["{}_coverage".format(key)].setncatts({
+                "long_name": "Fraction of {} with a depth".format(names[key])
+            })
+
+    def add_summary(self, index, depth):
+        """
+        Stores the mean depth and coverage of the flight in each elevation
+        band and sub basin using the cached elevation band index of the topo.
+        """
+
+        band_index = cached_band_index(self.topo, band_size=self.band_size)
+
+        if 'band_depth' not in self.ds.variables:
+            self.create_summary(band_index)
+
+        bands = self.ds.variables['elevation_band'][:]
+        error = len(bands) != len(band_index.bands) or \
+            np.any(bands != band_index.bands)
+        self.handle_error("Elevation bands match the lidar netcdf.",
+                          ("The elevation bands of the topo with a band size"
+                           " of {} don't match the lidar netcdf."
+                           "".format(self.band_size)),
+                          error=error)
+
+        summary = band_index.summarize(depth)
+
+        for key in ['basin', 'band', 'subbasin']:
+            if "{}_depth".format(key) in self.ds.variables:
+                self.ds["{}_depth".format(key)][index] = \
+                    summary["{}_mean".format(key)]
+                self.ds["{}_coverage".format(key)][index] = \
+                    summary["{}_coverage".format(key)]
+
     def get_time_index(self):
         """
         Calculates the time based index in hours for current image to go into
@@ -503,154 +781,6 @@ def run_grm(**kwargs):
     # return g
 
 
-def main():
-
-    p = argparse.ArgumentParser(description="Modifies existing images to a"
-                                            " different scale and shifts the"
-                                            " grid to match modeling domains"
-                                            " for SMRF/AWSM")
-
-    p.add_argument("-t", "--topo", dest="topo",
-                   required=True,
-                   help="Path to the topo.nc file used for modeling")
-
-    p.add_argument("-i", "--images", dest="images",
-                   required=True, nargs='+',
-                   help="Path(s) to lidar images for processing")
-
-    p.add_argument("-b", "--basin", dest="basin",
-                   required=True, choices=['brb', 'kaweah', 'kings', 'lakes',
-                                           'merced', 'sanjoaquin', 'tuolumne'],
-                   help="Name of the basin to use for metadata")
-
-    p.add_argument("-o", "--output", dest="output",
-                   required=False, default='output',
-                   help="Path to output folder")
-
-    p.add_argument("-d", "--debug", dest="debug",
-                   required=False, action='store_true',
-                   help="Outputs more information and does not delete any"
-                         " working files generated during runs")
-
-    p.add_argument("-dt", "--dates", dest="dates",
-                   required=False, default=[], nargs='+',
-                   help="Enables user to directly control the date(s). Should "
-                        " be a list as long as the images argument. If left"
-                        " empty GRM will attempt to find the date in the file"
-                        " name of the image")
-
-    p.add_argument("-e", "--allow_exceptions", dest="allow_exceptions",
-                   required=False, action="store_true",
-                   help="For Development purposes, allows it to be debugging"
-                   " but also enables the errors to NOT catch, which is useful"
-                   " for batch processing.")
-
-    p.add_argument("-r", "--resample", dest="resample",
-                   choices=['near', 'bilinear', 'cubic', 'cubicspline',
-                            'lanczos', 'average', 'mode', 'max', 'min',
-                            'med', 'Q1', 'Q3'],
-                   required=False, default="bilinear",
-                   help="Pass through the resample technique to use in"
-                         " gdalwarp .")
-
-    args = p.parse_args()
-
-    # Global debug variable
-    global DEBUG
-    DEBUG = args.debug
-
-    start = time.time()
-    skips = 0
-
-    # Make sure our output folder exists
-    output = args.output
-
-    # Make the output folder
-    if not os.path.isdir(output):
-        os.mkdir(output)
-
-    # Make the temp folder inside the output folder
-    temp = os.path.join(output, 'tmp')
-    if not os.path.isdir(temp):
-        os.mkdir(temp)
-
-    if not isinstance(args.images, list):
-        args.images = [args.images]
-
-    # Get logger and add color with a simple format
-    log = logging.getLogger(__name__)
-    coloredlogs.install(fmt='%(levelname)-5s %(message)s', level="INFO",
-                        logger=log)
-    # Print a nice header with version number
-    msg = "\n\nGrid Resizing and Matching Script v{}".format(__version__)
-    header = "=" * (len(msg) + 1)
-    log.info(msg + "\n" + header + "\n")
-
-    # We need to sort the images by date so create a dictionary of the two here
-    log.info("Calculating dates and sorting images for processing...")
-    if args.dates:
-        dates = args.dates
-
-    else:
-        dates = [parse_fname_date(f) for f in args.images]
-
-    # Confirm there as many dates as images
-    if len(dates) != len(args.images):
-        raise Exception("Provided dates must either be in the image filename"
-                        " in the format YYYYMMDD or provided using --date."
-                        " If using the date flag, there must be as many dates"
-                        " as images.")
-
-    image_dict = {k: v for (k, v) in zip(dates, args.images)}
-
-    # Loop through all images provided
-    log.info("Number of images being processed: {}".format(len(args.images)))
-
-    for d in sorted(image_dict.keys()):
-        f = image_dict[d]
-
-        log.info("")
-        log.info("Processing {}".format(os.path.basename(f)))
-
-        kwargs = {'image': f, 'topo': args.topo, 'basin': args.basin,
-                  'debug': args.debug,
-                  'output': output,
-                  'temp': temp,
-                  'resample': args.resample,
-                  'date': d,
-                  'log': log}
-
-        if not DEBUG or args.allow_exceptions:
-            try:
-                run_grm(**kwargs)
-
-            except Exception as e:
-                log.warning("Skipping {} due to error".format(
-                    os.path.basename(f)))
-                log.error(e)
-                skips += 1
-
-        else:
-            run_grm(**kwargs)
-
-    stop = time.time()
-
-    # Throw a warning when all get skipped
-    if skips == len(args.images):
-        log.warning("No images were processed!")
-
-    log.info("Grid Resizing and Matching Complete. {1}/{2} files processed."
-             " Elapsed Time {0:0.1f}s"
-             "".format(
-                 stop - start,
-                 len(args.images) - skips,
-                 len(args.images)
-             ))
-
-    if not DEBUG:
-        log.info('Cleaning up temporary files.')
-        shutil.rmtree(temp)
-
-
 if __name__ == '__main__':
+    from basin_setup.cli.grm import main
     main()
@@ -0,0 +1,375 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from basin_setup.hydrology.d8 import DCOL, DROW
+from basin_setup.hydrology.graph import FlowGraph
+
+# Drainage area of cells without a flow direction, like TauDEM aread8
+NODATA = -1
+
+
+def accumulate(receivers, weights):
+    """Sum the weights down the flow paths. Cells are visited from the
+    sources down one frontier at a time, a cell is added to its receiver
+    once everything upstream of it has been.
+
+    Args:
+        receivers (np.ndarray): flat index of the cell each cell drains to,
+            -1 for none
+        weights (np.ndarray): weight of each cell, or a row of weights for
+            each cell to accumulate them together
+
+    Returns:
+        np.ndarray: accumulated weights
+    """
+
+    acc = np.asarray(weights, dtype=np.float64).copy()
+    has_receiver = receivers >= 0
+    remaining = np.bincount(receivers[has_receiver], minlength=len(acc))
+
+    frontier = np.flatnonzero(remaining == 0)
+    while len(frontier):
+        below = receivers[frontier]
+        ok = below >= 0
+        frontier, below = frontier[ok], below[ok]
+
+        np.add.at(acc, below, acc[frontier])
+        np.subtract.at(remaining, below, 1)
+
+        below = np.unique(below)
+        frontier = below[remaining[below] == 0]
+
+    return acc
+
+
+def edge_cells(fdir, padded=False):
+    """Cells with a flow direction next to a cell without one or next to
+    the edge of the grid. Their drainage area can't be known because flow
+    could come in from outside of the grid, TauDEM aread8 calls the cells
+    downstream of them contaminated.
+
+    Args:
+        fdir (np.ndarray): D8 flow directions, see `read_flow_direction`
+        padded (bool, optional): `fdir` has a one cell border around the
+            cells to check. Defaults to False, the grid is padded with
+            cells without a flow direction.
+
+    Returns:
+        np.ndarray: boolean mask of the edge cells
+    """
+
+    valid = fdir > 0
+    if not padded:
+        valid = np.pad(valid, 1, constant_values=False)
+
+    ny, nx = valid.shape[0] - 2, valid.shape[1] - 2
+    edge = np.zeros((ny, nx), dtype=bool)
+    for dr, dc in zip(DROW[1:], DCOL[1:]):
+        edge |= ~valid[1 + dr:1 + dr + ny, 1 + dc:1 + dc + nx]
+
+    return edge & valid[1:-1, 1:-1]
+
+
+def _weights(fdir, edge):
+    """Cell count and edge cell weights of each cell of a flow direction
+    grid to accumulate together
+    """
+    return np.stack([(fdir > 0).ravel(), edge.ravel()], axis=1)
+
+
+def _drainage_area(fdir, acc, contamination):
+    """Drainage area with `NODATA` for cells without a flow direction and
+    the contaminated cells when checking for contamination
+    """
+
+    acc = acc.reshape(fdir.shape + (2,))
+    nodata = fdir == 0
+    if contamination:
+        nodata |= acc[..., 1] > 0
+
+    return np.where(nodata, NODATA, acc[..., 0])
+
+
+def flow_accumulation(fdir, contamination=True):
+    """Drainage area in cells of a whole flow direction grid
+
+    Args:
+        fdir (np.ndarray): D8 flow directions, see `read_flow_direction`
+        contamination (bool, optional): set the cells downstream of an edge
+            cell to `NODATA` like aread8 without -nc, see `edge_cells`.
+            Defaults to True.
+
+    Returns:
+        np.ndarray: drainage area with `NODATA` for cells without a flow
+            direction
+    """
+
+    acc = accumulate(FlowGraph(fdir).receivers,
+                     _weights(fdir, edge_cells(fdir)))
+
+    return _drainage_area(fdir, acc, contamination)
+
+
+def tile_windows(height, width, tile_size):
+    """Windows tiling a grid
+
+    Args:
+        height (int): rows in the grid
+        width (int): columns in the grid
+        tile_size (int): rows and columns in each tile
+
+    Returns:
+        list: windows in row major order
+    """
+
+    return [Window(col, row, min(tile_size, width - col),
+                   min(tile_size, height - row))
+            for row in range(0, height, tile_size)
+            for col in range(0, width, tile_size)]
+
+
+def _read_tile(flow_dir, window):
+    """Flow directions of a tile, its edge cells and the flat index of its
+    cells and the cells they drain to in the whole grid
+    """
+
+    # a cell around the tile to find the edge cells
+    halo = Window(window.col_off - 1, window.row_off - 1, window.width + 2,
+                  window.height + 2)
+
+    with rasterio.open(flow_dir) as src:
+        data = src.read(1, window=halo, boundless=True, fill_value=0)
+        height, width = src.height, src.width
+
+    data = np.where((data >= 1) & (data <= 8), data, 0).astype(np.uint8)
+    edge = edge_cells(data, padded=True)
+    fdir = data[1:-1, 1:-1]
+
+    rows, cols = np.indices(fdir.shape)
+    rows = rows.ravel() + window.row_off
+    cols = cols.ravel() + window.col_off
+    cells = rows * width + cols
+
+    codes = fdir.ravel()
+    rows = rows + DROW[codes]
+    cols = cols + DCOL[codes]
+    inside = (codes > 0) & (rows >= 0) & (rows < height) & \
+        (cols >= 0) & (cols < width)
+    receivers = np.where(inside, rows * width + cols, -1)
+
+    return fdir, edge, cells, receivers
+
+
+def _border(shape):
+    """Flat index of the cells on the edges of a tile"""
+    mask = np.zeros(shape, dtype=bool)
+    mask[[0, -1], :] = True
+    mask[:, [0, -1]] = True
+    return np.flatnonzero(mask)
+
+
+def tile_summary(flow_dir, window):
+    """Boundary flow of a tile. Only the cells on the tile's edges can
+    receive flow from other tiles and only the cells draining out of the
+    tile pass it on, so the tile is summarized by where each edge cell
+    leaves the tile and the drainage area leaving at each exit.
+
+    Args:
+        flow_dir (str): D8 flow direction tif
+        window (Window): the tile
+
+    Returns:
+        dict: flat index in the grid of the exit cells, their drainage area
+            and number of edge cells upstream within the tile and the cell
+            they drain to, and of the border cells with the exit each of
+            them leaves the tile from, -1 for none
+    """
+
+    fdir, edge, cells, receivers = _read_tile(flow_dir, window)
+    graph = FlowGraph(fdir)
+    acc = accumulate(graph.receivers, _weights(fdir, edge))
+
+    exits = np.flatnonzero((receivers >= 0) & (graph.receivers < 0))
+    labels = np.full(graph.size, -1, dtype=np.int64)
+    labels[exits] = cells[exits]
+    labels = graph.sweep(labels)[0]
+
+    border = _border(fdir.shape)
+
+    return {
+        'exit': cells[exits],
+        'exit_area': acc[exits],
+        'exit_to': receivers[exits],
+        'border': cells[border],
+        'border_exit': labels[border]
+    }
+
+
+def tile_accumulation(flow_dir, window, inflow_cells, inflow,
+                      contamination=True):
+    """Drainage area of a tile with the flow from the other tiles
+
+    Args:
+        flow_dir (str): D8 flow direction tif
+        window (Window): the tile
+        inflow_cells (np.ndarray): flat index in the grid of the border
+            cells receiving flow from other tiles
+        inflow (np.ndarray): drainage area and number of edge cells
+            flowing into each of them
+        contamination (bool, optional): set the contaminated cells to
+            `NODATA`, see `flow_accumulation`. Defaults to True.
+
+    Returns:
+        tuple: window and drainage area of the tile
+    """
+
+    fdir, edge, cells, _ = _read_tile(flow_dir, window)
+    graph = FlowGraph(fdir)
+
+    weights = _weights(fdir, edge).astype(np.float64)
+    local = np.searchsorted(cells, inflow_cells)
+    weights[local] += inflow
+
+    acc = accumulate(graph.receivers, weights)
+
+    return window, _drainage_area(fdir, acc, contamination)
+
+
+def resolve_boundaries(summaries):
+    """Drainage area flowing into the border cells of every tile, found by
+    accumulating over the graph of tile exits
+
+    Args:
+        summaries (list): `tile_summary` of every tile
+
+    Returns:
+        tuple: flat index in the grid of the border cells receiving flow and
+            the drainage area and number of edge cells flowing into them
+    """
+
+    exits = np.concatenate([s['exit'] for s in summaries])
+    exit_area = np.concatenate([s['exit_area'] for s in summaries]).reshape(
+        -1, 2)
+    exit_to = np.concatenate([s['exit_to'] for s in summaries])
+    border = np.concatenate([s['border'] for s in summaries])
+    border_exit = np.concatenate([s['border_exit'] for s in summaries])
+
+    # border cells on the corners of a tile are repeated
+    border, unique = np.unique(border, return_index=True)
+    border_exit = border_exit[unique]
+
+    # each exit drains to the exit of the next tile its flow leaves from
+    order = np.argsort(exits)
+    exits, exit_area, exit_to = exits[order], exit_area[order], exit_to[order]
+
+    next_exit = border_exit[np.searchsorted(border, exit_to)]
+    receivers = np.full(len(exits), -1, dtype=np.int64)
+    has_next = next_exit >= 0
+    receivers[has_next] = np.searchsorted(exits, next_exit[has_next])
+
+    total = accumulate(receivers, exit_area)
+
+    cells, index = np.unique(exit_to, return_inverse=True)
+    inflow = np.stack([
+        np.bincount(index, weights=column, minlength=len(cells))
+        for column in total.T
+    ], axis=1)
+
+    return cells, inflow
+
+
+def bounded_map(executor, size, fn, *iterables):
+    """Like `executor.map` but only `size` calls are submitted at a time,
+    so the results waiting to be used don't pile up in memory
+
+    Args:
+        executor (Executor): executor to run the calls in
+        size (int): most calls submitted at a time
+        fn (callable): function to call
+        *iterables: arguments of each call
+
+    Yields:
+        result of each call in order
+    """
+
+    futures = deque()
+    for args in zip(*iterables):
+        if len(futures) >= size:
+            yield futures.popleft().result()
+        futures.append(executor.submit(fn, *args))
+
+    while futures:
+        yield futures.popleft().result()
+
+
+def tiled_flow_accumulation(flow_dir, output, tile_size=2048,
+                            processes=None, contamination=True):
+    """Drainage area in cells of a flow direction raster that doesn't fit in
+    memory, the same as accumulating the whole raster. Each tile is read
+    twice, first to summarize the flow across its edges and then, once the
+    flow between the tiles is resolved, to accumulate it with the flow
+    coming in. The edge cells are accumulated along with the drainage area
+    so contaminated cells are found across the tiles too. Only a tile at a
+    time is in memory in each process.
+
+    Args:
+        flow_dir (str): D8 flow direction tif
+        output (str): drainage area tif
+        tile_size (int, optional): rows and columns in each tile. Defaults
+            to 2048.
+        processes (int, optional): number of processes to run the tiles
+            in, 1 runs them in this process. Defaults to None, the number
+            of CPUs.
+        contamination (bool, optional): set the contaminated cells to
+            `NODATA`, see `flow_accumulation`. Defaults to True.
+    """
+
+    with rasterio.open(flow_dir) as src:
+        profile = src.profile
+        height, width = src.height, src.width
+
+    windows = tile_windows(height, width, tile_size)
+    profile.update(driver='GTiff', dtype='float32', count=1, nodata=NODATA,
+                   tiled=True, blockxsize=256, blockysize=256,
+                   compress='lzw', BIGTIFF='IF_SAFER')
+
+    executor = None
+    if processes != 1:
+        executor = ProcessPoolExecutor(max_workers=processes)
+
+        # two tiles a process keeps them busy without holding every tile
+        size = 2 * (processes or os.cpu_count() or 1)
+
+        def mapper(fn, *iterables):
+            return bounded_map(executor, size, fn, *iterables)
+    else:
+        mapper = map
+
+    try:
+        summaries = mapper(tile_summary, [flow_dir] * len(windows), windows)
+        cells, inflow = resolve_boundaries(list(summaries))
+
+        # split the inflow by the tile of the cells, in the window order
+        rows, cols = np.divmod(cells, width)
+        tiles = (rows // tile_size) * -(-width // tile_size) + \
+            cols // tile_size
+        order = np.argsort(tiles, kind='stable')
+        splits = np.cumsum(np.bincount(tiles, minlength=len(windows)))[:-1]
+        tile_cells = np.split(cells[order], splits)
+        tile_inflow = np.split(inflow[order], splits)
+
+        with rasterio.open(output, 'w', **profile) as dst:
+            for window, acc in mapper(tile_accumulation,
+                                      [flow_dir] * len(windows), windows,
+                                      tile_cells, tile_inflow,
+                                      [contamination] * len(windows)):
+                dst.write(acc.astype(np.float32), 1, window=window)
+
+    finally:
+        if executor is not None:
+            executor.shutdown()
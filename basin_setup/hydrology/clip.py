@@ -0,0 +1,253 @@
+import heapq
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+
+from basin_setup.hydrology.d8 import DCOL, DROW
+from basin_setup.hydrology.graph import FlowGraph, cached_flow_graph
+from basin_setup.hydrology.outlets import read_pour_points, stencil
+from basin_setup.hydrology.watersheds import NODATA, outlet_cells
+
+# D8 code of each row and column offset, CODES[drow + 1, dcol + 1]
+CODES = np.zeros((3, 3), dtype=np.uint8)
+CODES[DROW[1:] + 1, DCOL[1:] + 1] = np.arange(1, 9)
+
+
+def coarse_dem(demfile, factor=10):
+    """Read a DEM averaged over blocks of `factor` by `factor` cells
+
+    Args:
+        demfile (str): DEM tif
+        factor (int, optional): block size in cells. Defaults to 10.
+
+    Returns:
+        tuple: coarse DEM with NaN for nodata and the number of fine rows
+            and columns in each coarse cell
+    """
+
+    with rasterio.open(demfile) as src:
+        shape = (max(1, -(-src.height // factor)),
+                 max(1, -(-src.width // factor)))
+        dem = src.read(1, out_shape=shape, resampling=Resampling.average,
+                       masked=True)
+        scale = (src.height / shape[0], src.width / shape[1])
+
+    return dem.astype(np.float64).filled(np.nan), scale
+
+
+def priority_flood(dem):
+    """D8 flow directions of a DEM with the pits filled. Cells are flooded
+    from the edges and the nodata cells up in order of elevation, each
+    cell drains to the cell it was flooded from.
+
+    Args:
+        dem (np.ndarray): DEM with NaN for nodata
+
+    Returns:
+        np.ndarray: D8 flow directions, see `read_flow_direction`
+    """
+
+    ny, nx = dem.shape
+    valid = ~np.isnan(dem)
+    z = dem.ravel().tolist()
+
+    # cells on the edge of the grid or next to nodata drain out
+    padded = np.pad(valid, 1, constant_values=False)
+    interior = np.ones_like(valid)
+    for dr, dc in zip(DROW[1:], DCOL[1:]):
+        interior &= padded[1 + dr:1 + dr + ny, 1 + dc:1 + dc + nx]
+
+    done = (~valid).ravel().tolist()
+    heap = []
+    for cell in np.flatnonzero(valid & ~interior).tolist():
+        done[cell] = True
+        heap.append((z[cell], cell))
+    heapq.heapify(heap)
+
+    fdir = np.zeros(dem.size, dtype=np.uint8)
+    offsets = list(zip(DROW[1:].tolist(), DCOL[1:].tolist()))
+    while heap:
+        level, cell = heapq.heappop(heap)
+        row, col = divmod(cell, nx)
+
+        for dr, dc in offsets:
+            r, c = row + dr, col + dc
+            if r < 0 or r >= ny or c < 0 or c >= nx:
+                continue
+
+            neighbour = r * nx + c
+            if done[neighbour]:
+                continue
+
+            done[neighbour] = True
+            fdir[neighbour] = CODES[1 - dr, 1 - dc]
+            heapq.heappush(heap, (max(z[neighbour], level), neighbour))
+
+    return fdir.reshape(dem.shape)
+
+
+def snap_seeds(graph, outlets, rule='downslope', max_distance=50):
+    """Every cell a pour point could be snapped to
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        outlets (np.ndarray): flat index of the pour point cells
+        rule (str, optional): snapping rule, see `SNAP_RULES`. Defaults to
+            'downslope'.
+        max_distance (int, optional): search distance in cells. Defaults
+            to 50.
+
+    Returns:
+        np.ndarray: flat index of the cells
+    """
+
+    seeds = [outlets]
+    if rule == 'downslope':
+        cells = outlets
+        for _ in range(max_distance):
+            cells = graph.receivers[cells]
+            cells = cells[cells >= 0]
+            seeds.append(cells)
+
+    else:
+        ny, nx = graph.shape
+        drow, dcol, _ = stencil(max_distance)
+        rows = outlets[:, None] // nx + drow
+        cols = outlets[:, None] % nx + dcol
+        inside = (rows >= 0) & (rows < ny) & (cols >= 0) & (cols < nx)
+        seeds.append(rows[inside] * nx + cols[inside])
+
+    return np.unique(np.concatenate(seeds))
+
+
+def contributing_area(graph, outlets):
+    """Cells draining to the outlets
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        outlets (np.ndarray): flat index of the outlet cells
+
+    Returns:
+        np.ndarray: boolean mask of the contributing area
+    """
+
+    labels = np.full(graph.size, NODATA, dtype=np.int32)
+    labels[outlets] = 0
+
+    return (graph.sweep(labels)[0] >= 0).reshape(graph.shape)
+
+
+def clip_window(demfile, pour_points, factor=10, buffer=5):
+    """Window of the DEM covering the contributing area of the pour points,
+    found on a DEM averaged over blocks of `factor` cells and widened by
+    `buffer` blocks
+
+    Args:
+        demfile (str): DEM tif
+        pour_points (str): pour points BNA or shapefile
+        factor (int, optional): block size in cells. Defaults to 10.
+        buffer (int, optional): blocks around the contributing area.
+            Defaults to 5.
+
+    Returns:
+        Window: window of the DEM to delineate
+    """
+
+    dem, (row_scale, col_scale) = coarse_dem(demfile, factor)
+    graph = FlowGraph(priority_flood(dem))
+
+    with rasterio.open(demfile) as src:
+        height, width = src.height, src.width
+        transform = src.transform * src.transform.scale(col_scale, row_scale)
+
+    points = read_pour_points(pour_points)
+    outlets = outlet_cells(points['x'].values, points['y'].values,
+                           transform, graph.shape)
+    if len(outlets) == 0:
+        raise ValueError('None of the pour points are in {}'.format(demfile))
+
+    rows, cols = np.nonzero(contributing_area(graph, outlets))
+    row_start = int(max(0, (rows.min() - buffer) * row_scale))
+    row_stop = int(min(height, np.ceil((rows.max() + 1 + buffer) * row_scale)))
+    col_start = int(max(0, (cols.min() - buffer) * col_scale))
+    col_stop = int(min(width, np.ceil((cols.max() + 1 + buffer) * col_scale)))
+
+    return Window(col_start, row_start, col_stop - col_start,
+                  row_stop - row_start)
+
+
+def clip_dem(demfile, window, output):
+    """Write the window of the DEM
+
+    Args:
+        demfile (str): DEM tif
+        window (Window): window to write
+        output (str): clipped DEM tif
+    """
+
+    with rasterio.open(demfile) as src:
+        profile = src.profile
+        profile.update(driver='GTiff', height=window.height,
+                       width=window.width,
+                       transform=src.window_transform(window))
+
+        with rasterio.open(output, 'w', **profile) as dst:
+            dst.write(src.read(1, window=window), 1)
+
+
+def drains_across(flow_dir, pour_points, edges, rule='downslope',
+                  max_distance=50):
+    """Whether any of the area draining to the pour points, wherever they
+    are snapped to, reaches an edge of the clipped DEM. Drainage that
+    reaches the edge would have come from outside of the clip. TauDEM
+    leaves the cells on the edge without a flow direction so they are
+    never in the area, the cells one in from the edge are checked too.
+
+    Args:
+        flow_dir (str): D8 flow direction tif of the clipped DEM
+        pour_points (str): pour points BNA or shapefile
+        edges (list): whether the top, bottom, left and right edges were
+            clipped, drainage across the DEM's own edges is ignored
+        rule (str, optional): snapping rule, see `SNAP_RULES`. Defaults to
+            'downslope'.
+        max_distance (int, optional): snapping distance in cells. Defaults
+            to 50.
+
+    Returns:
+        bool: True if the clip cuts off part of the contributing area
+    """
+
+    graph, profile = cached_flow_graph(flow_dir)
+
+    points = read_pour_points(pour_points)
+    outlets = outlet_cells(points['x'].values, points['y'].values,
+                           profile['transform'], graph.shape)
+    seeds = snap_seeds(graph, outlets, rule=rule, max_distance=max_distance)
+    area = contributing_area(graph, seeds)
+
+    top, bottom, left, right = edges
+    return bool((top and area[:2].any()) or (bottom and area[-2:].any()) or
+                (left and area[:, :2].any()) or
+                (right and area[:, -2:].any()))
+
+
+def clipped_edges(demfile, window):
+    """Which edges of the DEM are clipped by the window
+
+    Args:
+        demfile (str): DEM tif
+        window (Window): window of the DEM
+
+    Returns:
+        list: whether the top, bottom, left and right edges are clipped
+    """
+
+    with rasterio.open(demfile) as src:
+        height, width = src.height, src.width
+
+    return [window.row_off > 0,
+            window.row_off + window.height < height,
+            window.col_off > 0,
+            window.col_off + window.width < width]
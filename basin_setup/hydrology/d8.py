@@ -0,0 +1,66 @@
+import numpy as np
+import rasterio
+
+# TauDEM D8 flow direction codes, 1 is east going counter clockwise to 8
+# south east. Index 0 is used for cells without a flow direction.
+DROW = np.array([0, 0, -1, -1, -1, 0, 1, 1, 1])
+DCOL = np.array([0, 1, 1, 0, -1, -1, -1, 0, 1])
+
+
+def read_flow_direction(path):
+    """Read a TauDEM D8 flow direction raster
+
+    Args:
+        path (str): D8 flow direction tif
+
+    Returns:
+        tuple: uint8 flow directions with 0 for cells without a direction,
+            and the raster profile
+    """
+
+    with rasterio.open(path) as src:
+        data = src.read(1)
+        profile = src.profile
+
+    fdir = np.where((data >= 1) & (data <= 8), data, 0).astype(np.uint8)
+
+    return fdir, profile
+
+
+def read_streams(path):
+    """Read a stream raster, i.e. from TauDEM threshold
+
+    Args:
+        path (str): stream tif with values greater than 0 on the streams
+
+    Returns:
+        np.ndarray: boolean stream mask
+    """
+
+    with rasterio.open(path) as src:
+        data = src.read(1, masked=True)
+
+    return data.filled(0) > 0
+
+
+def downstream(fdir, rows, cols):
+    """Cells the given cells drain to
+
+    Args:
+        fdir (np.ndarray): D8 flow directions
+        rows (np.ndarray): rows of the cells
+        cols (np.ndarray): columns of the cells
+
+    Returns:
+        tuple: rows and columns of the downstream cells and a boolean of
+            whether the cell has a downstream cell in the grid
+    """
+
+    codes = fdir[rows, cols]
+    rows = rows + DROW[codes]
+    cols = cols + DCOL[codes]
+
+    inside = (codes > 0) & (rows >= 0) & (rows < fdir.shape[0]) & \
+        (cols >= 0) & (cols < fdir.shape[1])
+
+    return rows, cols, inside
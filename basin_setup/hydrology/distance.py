@@ -0,0 +1,128 @@
+import numpy as np
+import rasterio
+
+from basin_setup.hydrology.watersheds import label_links, network_bottom
+
+# Nodata of the height above nearest drainage and flow distance rasters
+NODATA = -9999.0
+
+
+def step_lengths(graph, transform):
+    """Distance from every cell to the cell it drains to
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        transform (Affine): transform of the grid
+
+    Returns:
+        np.ndarray: flat distances, 0 for cells that don't drain anywhere
+    """
+
+    cells = np.arange(graph.size)
+    has_receiver = graph.receivers >= 0
+
+    rows, cols = np.divmod(cells, graph.shape[1])
+    below_rows, below_cols = np.divmod(graph.receivers, graph.shape[1])
+
+    steps = np.hypot((below_rows - rows) * transform.e,
+                     (below_cols - cols) * transform.a)
+
+    return np.where(has_receiver, steps, 0)
+
+
+def flow_distance(graph, outlets, transform):
+    """Distance along the flow path from every cell to the outlet it drains
+    to, accumulated in one sweep up the flow graph from the outlets
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        outlets (np.ndarray): flat index of the outlet cells
+        transform (Affine): transform of the grid
+
+    Returns:
+        np.ndarray: flat distances, NaN for cells that don't drain to an
+            outlet
+    """
+
+    steps = step_lengths(graph, transform)
+
+    distance = np.full(graph.size, np.nan)
+    distance[outlets] = 0
+    done = np.zeros(graph.size, dtype=bool)
+    done[outlets] = True
+
+    frontier = np.asarray(outlets)
+    while len(frontier):
+        donors, receivers = graph.upstream(frontier)
+
+        new = ~done[donors]
+        donors, receivers = donors[new], receivers[new]
+        done[donors] = True
+        distance[donors] = distance[receivers] + steps[donors]
+
+        frontier = donors
+
+    return distance
+
+
+def height_above_drainage(graph, dem, streams):
+    """Height of every cell above the first stream cell downstream of it
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        dem (np.ndarray): flat filled DEM
+        streams (np.ndarray): flat boolean stream mask
+
+    Returns:
+        np.ndarray: flat heights, NaN for cells that don't drain to a
+            stream
+    """
+
+    labels = np.where(streams, np.arange(graph.size), -1)
+    drainage = graph.sweep(labels)[0]
+
+    return np.where(drainage >= 0, dem - dem[drainage], np.nan)
+
+
+def write_flow_products(flow_dir, filled, streams, pour_points, hand=None,
+                        distance=None):
+    """Height above nearest drainage and flow distance to the outlet of the
+    cells draining to the pour points, using the flow graph kept in memory
+    from the delineation
+
+    Args:
+        flow_dir (str): D8 flow direction tif
+        filled (str): pit filled DEM tif
+        streams (str): stream tif for the threshold
+        pour_points (str): corrected pour points
+        hand (str, optional): height above nearest drainage tif. Defaults
+            to None.
+        distance (str, optional): flow distance tif. Defaults to None.
+
+    Returns:
+        tuple: height above nearest drainage and flow distance grids
+    """
+
+    graph, profile, links = label_links(flow_dir, streams, pour_points)
+
+    with rasterio.open(filled) as src:
+        dem = src.read(1, masked=True).astype(np.float64).filled(np.nan)
+
+    heights = height_above_drainage(graph, dem.ravel(), links >= 0)
+    distances = flow_distance(graph, network_bottom(graph, links),
+                              profile['transform'])
+
+    profile = profile.copy()
+    profile.update(driver='GTiff', dtype='float32', count=1, nodata=NODATA)
+
+    results = []
+    for data, path in [(heights, hand), (distances, distance)]:
+        data = np.where(np.isnan(data), NODATA, data).astype(np.float32)
+        data = data.reshape(graph.shape)
+        results.append(data)
+
+        if path is not None:
+            with rasterio.open(path, 'w', **profile) as dst:
+                dst.write(data, 1)
+
+    return tuple(results)
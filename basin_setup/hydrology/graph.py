@@ -0,0 +1,117 @@
+import functools
+import os
+
+import numpy as np
+
+from basin_setup.hydrology.d8 import DCOL, DROW, read_flow_direction
+
+
+class FlowGraph():
+    """Reverse D8 graph of a flow direction grid. The donors of every cell
+    are stored in compressed sparse row form so the cells upstream of a
+    set of cells are found without a loop over the grid. Cells are
+    referred to by their flat index.
+
+    Args:
+        fdir (np.ndarray): D8 flow directions, see `read_flow_direction`
+    """
+
+    def __init__(self, fdir) -> None:
+
+        self.shape = fdir.shape
+        ny, nx = fdir.shape
+
+        rows, cols = np.indices(self.shape)
+        rows = rows.ravel() + DROW[fdir.ravel()]
+        cols = cols.ravel() + DCOL[fdir.ravel()]
+
+        inside = (fdir.ravel() > 0) & (rows >= 0) & (rows < ny) & \
+            (cols >= 0) & (cols < nx)
+
+        # the cell each cell drains to, -1 for none
+        self.receivers = np.full(fdir.size, -1, dtype=np.intp)
+        self.receivers[inside] = rows[inside] * nx + cols[inside]
+
+        cells = np.flatnonzero(inside)
+        order = np.argsort(self.receivers[cells], kind='stable')
+        self.donors = cells[order]
+        self.counts = np.bincount(
+            self.receivers[cells], minlength=fdir.size)
+        self.offsets = np.cumsum(self.counts) - self.counts
+
+    @property
+    def size(self):
+        return self.counts.size
+
+    def upstream(self, cells):
+        """Donors of the cells, the cells that drain directly to them
+
+        Args:
+            cells (np.ndarray): flat index of the cells
+
+        Returns:
+            tuple: donors and the cell each donor drains to
+        """
+
+        counts = self.counts[cells]
+        total = counts.sum()
+
+        receivers = np.repeat(cells, counts)
+        starts = np.repeat(self.offsets[cells] - (np.cumsum(counts) - counts),
+                           counts)
+        donors = self.donors[starts + np.arange(total)]
+
+        return donors, receivers
+
+    def sweep(self, labels):
+        """Give every unlabelled cell the label of the first labelled cell
+        downstream of it. The labels are propagated upstream one frontier
+        at a time so every cell is visited once.
+
+        Args:
+            labels (np.ndarray): flat labels, negative for unlabelled cells
+
+        Returns:
+            tuple: labels and the number of cells to the labelled cell
+                each cell drains to, -1 for cells that don't reach one
+        """
+
+        labels = labels.copy()
+        distance = np.where(labels >= 0, 0, -1)
+
+        frontier = np.flatnonzero(labels >= 0)
+        step = 0
+        while len(frontier):
+            step += 1
+            donors, receivers = self.upstream(frontier)
+
+            new = labels[donors] < 0
+            donors = donors[new]
+            labels[donors] = labels[receivers[new]]
+            distance[donors] = step
+
+            frontier = donors
+
+        return labels, distance
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_flow_graph(path, mtime, size):
+    fdir, profile = read_flow_direction(path)
+    return FlowGraph(fdir), profile
+
+
+def cached_flow_graph(path):
+    """Flow graph of a D8 flow direction raster, built once and cached
+    until the file changes so every threshold uses the same graph
+
+    Args:
+        path (str): D8 flow direction tif
+
+    Returns:
+        tuple: `FlowGraph` and the raster profile
+    """
+
+    stat = os.stat(path)
+    return _cached_flow_graph(
+        os.path.abspath(path), stat.st_mtime, stat.st_size)
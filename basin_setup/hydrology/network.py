@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+from basin_setup.hydrology.watersheds import (NODATA, label_links,
+                                              network_bottom,
+                                              write_watersheds)
+
+
+def link_order(graph, links):
+    """Stream cells grouped by link, each link from its first cell down to
+    its last
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        links (np.ndarray): flat link number of each stream cell, see
+            `stream_links`
+
+    Returns:
+        tuple: sorted flat index of the stream cells, offset of each link
+            in them, the number of cells in each link and the number of
+            cells from each cell to the bottom of the network
+    """
+
+    seeds = np.full(graph.size, NODATA, dtype=np.int32)
+    seeds[network_bottom(graph, links)] = 0
+    distance = graph.sweep(seeds)[1]
+
+    cells = np.flatnonzero(links >= 0)
+    cells = cells[np.lexsort((-distance[cells], links[cells]))]
+    counts = np.bincount(links[cells])
+    offsets = np.cumsum(counts) - counts
+
+    return cells, offsets, counts, distance
+
+
+def strahler(downstream, order):
+    """Strahler order and magnitude of the links. A link's order is the
+    largest order upstream of it, plus one where two or more links of that
+    order join, links without upstream links are order 1.
+
+    Args:
+        downstream (list): downstream link of each link, -1 for none
+        order (list): links sorted from upstream to downstream
+
+    Returns:
+        tuple: Strahler order and magnitude of each link
+    """
+
+    n = len(downstream)
+    orders = [0] * n
+    magnitude = [0] * n
+    largest = [0] * n
+    n_largest = [0] * n
+
+    for link in order:
+        if largest[link] == 0:
+            orders[link] = magnitude[link] = 1
+        else:
+            orders[link] = largest[link] + (n_largest[link] > 1)
+
+        down = downstream[link]
+        if down < 0:
+            continue
+
+        magnitude[down] += magnitude[link]
+        if orders[link] > largest[down]:
+            largest[down] = orders[link]
+            n_largest[down] = 1
+        elif orders[link] == largest[down]:
+            n_largest[down] += 1
+
+    return orders, magnitude
+
+
+def stream_network(graph, links, watersheds, transform):
+    """Derive the stream network from the stream links in one pass over
+    the stream cells, in place of TauDEM streamnet
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        links (np.ndarray): flat link number of each stream cell, see
+            `stream_links`
+        watersheds (np.ndarray): flat link number of the watershed of each
+            cell
+        transform (Affine): transform of the grid
+
+    Returns:
+        tuple: link table and the cell center coordinates along each link
+            down into the next link. The table has the downstream and first
+            two upstream links (-1 for none), Strahler order, magnitude,
+            length and contributing area in cells at the bottom of the
+            link, indexed by the link number.
+    """
+
+    cells, offsets, counts, distance = link_order(graph, links)
+    n = len(counts)
+    nx = graph.shape[1]
+
+    # the cell below the last cell of each link is in the downstream link
+    ends = offsets + counts - 1
+    below = graph.receivers[cells[ends]]
+    downstream = np.full(n, -1, dtype=np.int64)
+    downstream[below >= 0] = links[below[below >= 0]]
+    below[downstream < 0] = -1
+
+    # first two upstream links of each link in link order
+    upstream = np.full((n, 2), -1, dtype=np.int64)
+    tributaries = np.flatnonzero(downstream >= 0)
+    tributaries = tributaries[np.argsort(downstream[tributaries],
+                                         kind='stable')]
+    first = np.diff(downstream[tributaries], prepend=-1) != 0
+    second = np.zeros_like(first)
+    second[1:] = ~first[1:] & first[:-1]
+    upstream[downstream[tributaries[first]], 0] = tributaries[first]
+    upstream[downstream[tributaries[second]], 1] = tributaries[second]
+
+    # every link's head is further from the bottom than the links below it
+    topological = np.argsort(-distance[cells[offsets]], kind='stable')
+    topological = topological.tolist()
+    order, magnitude = strahler(downstream.tolist(), topological)
+
+    # contributing area at the bottom of each link is its own watershed and
+    # every watershed upstream
+    area = np.bincount(watersheds[watersheds >= 0], minlength=n).tolist()
+    for link in topological:
+        if downstream[link] >= 0:
+            area[downstream[link]] += area[link]
+
+    # cell centers along each link including the first cell of the next
+    path = np.insert(cells, ends[below >= 0] + 1, below[below >= 0])
+    path_offsets = offsets + np.cumsum(below >= 0) - (below >= 0)
+    path_counts = counts + (below >= 0)
+
+    rows, cols = np.divmod(path, nx)
+    x = transform.c + (cols + 0.5) * transform.a
+    y = transform.f + (rows + 0.5) * transform.e
+
+    step = np.hypot(np.diff(x), np.diff(y))
+    step = np.append(step, 0)
+    step[path_offsets + path_counts - 1] = 0
+    length = np.add.reduceat(step, path_offsets) if n else step[:0]
+
+    lines = [list(zip(x[s:s + c].tolist(), y[s:s + c].tolist()))
+             for s, c in zip(path_offsets.tolist(), path_counts.tolist())]
+
+    table = pd.DataFrame({
+        'downstream': downstream,
+        'upstream_1': upstream[:, 0],
+        'upstream_2': upstream[:, 1],
+        'order': order,
+        'magnitude': magnitude,
+        'length': length,
+        'contributing_area': area
+    }, index=pd.RangeIndex(n, name='link'))
+
+    return table, lines
+
+
+def write_network(table, lines, output, crs=None, cell_area=1):
+    """Write the stream network lines with the streamnet field names
+
+    Args:
+        table (pd.DataFrame): link table, see `stream_network`
+        lines (list): coordinates along each link
+        output (str): shapefile, or a folder for the shapefile
+        crs (CRS, optional): crs of the lines. Defaults to None.
+        cell_area (float, optional): area of a cell. Defaults to 1.
+    """
+
+    # geopandas is slow to import, only load it once it's needed
+    import geopandas as gpd
+    from shapely.geometry import LineString
+
+    # a single cell link at the bottom of the network is a point
+    geometry = [LineString(xy * 2 if len(xy) == 1 else xy) for xy in lines]
+
+    gdf = gpd.GeoDataFrame({
+        'LINKNO': table.index.values,
+        'DSLINKNO': table['downstream'].values,
+        'USLINKNO1': table['upstream_1'].values,
+        'USLINKNO2': table['upstream_2'].values,
+        'strmOrder': table['order'].values,
+        'Length': table['length'].values,
+        'Magnitude': table['magnitude'].values,
+        'DSContArea': table['contributing_area'].values * cell_area,
+        'WSNO': table.index.values
+    }, geometry=geometry, crs=crs)
+
+    gdf.to_file(output, driver='ESRI Shapefile')
+
+
+def delineate_network(flow_dir, streams, pour_points, watersheds=None,
+                      network=None, links=None):
+    """Label the watersheds and derive the stream network of the links
+    draining to the pour points, in place of TauDEM aread8 with outlets,
+    threshold and streamnet
+
+    Args:
+        flow_dir (str): D8 flow direction tif
+        streams (str): stream tif for the threshold
+        pour_points (str): corrected pour points
+        watersheds (str, optional): watersheds tif. Defaults to None.
+        network (str, optional): stream network shapefile. Defaults to
+            None.
+        links (str, optional): link table csv. Defaults to None.
+
+    Returns:
+        tuple: watershed labels and the link table, see `stream_network`
+    """
+
+    graph, profile, link_labels = label_links(flow_dir, streams, pour_points)
+    labels = graph.sweep(link_labels)[0]
+
+    transform = profile['transform']
+    table, lines = stream_network(graph, link_labels, labels, transform)
+    labels = labels.reshape(graph.shape)
+
+    if watersheds is not None:
+        write_watersheds(labels, profile, watersheds)
+
+    if network is not None:
+        crs = profile['crs'].to_dict() if profile['crs'] else None
+        write_network(table, lines, network, crs=crs,
+                      cell_area=abs(transform.a * transform.e))
+
+    if links is not None:
+        table.to_csv(links)
+
+    return labels, table
@@ -0,0 +1,249 @@
+import csv
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+
+from basin_setup.hydrology.d8 import (downstream, read_flow_direction,
+                                      read_streams)
+
+# How a pour point that is not on a stream is moved, `downslope` follows
+# the flow directions like TauDEM moveoutletstostrm and `nearest` moves it
+# to the closest stream cell.
+SNAP_RULES = ['downslope', 'nearest']
+
+
+def read_bna(path):
+    """Read the point records of a BNA file
+
+    Args:
+        path (str): BNA file of points
+
+    Returns:
+        pd.DataFrame: Primary ID, x and y of each point
+    """
+
+    with open(path) as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    records = []
+    i = 0
+    while i < len(lines):
+        fields = next(csv.reader([lines[i]]))
+        n = int(fields[-1])
+        if n != 1:
+            raise ValueError(
+                '{} has a record with {} coordinates, only points are '
+                'supported'.format(path, n))
+
+        x, y = [float(v) for v in lines[i + 1].split(',')[:2]]
+        records.append({'Primary ID': fields[0], 'x': x, 'y': y})
+        i += 2
+
+    return pd.DataFrame(records, columns=['Primary ID', 'x', 'y'])
+
+
+def read_pour_points(path):
+    """Read pour points from a BNA file or any file geopandas can read
+
+    Args:
+        path (str): pour points file
+
+    Returns:
+        pd.DataFrame: Primary ID, x and y of each point
+    """
+
+    if path.lower().endswith('.bna'):
+        return read_bna(path)
+
+    import geopandas as gpd
+
+    gdf = gpd.read_file(path)
+    return pd.DataFrame({
+        'Primary ID': gdf['Primary ID'].values,
+        'x': gdf.geometry.x.values,
+        'y': gdf.geometry.y.values
+    })
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_flow_direction(path, mtime, size):
+    return read_flow_direction(path)
+
+
+def cached_flow_direction(path):
+    """Flow directions cached until the file changes, every threshold is
+    snapped with the same flow directions
+
+    Args:
+        path (str): D8 flow direction tif
+
+    Returns:
+        tuple: flow directions and profile, see `read_flow_direction`
+    """
+
+    stat = os.stat(path)
+    return _cached_flow_direction(
+        os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+
+def stencil(radius):
+    """Cell offsets within `radius` cells sorted by distance
+
+    Args:
+        radius (int): search radius in cells
+
+    Returns:
+        tuple: row offsets, column offsets and distances in cells
+    """
+
+    offsets = np.arange(-radius, radius + 1)
+    drow, dcol = [d.ravel() for d in np.meshgrid(offsets, offsets,
+                                                 indexing='ij')]
+    distance = np.hypot(drow, dcol)
+
+    keep = distance <= radius
+    drow, dcol, distance = drow[keep], dcol[keep], distance[keep]
+
+    # ties are broken in row major order so the result is deterministic
+    order = np.lexsort((dcol, drow, distance))
+
+    return drow[order], dcol[order], distance[order]
+
+
+def snap_outlets(x, y, fdir, streams, transform, rule='downslope',
+                 max_distance=50):
+    """Move the pour points onto stream cells. All the points are snapped
+    at once, the downslope rule walks every point one cell at a time and
+    the nearest rule checks a stencil of offsets around every point.
+
+    Points already on a stream keep their location, moved points are put
+    in the center of the stream cell. Points without a stream within
+    `max_distance` cells, or outside of the grid, are not moved.
+
+    Args:
+        x (np.ndarray): x coordinates of the points
+        y (np.ndarray): y coordinates of the points
+        fdir (np.ndarray): D8 flow directions, see `read_flow_direction`
+        streams (np.ndarray): boolean stream mask
+        transform (Affine): transform of the grids
+        rule (str, optional): one of `SNAP_RULES`. Defaults to 'downslope'.
+        max_distance (int, optional): search distance in cells. Defaults
+            to 50.
+
+    Returns:
+        tuple: new x and y and the distance moved in cells, -1 for points
+            that were not moved
+    """
+
+    if rule not in SNAP_RULES:
+        raise ValueError('rule must be one of {}'.format(SNAP_RULES))
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    ny, nx = streams.shape
+
+    cols = np.floor((x - transform.c) / transform.a).astype(int)
+    rows = np.floor((y - transform.f) / transform.e).astype(int)
+    inside = (rows >= 0) & (rows < ny) & (cols >= 0) & (cols < nx)
+
+    on_stream = np.zeros(len(x), dtype=bool)
+    on_stream[inside] = streams[rows[inside], cols[inside]]
+
+    distance = np.where(on_stream, 0.0, -1.0)
+    new_rows = rows.copy()
+    new_cols = cols.copy()
+    search = np.flatnonzero(inside & ~on_stream)
+
+    if rule == 'downslope':
+        r = rows[search]
+        c = cols[search]
+        for step in range(1, max_distance + 1):
+            if len(search) == 0:
+                break
+
+            r, c, ok = downstream(fdir, r, c)
+            search, r, c = search[ok], r[ok], c[ok]
+
+            hit = streams[r, c]
+            distance[search[hit]] = step
+            new_rows[search[hit]] = r[hit]
+            new_cols[search[hit]] = c[hit]
+
+            search, r, c = search[~hit], r[~hit], c[~hit]
+
+    elif len(search) > 0:
+        drow, dcol, dist = stencil(max_distance)
+
+        r = rows[search, None] + drow
+        c = cols[search, None] + dcol
+        ok = (r >= 0) & (r < ny) & (c >= 0) & (c < nx)
+
+        hits = np.zeros(r.shape, dtype=bool)
+        hits[ok] = streams[r[ok], c[ok]]
+
+        found = hits.any(axis=1)
+        first = hits.argmax(axis=1)[found]
+        search = search[found]
+
+        distance[search] = dist[first]
+        new_rows[search] = r[found, first]
+        new_cols[search] = c[found, first]
+
+    moved = distance > 0
+    x = x.copy()
+    y = y.copy()
+    x[moved] = transform.c + (new_cols[moved] + 0.5) * transform.a
+    y[moved] = transform.f + (new_rows[moved] + 0.5) * transform.e
+
+    return x, y, distance
+
+
+def move_outlets_to_streams(flow_dir, streams, pour_points, output,
+                            rule='downslope', max_distance=50):
+    """Snap the pour points to the streams and write the corrected points
+    shapefile, replaces TauDEM moveoutletstostrm
+
+    Args:
+        flow_dir (str): D8 flow direction tif
+        streams (str): stream tif
+        pour_points (str): pour points BNA or shapefile
+        output (str): corrected points shapefile
+        rule (str, optional): one of `SNAP_RULES`. Defaults to 'downslope'.
+        max_distance (int, optional): search distance in cells. Defaults
+            to 50.
+
+    Returns:
+        pd.DataFrame: Primary ID, x, y and Dist_moved of the points
+    """
+
+    fdir, profile = cached_flow_direction(flow_dir)
+    points = read_pour_points(pour_points)
+
+    x, y, distance = snap_outlets(
+        points['x'].values,
+        points['y'].values,
+        fdir,
+        read_streams(streams),
+        profile['transform'],
+        rule=rule,
+        max_distance=max_distance
+    )
+    points['x'] = x
+    points['y'] = y
+    points['Dist_moved'] = distance
+
+    # geopandas is slow to import, only load it once it's needed
+    import geopandas as gpd
+    from shapely.geometry import Point
+
+    crs = profile['crs'].to_dict() if profile['crs'] else None
+    gdf = gpd.GeoDataFrame(
+        points[['Primary ID', 'Dist_moved']],
+        geometry=[Point(xy) for xy in zip(x, y)],
+        crs=crs
+    )
+    gdf.to_file(output)
+
+    return points
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import rasterio
+
+from basin_setup.hydrology.graph import cached_flow_graph
+from basin_setup.hydrology.outlets import (cached_flow_direction,
+                                           read_pour_points, snap_outlets)
+from basin_setup.hydrology.watersheds import (basin_labels, link_heads,
+                                              outlet_cells)
+
+
+class ThresholdSearch():
+    """Count the subbasins a stream threshold would make from the drainage
+    area that is already calculated, without running the rest of the
+    delineation. The pour points are snapped to the streams of each
+    threshold like `outlets_2_streams` and a subbasin is counted for every
+    stream link draining to them.
+
+    Args:
+        flow_dir (str): D8 flow direction tif
+        drain_area (str): drainage area tif in cells
+        pour_points (str): pour points BNA or shapefile
+        rule (str, optional): snapping rule, see `SNAP_RULES`. Defaults to
+            'downslope'.
+        max_distance (int, optional): snapping distance in cells. Defaults
+            to 50.
+    """
+
+    def __init__(self, flow_dir, drain_area, pour_points, rule='downslope',
+                 max_distance=50) -> None:
+
+        self.fdir, profile = cached_flow_direction(flow_dir)
+        self.graph = cached_flow_graph(flow_dir)[0]
+        self.transform = profile['transform']
+        self.cell_area = abs(self.transform.a * self.transform.e)
+
+        with rasterio.open(drain_area) as src:
+            self.drain_area = src.read(1, masked=True).filled(0)
+
+        points = read_pour_points(pour_points)
+        self.x = points['x'].values
+        self.y = points['y'].values
+        self.rule = rule
+        self.max_distance = max_distance
+
+        self.trials = {}
+
+    def subbasins(self, threshold):
+        """Number of subbasins and their mean area for a threshold
+
+        Args:
+            threshold (int): drainage area in cells to start a stream
+
+        Returns:
+            tuple: number of subbasins and their mean area
+        """
+
+        if threshold not in self.trials:
+            streams = self.drain_area >= threshold
+            x, y, _ = snap_outlets(self.x, self.y, self.fdir, streams,
+                                   self.transform, rule=self.rule,
+                                   max_distance=self.max_distance)
+            outlets = outlet_cells(x, y, self.transform, self.graph.shape)
+
+            basin = basin_labels(self.graph, outlets) >= 0
+            heads = link_heads(self.graph, streams.ravel(), outlets,
+                               basin=basin)[1]
+
+            count = int(heads.sum())
+            area = basin.sum() * self.cell_area / count if count else np.nan
+            self.trials[threshold] = (count, area)
+
+        return self.trials[threshold]
+
+    def search(self, subbasins=None, mean_area=None):
+        """Bisect the thresholds for the one closest to a number of
+        subbasins or a mean subbasin area. Fewer and larger subbasins are
+        made the larger the threshold.
+
+        Args:
+            subbasins (int, optional): number of subbasins. Defaults to
+                None.
+            mean_area (float, optional): mean subbasin area in the units of
+                the grid. Defaults to None.
+
+        Returns:
+            int: the threshold
+        """
+
+        if (subbasins is None) == (mean_area is None):
+            raise ValueError('Give either a number of subbasins or a mean'
+                             ' subbasin area')
+
+        # both increase with the threshold
+        if subbasins is not None:
+            target = -subbasins
+
+            def key(threshold):
+                return -self.subbasins(threshold)[0]
+        else:
+            target = mean_area
+
+            def key(threshold):
+                return self.subbasins(threshold)[1]
+
+        # smallest threshold reaching the target
+        low, high = 1, max(1, int(np.ceil(self.drain_area.max())))
+        while low < high:
+            middle = (low + high) // 2
+            if key(middle) >= target:
+                high = middle
+            else:
+                low = middle + 1
+
+        if low > 1 and abs(key(low - 1) - target) < abs(key(low) - target):
+            low -= 1
+
+        return low
+
+    def table(self):
+        """Every threshold tried
+
+        Returns:
+            pd.DataFrame: number of subbasins and mean area indexed by the
+                threshold
+        """
+
+        df = pd.DataFrame.from_dict(self.trials, orient='index',
+                                    columns=['subbasins', 'mean_area'])
+        df.index.name = 'threshold'
+
+        return df.sort_index()
@@ -0,0 +1,217 @@
+import numpy as np
+import rasterio
+
+from basin_setup.hydrology.d8 import read_streams
+from basin_setup.hydrology.graph import cached_flow_graph
+from basin_setup.hydrology.outlets import read_pour_points
+
+# Label of cells that don't drain to an outlet
+NODATA = -1
+
+
+def outlet_cells(x, y, transform, shape):
+    """Flat index of the cells the points are in, points outside of the
+    grid are dropped
+
+    Args:
+        x (np.ndarray): x coordinates of the points
+        y (np.ndarray): y coordinates of the points
+        transform (Affine): transform of the grid
+        shape (tuple): shape of the grid
+
+    Returns:
+        np.ndarray: flat index of the outlet cells
+    """
+
+    cols = np.floor((np.asarray(x) - transform.c) / transform.a).astype(int)
+    rows = np.floor((np.asarray(y) - transform.f) / transform.e).astype(int)
+    inside = (rows >= 0) & (rows < shape[0]) & \
+        (cols >= 0) & (cols < shape[1])
+
+    return rows[inside] * shape[1] + cols[inside]
+
+
+def basin_labels(graph, outlets):
+    """Label every cell with the nearest outlet downstream of it
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        outlets (np.ndarray): flat index of the outlet cells
+
+    Returns:
+        np.ndarray: flat index into `outlets` for each cell, -1 for cells
+            that don't drain to an outlet
+    """
+
+    labels = np.full(graph.size, NODATA, dtype=np.int32)
+    labels[outlets] = np.arange(len(outlets))
+
+    return graph.sweep(labels)[0]
+
+
+def link_heads(graph, streams, outlets, basin=None):
+    """First cell of every stream link draining to the outlets. A link
+    starts at a stream source, below a junction or below an outlet.
+    Outlets that are not on a stream are their own link.
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        streams (np.ndarray): flat boolean stream mask
+        outlets (np.ndarray): flat index of the outlet cells
+        basin (np.ndarray, optional): flat boolean mask of the cells
+            draining to the outlets. Defaults to None, found from the
+            outlets.
+
+    Returns:
+        tuple: flat boolean masks of the streams in the basin, the link
+            heads and the outlets
+    """
+
+    if basin is None:
+        basin = basin_labels(graph, outlets) >= 0
+
+    streams = streams & basin
+    streams[outlets] = True
+
+    is_outlet = np.zeros(graph.size, dtype=bool)
+    is_outlet[outlets] = True
+
+    # stream cells draining to another stream cell in the same basin
+    cells = np.flatnonzero(streams)
+    receivers = graph.receivers[cells]
+    to_stream = receivers >= 0
+    to_stream[to_stream] = streams[receivers[to_stream]]
+    cells, receivers = cells[to_stream], receivers[to_stream]
+
+    n_donors = np.bincount(receivers, minlength=graph.size)
+    stream_donor = np.full(graph.size, -1, dtype=np.intp)
+    stream_donor[receivers] = cells
+
+    # a link continues through cells with a single stream donor that is
+    # not an outlet
+    heads = streams & (n_donors != 1)
+    single = np.flatnonzero(streams & (n_donors == 1))
+    heads[single[is_outlet[stream_donor[single]]]] = True
+
+    return streams, heads, is_outlet
+
+
+def stream_links(graph, streams, outlets):
+    """Split the streams that drain to the outlets into links, see
+    `link_heads`. A link ends at the next junction or outlet.
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        streams (np.ndarray): flat boolean stream mask
+        outlets (np.ndarray): flat index of the outlet cells
+
+    Returns:
+        np.ndarray: flat link number of each stream cell, numbered from 0
+            in the order of the link's first cell, -1 elsewhere
+    """
+
+    streams, heads, is_outlet = link_heads(graph, streams, outlets)
+
+    links = np.full(graph.size, NODATA, dtype=np.int32)
+    frontier = np.flatnonzero(heads)
+    links[frontier] = np.arange(len(frontier))
+
+    # walk each link downstream until the next head
+    is_link = streams & ~heads
+    while len(frontier):
+        frontier = frontier[~is_outlet[frontier]]
+        downstream = graph.receivers[frontier]
+        ok = downstream >= 0
+        ok[ok] = is_link[downstream[ok]]
+
+        links[downstream[ok]] = links[frontier[ok]]
+        frontier = downstream[ok]
+
+    return links
+
+
+def network_bottom(graph, links):
+    """Stream cells at the bottom of the network, not draining to another
+    stream cell
+
+    Args:
+        graph (FlowGraph): flow graph of the grid
+        links (np.ndarray): flat link numbers, see `stream_links`
+
+    Returns:
+        np.ndarray: flat index of the cells
+    """
+
+    cells = np.flatnonzero(links >= 0)
+    below = graph.receivers[cells]
+    bottom = below < 0
+    bottom[~bottom] = links[below[~bottom]] < 0
+
+    return cells[bottom]
+
+
+def label_links(flow_dir, streams, pour_points):
+    """Label the stream links draining to the pour points
+
+    Args:
+        flow_dir (str): D8 flow direction tif
+        streams (str): stream tif for the threshold
+        pour_points (str): corrected pour points
+
+    Returns:
+        tuple: cached `FlowGraph` and profile of the flow directions and the
+            flat link numbers, see `stream_links`
+    """
+
+    graph, profile = cached_flow_graph(flow_dir)
+
+    points = read_pour_points(pour_points)
+    outlets = outlet_cells(
+        points['x'].values, points['y'].values, profile['transform'],
+        graph.shape)
+
+    links = stream_links(graph, read_streams(streams).ravel(), outlets)
+
+    return graph, profile, links
+
+
+def write_watersheds(watersheds, profile, output):
+    """Write the watershed labels like streamnet does
+
+    Args:
+        watersheds (np.ndarray): watershed labels
+        profile (dict): profile of the flow directions
+        output (str): watersheds tif
+    """
+
+    profile = profile.copy()
+    profile.update(driver='GTiff', dtype='int32', count=1, nodata=NODATA)
+    with rasterio.open(output, 'w', **profile) as dst:
+        dst.write(watersheds, 1)
+
+
+def delineate_watersheds(flow_dir, streams, pour_points, output=None):
+    """Label the watershed of every stream link draining to the pour points
+    in a single sweep up the reverse flow graph, in place of TauDEM aread8
+    with outlets, threshold and streamnet. The flow graph is built once
+    for every threshold.
+
+    Args:
+        flow_dir (str): D8 flow direction tif
+        streams (str): stream tif for the threshold
+        pour_points (str): corrected pour points
+        output (str, optional): watersheds tif. Defaults to None, only
+            return the labels.
+
+    Returns:
+        np.ndarray: link number of the watershed of each cell, -1 for cells
+            that don't drain to the pour points
+    """
+
+    graph, profile, links = label_links(flow_dir, streams, pour_points)
+    watersheds = graph.sweep(links)[0].reshape(graph.shape)
+
+    if output is not None:
+        write_watersheds(watersheds, profile, output)
+
+    return watersheds
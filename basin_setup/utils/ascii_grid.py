@@ -0,0 +1,137 @@
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+# Data types GDAL writes as integers, everything else is written as a float
+INT_TYPES = [np.uint8, np.int16, np.uint16, np.int32]
+
+# Approximate number of cells formatted at a time
+CHUNK_CELLS = 2**20
+
+
+def header(width, height, transform, nodata=None, integer=True):
+    """ESRI ASCII grid header with the same formatting as GDAL's AAIGrid
+    driver
+
+    Args:
+        width (int): number of columns
+        height (int): number of rows
+        transform (Affine): transform of the grid
+        nodata (float, optional): nodata value. Defaults to None.
+        integer (bool, optional): format the nodata value as an integer.
+            Defaults to True.
+
+    Returns:
+        str: header lines
+    """
+
+    gt = transform.to_gdal()
+    lines = [
+        'ncols        {:d}'.format(width),
+        'nrows        {:d}'.format(height),
+        'xllcorner    {:.12f}'.format(gt[0]),
+    ]
+
+    if abs(gt[1] + gt[5]) < 1e-7 or abs(gt[1] - gt[5]) < 1e-7:
+        lines += [
+            'yllcorner    {:.12f}'.format(gt[3] - height * gt[1]),
+            'cellsize     {:.12f}'.format(gt[1]),
+        ]
+    else:
+        lines += [
+            'yllcorner    {:.12f}'.format(gt[3] + height * gt[5]),
+            'dx           {:.12f}'.format(gt[1]),
+            'dy           {:.12f}'.format(abs(gt[5])),
+        ]
+
+    if nodata is not None:
+        if integer:
+            lines.append('NODATA_value {:d}'.format(int(nodata)))
+        else:
+            lines.append('NODATA_value {}'.format('%.20g' % nodata))
+
+    return '\n'.join(lines) + '\n'
+
+
+def format_rows(array, integer=True):
+    """Format rows of a grid as ASCII grid lines. The whole block is
+    formatted by a single % operation on the values.
+
+    Args:
+        array (np.ndarray): 2D block of rows
+        integer (bool, optional): format the values as integers, otherwise
+            with 20 significant digits. Defaults to True.
+
+    Returns:
+        str: one line for each row, every value followed by a space
+    """
+
+    fmt = '%d ' if integer else '%.20g '
+    line = fmt * array.shape[1] + '\n'
+
+    return (line * array.shape[0]) % tuple(array.ravel().tolist())
+
+
+def mark_float(text):
+    """Add `.0` to the first finite value of the text if it has no decimal
+    point, so readers detect a float grid like GDAL does
+
+    Args:
+        text (str): formatted rows
+
+    Returns:
+        tuple: text and a bool of whether the first finite value was found
+    """
+
+    start = 0
+    for value in text.replace('\n', ' ').split(' '):
+        end = start + len(value)
+        if value and value.lstrip('-') not in ['nan', 'inf']:
+            if '.' not in value and 'e' not in value:
+                text = text[:end] + '.0' + text[end:]
+            return text, True
+        start = end + 1
+
+    return text, False
+
+
+def write_ascii_grid(infile, outfile, band=1, chunk_cells=CHUNK_CELLS):
+    """Convert a raster to an ESRI ASCII grid, byte identical to
+    `gdal_translate -of AAIGrid`. The grid is read and formatted in blocks
+    of rows so the memory used is bounded by `chunk_cells`. A .prj is
+    written next to the grid when the raster has a CRS.
+
+    Args:
+        infile (str): path to the raster
+        outfile (str): path to the .asc file
+        band (int, optional): band to convert. Defaults to 1.
+        chunk_cells (int, optional): approximate number of cells to format
+            at a time. Defaults to `CHUNK_CELLS`.
+    """
+
+    with rasterio.open(infile) as src:
+        dtype = np.dtype(src.dtypes[band - 1])
+        integer = any([dtype == t for t in INT_TYPES])
+
+        rows = max(chunk_cells // src.width, 1)
+        marked = integer
+
+        with open(outfile, 'w') as f:
+            f.write(header(src.width, src.height, src.transform,
+                           src.nodatavals[band - 1], integer=integer))
+
+            for row in range(0, src.height, rows):
+                window = Window(
+                    0, row, src.width, min(rows, src.height - row))
+                text = format_rows(
+                    src.read(band, window=window), integer=integer)
+
+                if not marked:
+                    text, marked = mark_float(text)
+
+                f.write(text)
+
+        if src.crs is not None:
+            prj = outfile.rsplit('.', 1)[0] + '.prj'
+            with open(prj, 'w') as f:
+                f.write(src.crs.to_wkt(version='WKT1_ESRI'))
@@ -0,0 +1,159 @@
+import functools
+import os
+
+import netCDF4 as nc
+import numpy as np
+
+
+def _values(variable):
+    """Read a netcdf variable as a float array with NaN for missing values"""
+    return np.ma.filled(variable[:].astype(np.float64), np.nan)
+
+
+class BandIndex():
+    """Flat index of the basin cells in a topo grouped by elevation band,
+    with the sub basin each cell is in. Summarizing a grid on the topo
+    domain is then a `np.bincount` over the basin cells instead of a scan
+    of the DEM. The cells of band `i` are
+    `cells[offsets[i]:offsets[i] + band_cells[i]]`.
+
+    Args:
+        dem (np.ndarray): topo DEM
+        mask (np.ndarray): basin mask, cells with a DEM and a mask of 1
+            are indexed
+        band_size (float, optional): height of the elevation bands.
+            Defaults to 100.
+        subbasins (list, optional): name and mask of each sub basin.
+            Defaults to None.
+    """
+
+    def __init__(self, dem, mask, band_size=100, subbasins=None) -> None:
+
+        dem = np.asarray(dem, dtype=np.float64).ravel()
+        inside = (np.asarray(mask).ravel() == 1) & ~np.isnan(dem)
+
+        self.shape = np.shape(mask)
+        self.band_size = band_size
+
+        cells = np.flatnonzero(inside)
+        origin = np.floor(dem[cells].min() / band_size) * band_size \
+            if len(cells) else 0
+        band = np.floor((dem[cells] - origin) / band_size).astype(np.intp)
+
+        order = np.argsort(band, kind='stable')
+        self.cells = cells[order]
+        self.band = band[order]
+
+        n_bands = self.band.max() + 1 if len(cells) else 0
+        self.bands = origin + np.arange(n_bands) * band_size
+        self.band_cells = np.bincount(self.band, minlength=n_bands)
+        self.offsets = np.cumsum(self.band_cells) - self.band_cells
+
+        # sub basins can overlap so each one has its own cells
+        self.subbasin_names = []
+        self.subbasin_cells = []
+        for name, subbasin in subbasins or []:
+            subbasin = np.asarray(subbasin).ravel()[self.cells] == 1
+            self.subbasin_names.append(name)
+            self.subbasin_cells.append(np.flatnonzero(subbasin))
+
+    @classmethod
+    def from_topo(cls, topo, band_size=100):
+        """Index the basin and sub basins of a topo.nc
+
+        Args:
+            topo (str): topo.nc
+            band_size (float, optional): height of the elevation bands.
+                Defaults to 100.
+
+        Returns:
+            BandIndex: index of the topo
+        """
+
+        with nc.Dataset(topo) as ds:
+            dem = _values(ds.variables['dem'])
+            mask = np.ma.filled(ds.variables['mask'][:], 0)
+
+            subbasins = []
+            if 'subbasin_id' in ds.variables:
+                labels = np.ma.filled(ds.variables['subbasin_id'][:], 0)
+                names = ds.variables['subbasin_name'][:]
+                layers = ds.variables['subbasin_layer_index'][:]
+                ids = ds.variables['subbasin'][:]
+                for name, layer, subbasin_id in zip(names, layers, ids):
+                    subbasins.append(
+                        (str(name), labels[layer] == subbasin_id))
+
+            elif 'subbasin_mask' in ds.variables:
+                variable = ds.variables['subbasin_mask']
+                subbasins.append(
+                    (variable.long_name, np.ma.filled(variable[:], 0)))
+
+        return cls(dem, mask, band_size=band_size, subbasins=subbasins)
+
+    def summarize(self, values):
+        """Mean and coverage of a grid on the topo domain in every
+        elevation band and sub basin. The coverage is the fraction of the
+        cells with a value.
+
+        Args:
+            values (np.ndarray): grid to summarize, NaN for no value
+
+        Returns:
+            dict: `band_mean` and `band_coverage` for each elevation band,
+                `subbasin_mean` and `subbasin_coverage` for each sub basin
+                and the `basin_mean` and `basin_coverage`
+        """
+
+        values = np.ma.filled(
+            np.ma.asarray(values, dtype=np.float64), np.nan).ravel()
+        values = values[self.cells]
+
+        finite = ~np.isnan(values)
+        n_bands = len(self.bands)
+        count = np.bincount(self.band[finite], minlength=n_bands)
+        total = np.bincount(self.band[finite], weights=values[finite],
+                            minlength=n_bands)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            summary = {
+                'band_mean': total / count,
+                'band_coverage': count / self.band_cells,
+                'basin_mean': total.sum() / count.sum(),
+                'basin_coverage': count.sum() / len(self.cells),
+                'subbasin_mean': np.full(len(self.subbasin_cells), np.nan),
+                'subbasin_coverage': np.zeros(len(self.subbasin_cells)),
+            }
+
+        for i, cells in enumerate(self.subbasin_cells):
+            n = finite[cells].sum()
+            if len(cells):
+                summary['subbasin_coverage'][i] = n / len(cells)
+            if n:
+                summary['subbasin_mean'][i] = \
+                    values[cells][finite[cells]].mean()
+
+        return summary
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_band_index(path, mtime, size, band_size):
+    return BandIndex.from_topo(path, band_size=band_size)
+
+
+def cached_band_index(topo, band_size=100):
+    """Elevation band index of a topo.nc, built once and cached until the
+    file changes so every flight uses the same index
+
+    Args:
+        topo (str): topo.nc
+        band_size (float, optional): height of the elevation bands.
+            Defaults to 100.
+
+    Returns:
+        BandIndex: index of the topo
+    """
+
+    stat = os.stat(topo)
+    return _cached_band_index(
+        os.path.abspath(topo), stat.st_mtime, stat.st_size, band_size)
@@ -0,0 +1,41 @@
+import glob
+import os
+
+from inicheck.checkers import CheckPath
+
+
+class CheckRasterSource(CheckPath):
+    """
+    Checks a raster source, either a single raster file, a directory of
+    raster tiles or a glob pattern matching raster tiles
+    """
+
+    def __init__(self, **kwargs):
+        super(CheckRasterSource, self).__init__(**kwargs)
+        self.message = "No raster file, directory or files matching the" \
+            " pattern found."
+        self.msg_level = 'error'
+
+    def is_valid(self, value):
+        """
+        Checks for an existing file, directory or glob matches
+
+        Args:
+            value: Single value to be evaluated
+
+        Returns:
+            tuple:
+                **valid** - Boolean whether the value was acceptable
+                **msg** - string to print if value is not valid.
+        """
+
+        v = self.make_abs_from_cfg(value)
+        valid = os.path.isfile(v) or os.path.isdir(v) or \
+            len(glob.glob(v)) > 0
+
+        if valid:
+            msg = None
+        else:
+            msg = self.message
+
+        return valid, msg
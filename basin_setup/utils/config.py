@@ -1,11 +1,24 @@
+import functools
 import os
 import sys
 
-from inicheck.config import UserConfig
+from inicheck.config import MasterConfig, UserConfig
 from inicheck.output import print_config_report
 from inicheck.tools import check_config, get_user_config
 
 
+@functools.lru_cache(maxsize=None)
+def master_config():
+    """Parse the CoreConfig once per process, the worker reuses it for
+    every job
+
+    Returns:
+        MasterConfig: basin_setup master config
+    """
+
+    return MasterConfig(modules='basin_setup')
+
+
 def read(config):
     """Read an inicheck config file and return the user config
 
@@ -28,7 +41,7 @@ def read(config):
         configFile = config
 
         # Read in the original users config
-        ucfg = get_user_config(config, modules='basin_setup')
+        ucfg = get_user_config(config, mcfg=master_config())
 
     elif isinstance(config, UserConfig):
         ucfg = config
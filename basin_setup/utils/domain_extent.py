@@ -1,9 +1,18 @@
 import re
+from collections import namedtuple
 from subprocess import check_output
 
 import netCDF4 as nc
 import numpy as np
 import rasterio
+from rasterio.windows import Window
+
+# A tile of the domain. `window` locates the tile in the full grid,
+# `extents` are the tile's own extents and `halo_extents` include the
+# overlap. `core` is the (row, col) slice of the halo grid that is in the
+# tile.
+Tile = namedtuple('Tile', ['row', 'col', 'window', 'extents',
+                           'halo_extents', 'core'])
 
 
 def create_extents(x_ll, y_ll, n_cols, n_rows, dx, dy):
@@ -209,3 +218,93 @@ def affine_transform_from_extents(extents, cell_size):
     )
 
     return transform, x, y
+
+
+def tile_extents(extents, cell_size, tile_size, halo=0):
+    """Split the extents into tiles aligned to the `cell_size` grid. Tiles
+    are `tile_size` cells on a side, except along the right and bottom
+    edges, and have `halo` cells of overlap with their neighbors.
+
+    Args:
+        extents (list): domain extents [left, bottom, right, top]
+        cell_size (float): cell size of the domain
+        tile_size (int): number of cells on each side of a tile
+        halo (int, optional): number of overlapping cells around each
+            tile. Defaults to 0.
+
+    Returns:
+        list: `Tile` for each tile, ordered by row then column
+    """
+
+    _, x, y = affine_transform_from_extents(extents, cell_size)
+    pad = halo * cell_size
+
+    tiles = []
+    for row, row_off in enumerate(range(0, len(y), tile_size)):
+        for col, col_off in enumerate(range(0, len(x), tile_size)):
+            window = Window(
+                col_off,
+                row_off,
+                min(tile_size, len(x) - col_off),
+                min(tile_size, len(y) - row_off)
+            )
+
+            # same arithmetic as np.arange to keep the cells aligned
+            left = extents[0] + col_off * cell_size
+            top = extents[3] - row_off * cell_size
+            tile = [
+                left,
+                top - window.height * cell_size,
+                left + window.width * cell_size,
+                top
+            ]
+
+            tiles.append(Tile(
+                row=row,
+                col=col,
+                window=window,
+                extents=tile,
+                halo_extents=[
+                    tile[0] - pad,
+                    tile[1] - pad,
+                    tile[2] + pad,
+                    tile[3] + pad
+                ],
+                core=(
+                    slice(halo, halo + window.height),
+                    slice(halo, halo + window.width)
+                )
+            ))
+
+    return tiles
+
+
+def bounds_window(bounds, transform, width, height, pad=0):
+    """Window of a grid that covers the bounds. The window is snapped
+    outwards to whole cells, padded and clipped to the grid.
+
+    Args:
+        bounds (list): bounds to cover [left, bottom, right, top]
+        transform (Affine): transform of the grid
+        width (int): number of columns in the grid
+        height (int): number of rows in the grid
+        pad (int, optional): number of cells to add to each side.
+            Defaults to 0.
+
+    Returns:
+        Window: window of the grid, None if the bounds are outside the grid
+    """
+
+    # row and column of the corners, works for north up and south up
+    cols, rows = ~transform * (
+        np.array([bounds[0], bounds[2]]), np.array([bounds[3], bounds[1]]))
+
+    col_off = max(int(np.floor(cols.min())) - pad, 0)
+    row_off = max(int(np.floor(rows.min())) - pad, 0)
+    col_end = min(int(np.ceil(cols.max())) + pad, width)
+    row_end = min(int(np.ceil(rows.max())) + pad, height)
+
+    if col_end <= col_off or row_end <= row_off:
+        return None
+
+    return Window(col_off, row_off, col_end - col_off, row_end - row_off)
@@ -0,0 +1,87 @@
+import errno
+import os
+import shutil
+import sys
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl to clone a file on Linux copy on write filesystems (btrfs, XFS)
+FICLONE = 0x40049409
+
+# How files are packaged into an output folder. `link` hardlinks or
+# reflinks the file and falls back to copying.
+STRATEGIES = ['link', 'copy', 'move']
+
+
+def reflink(src, dst):
+    """Clone `src` to `dst` sharing the data blocks on a copy on write
+    filesystem
+
+    Args:
+        src (str): file to clone
+        dst (str): path of the clone
+
+    Raises:
+        OSError: if the platform or filesystem doesn't support reflinks
+    """
+
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, 'Reflinks are not supported')
+
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+    shutil.copymode(src, dst)
+
+
+def link_or_copy(src, dst, strategy='link'):
+    """Put a file in the output without duplicating the data when possible.
+    With the `link` strategy the file is hardlinked when on the same
+    filesystem, reflinked on copy on write filesystems and otherwise
+    copied. An existing `dst` is replaced like `shutil.copy` does.
+
+    Args:
+        src (str): file to package
+        dst (str): destination file or folder
+        strategy (str, optional): one of `STRATEGIES`. Defaults to 'link'.
+
+    Returns:
+        str: how the file was packaged, hardlink, reflink, copy or move
+    """
+
+    if strategy not in STRATEGIES:
+        raise ValueError('strategy must be one of {}'.format(STRATEGIES))
+
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    if strategy == 'move':
+        shutil.move(src, dst)
+        return 'move'
+
+    if strategy == 'link':
+        if os.path.lexists(dst):
+            os.remove(dst)
+
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+
+        try:
+            reflink(src, dst)
+            return 'reflink'
+        except OSError:
+            pass
+
+    shutil.copy(src, dst)
+    return 'copy'
@@ -1,3 +1,4 @@
+import os
 import subprocess as sp
 
 
@@ -77,3 +78,65 @@ def gdalwarp(src_image, dst_image, target_crs, extents,
         logger.debug(cmd)
 
     return call_subprocess(cmd, 'gdalwarp', logger)
+
+
+def gdal_translate(src_image, dst_image, extents, logger=None):
+    """gdal_translate to subset an image to the extents in the image's own
+    projection, no resampling is performed. The subset is a tiled and
+    compressed GeoTIFF.
+
+    Args:
+        src_image (str): source image
+        dst_image (str): destination file for the subset
+        extents (list): Extents to subset to [left, bottom, right, top]
+        logger (logging, optional): Log information to the logger if provided.
+            Defaults to None.
+
+    Returns:
+        boolean: True if call to gdal_translate was successful
+    """
+
+    cmd = "gdal_translate -projwin {} {} {} {} -co TILED=YES " \
+        "-co COMPRESS=DEFLATE -co BIGTIFF=IF_SAFER {} {}".format(
+            extents[0],
+            extents[3],
+            extents[2],
+            extents[1],
+            src_image,
+            dst_image
+        )
+
+    if logger is not None:
+        logger.debug(cmd)
+
+    return call_subprocess(cmd, 'gdal_translate', logger)
+
+
+def gdalbuildvrt(src_images, dst_vrt, logger=None):
+    """gdalbuildvrt to mosaic images into a virtual raster, the images
+    are only referenced and not copied
+
+    Args:
+        src_images (list): images to mosaic, must share a projection
+        dst_vrt (str): destination VRT file
+        logger (logging, optional): Log information to the logger if provided.
+            Defaults to None.
+
+    Returns:
+        boolean: True if call to gdalbuildvrt was successful
+    """
+
+    # pass the images in a file, there can be too many for the command line
+    file_list = os.path.splitext(dst_vrt)[0] + '_files.txt'
+    with open(file_list, 'w') as f:
+        f.write('\n'.join(src_images))
+
+    cmd = "gdalbuildvrt -overwrite -input_file_list {} {}".format(
+        file_list,
+        dst_vrt
+    )
+
+    if logger is not None:
+        logger.debug(cmd)
+
+    return call_subprocess(cmd, 'gdalbuildvrt', logger)
@@ -1,5 +1,7 @@
+import functools
 import logging.config
 import os
+import tracemalloc
 
 import coloredlogs
 
@@ -37,6 +39,12 @@ class BasinSetupLogger():
                     'handlers': ['default'],
                     'level': self.log_level,
                     'propagate': False
+                },
+                # configured by name so the basin_setup loggers created by a
+                # previous run in the worker are not disabled
+                'basin_setup': {
+                    'level': self.log_level,
+                    'propagate': True
                 }
             }
         }
@@ -58,3 +66,36 @@ class BasinSetupLogger():
 
         if self.log_file is None:
             coloredlogs.install(level=self.log_level, fmt=self.FMT)
+
+
+def log_peak_memory(method):
+    """Decorator for a stage method to log the peak memory allocated during
+    the stage to the instance `_logger`. Numpy registers its allocations
+    with tracemalloc so the peak includes the grid copies made by the stage
+    but not the memory of the GDAL and TauDEM subprocesses.
+
+    Memory is only traced when the logger is at the DEBUG level, and not
+    when tracemalloc is already tracing, i.e. in an enclosing stage or
+    a benchmark, so their peak is not reset.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self._logger.isEnabledFor(logging.DEBUG) or \
+                tracemalloc.is_tracing():
+            return method(self, *args, **kwargs)
+
+        tracemalloc.start()
+        try:
+            result = method(self, *args, **kwargs)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self._logger.debug(
+            '{} peak memory {:.1f} MB ({:.1f} MB retained)'.format(
+                method.__name__, peak / 1024**2, current / 1024**2))
+
+        return result
+
+    return wrapper
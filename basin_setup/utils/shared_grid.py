@@ -0,0 +1,224 @@
+import os
+import tempfile
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # python < 3.8, only the memmap backend is available
+    shared_memory = None
+
+# memory mapped files in a RAM backed folder are never written to disk
+if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+    MEMORY_DIRECTORY = '/dev/shm'
+else:
+    MEMORY_DIRECTORY = None
+
+
+class SharedGrid():
+    """Grid backed by shared memory or a memory mapped file that can be
+    handed to other processes without copying the array. Only the name of
+    the buffer and the grid metadata are pickled, the receiving process
+    attaches to the same buffer.
+
+        with SharedGrid.create((ny, nx), np.float32, transform=t) as grid:
+            with ProcessPoolExecutor() as executor:
+                executor.map(func, [grid] * n, ...)
+
+    The process that creates the grid owns the buffer and frees it when
+    leaving the context manager or calling `unlink`. The owner of a
+    `memmap` grid can instead `detach` the array to keep using the values
+    without copying them out of the buffer.
+
+    This is only a container for handing grids to worker processes. The
+    `shared_memory` backend needs python 3.8+.
+
+    Args:
+        name (str): shared memory name or path to the memory mapped file
+        shape (tuple): shape of the array
+        dtype (np.dtype): data type of the array
+        backend (str, optional): `shared_memory` or `memmap`. Defaults
+            to 'shared_memory'.
+        transform (Affine, optional): transform of the grid. Defaults
+            to None.
+        crs (str, optional): CRS of the grid. Defaults to None.
+        nodata (float, optional): nodata value. Defaults to None.
+    """
+
+    BACKENDS = ['shared_memory', 'memmap']
+
+    def __init__(self, name, shape, dtype, backend='shared_memory',
+                 transform=None, crs=None, nodata=None) -> None:
+
+        self._check_backend(backend)
+
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.backend = backend
+        self.transform = transform
+        self.crs = crs
+        self.nodata = nodata
+
+        self._owner = False
+        self._attach()
+
+    @classmethod
+    def create(cls, shape, dtype, backend='shared_memory', directory=None,
+               **kwargs):
+        """Create a new zero filled grid
+
+        Args:
+            shape (tuple): shape of the array
+            dtype (np.dtype): data type of the array
+            backend (str, optional): `shared_memory` or `memmap`. Defaults
+                to 'shared_memory'.
+            directory (str, optional): folder for the `memmap` file.
+                Defaults to the system temp folder.
+            kwargs: transform, crs and nodata passed to `SharedGrid`
+
+        Returns:
+            SharedGrid: grid owned by the current process
+        """
+
+        cls._check_backend(backend)
+        nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+
+        if backend == 'shared_memory':
+            buffer = shared_memory.SharedMemory(create=True, size=nbytes)
+            name = buffer.name
+            buffer.close()
+
+        elif backend == 'memmap':
+            fd, name = tempfile.mkstemp(suffix='.grid', dir=directory)
+            os.ftruncate(fd, nbytes)
+            os.close(fd)
+
+        grid = cls(name, shape, dtype, backend=backend, **kwargs)
+        grid._owner = True
+
+        return grid
+
+    @classmethod
+    def from_array(cls, array, **kwargs):
+        """Create a grid with a copy of `array`
+
+        Args:
+            array (np.ndarray): values for the grid
+            kwargs: passed to `SharedGrid.create`
+
+        Returns:
+            SharedGrid: grid owned by the current process
+        """
+
+        grid = cls.create(array.shape, array.dtype, **kwargs)
+        grid.array[:] = array
+
+        return grid
+
+    @classmethod
+    def from_dataarray(cls, da, **kwargs):
+        """Create a grid from a rioxarray DataArray, i.e. the clipped DEM
+
+        Args:
+            da (xr.DataArray): DataArray with the rio accessor
+            kwargs: passed to `SharedGrid.create`
+
+        Returns:
+            SharedGrid: grid owned by the current process
+        """
+
+        crs = da.rio.crs
+        return cls.from_array(
+            da.values,
+            transform=da.rio.transform(),
+            crs=crs.to_string() if crs is not None else None,
+            nodata=da.rio.nodata,
+            **kwargs
+        )
+
+    @classmethod
+    def _check_backend(cls, backend):
+        if backend not in cls.BACKENDS:
+            raise ValueError('backend must be one of {}'.format(
+                cls.BACKENDS))
+
+        if backend == 'shared_memory' and shared_memory is None:
+            raise ValueError(
+                'The shared_memory backend needs python 3.8 or newer, '
+                'use the memmap backend')
+
+    def _attach(self):
+        if self.backend == 'shared_memory':
+            self._buffer = shared_memory.SharedMemory(name=self.name)
+            self.array = np.ndarray(
+                self.shape, dtype=self.dtype, buffer=self._buffer.buf)
+
+        else:
+            self._buffer = None
+            self.array = np.memmap(
+                self.name, dtype=self.dtype, mode='r+', shape=self.shape)
+
+    def close(self):
+        """Detach from the buffer, the array can't be used after closing"""
+
+        self.array = None
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+    def unlink(self):
+        """Free the buffer, only called by the process that created it"""
+
+        if self.backend == 'shared_memory':
+            shared_memory.SharedMemory(name=self.name).unlink()
+        elif os.path.exists(self.name):
+            os.remove(self.name)
+
+        self._owner = False
+
+    def detach(self):
+        """Free the buffer and return the array of a `memmap` grid without
+        copying it. The file is removed so no other process can attach, the
+        memory is released once the array and its views are no longer used.
+        Only called by the process that created the grid.
+
+        Returns:
+            np.ndarray: array of the grid
+        """
+
+        if self.backend != 'memmap':
+            raise ValueError('Only memmap grids can be detached')
+
+        array = self.array
+        try:
+            os.remove(self.name)
+        except OSError:
+            # a mapped file can't be removed on Windows
+            array = np.array(array)
+            self.array = None
+            os.remove(self.name)
+
+        self.array = None
+        self._owner = False
+
+        return array
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['array'], state['_buffer']
+        state['_owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._attach()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        if self._owner:
+            self.unlink()
@@ -0,0 +1,161 @@
+import glob
+import json
+import logging
+import os
+
+import rasterio
+from rasterio.warp import transform_bounds
+
+# Extensions of the raster tiles when the source is a directory
+EXTENSIONS = ['.tif', '.tiff', '.img']
+
+
+def source_files(source):
+    """Raster files for a source that is a file, a directory or a glob
+
+    Args:
+        source (str): raster file, directory of tiles or glob pattern
+
+    Returns:
+        list: sorted raster file paths
+    """
+
+    if os.path.isfile(source):
+        return [source]
+
+    if os.path.isdir(source):
+        return sorted([
+            os.path.join(source, f) for f in os.listdir(source)
+            if os.path.splitext(f)[1].lower() in EXTENSIONS
+        ])
+
+    return sorted([f for f in glob.glob(source) if os.path.isfile(f)])
+
+
+class TileIndex():
+    """Spatial index of raster tiles. The bounds and projection of each tile
+    are stored in a `.tile_index.json` sidecar in the tile's directory so
+    the tiles are only opened the first time they are seen or after they
+    change.
+
+    Args:
+        source (str): directory of tiles or glob pattern
+    """
+
+    INDEX_FILE = '.tile_index.json'
+
+    def __init__(self, source) -> None:
+
+        self._logger = logging.getLogger(__name__)
+        self.source = source
+        self.files = source_files(source)
+
+        if len(self.files) == 0:
+            raise ValueError('No raster tiles found for {}'.format(source))
+
+        self.tiles = {}
+        for directory in sorted(set(
+                [os.path.dirname(f) for f in self.files])):
+            self.tiles.update(self.update(directory, [
+                f for f in self.files if os.path.dirname(f) == directory
+            ]))
+
+    def update(self, directory, files):
+        """Load the sidecar index for a directory and add any tiles that are
+        new or have changed since they were indexed
+
+        Args:
+            directory (str): directory of the tiles
+            files (list): tiles in the directory
+
+        Returns:
+            dict: index entry for each tile in `files`
+        """
+
+        index_file = os.path.join(directory, self.INDEX_FILE)
+
+        index = {}
+        if os.path.isfile(index_file):
+            with open(index_file) as f:
+                index = json.load(f)
+
+        changed = False
+        for tile in files:
+            name = os.path.basename(tile)
+            stat = os.stat(tile)
+
+            entry = index.get(name)
+            if entry is not None and entry['mtime'] == stat.st_mtime and \
+                    entry['size'] == stat.st_size:
+                continue
+
+            with rasterio.open(tile) as src:
+                index[name] = {
+                    'mtime': stat.st_mtime,
+                    'size': stat.st_size,
+                    'bounds': list(src.bounds),
+                    'crs': src.crs.to_wkt() if src.crs else None,
+                }
+            changed = True
+
+        if changed:
+            self._logger.debug('Updating tile index {}'.format(index_file))
+            self.write(index_file, index)
+
+        return {
+            tile: index[os.path.basename(tile)] for tile in files
+        }
+
+    def write(self, index_file, index):
+        """Write the index, a read only tile directory only logs a warning
+
+        Args:
+            index_file (str): path to the sidecar file
+            index (dict): index entries keyed by tile file name
+        """
+
+        # write and rename so parallel runs never read a partial index
+        temp_file = '{}.{}'.format(index_file, os.getpid())
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump(index, f, indent=2)
+            os.replace(temp_file, index_file)
+
+        except OSError as e:
+            self._logger.warning(
+                'Unable to write the tile index {}: {}'.format(index_file, e))
+
+    def intersecting(self, extents, crs):
+        """Tiles that intersect the extents
+
+        Args:
+            extents (list): Extents to crop to [left, bottom, right, top]
+            crs (str): projection of the extents, i.e. EPSG:32611
+
+        Returns:
+            list: tile file paths
+        """
+
+        bounds = {}
+        tiles = []
+        for tile, entry in self.tiles.items():
+            if entry['crs'] not in bounds:
+                bounds[entry['crs']] = transform_bounds(
+                    crs, entry['crs'], *extents, densify_pts=21)
+
+            left, bottom, right, top = bounds[entry['crs']]
+            if entry['bounds'][0] < right and entry['bounds'][2] > left and \
+                    entry['bounds'][1] < top and entry['bounds'][3] > bottom:
+                tiles.append(tile)
+
+        if len(tiles) == 0:
+            raise ValueError(
+                'No raster tiles in {} intersect the extents {}'.format(
+                    self.source, extents))
+
+        if len(set([self.tiles[tile]['crs'] for tile in tiles])) > 1:
+            raise ValueError(
+                'Raster tiles that intersect the domain must have the same'
+                ' projection to be mosaicked')
+
+        return tiles
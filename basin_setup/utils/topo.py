@@ -0,0 +1,35 @@
+from collections.abc import Mapping
+
+
+class SubbasinMasks(Mapping):
+    """Read only mapping of sub basin name to boolean mask for a topo
+    with `subbasin_encoding = labels`. Masks are only created when a sub
+    basin is accessed.
+
+        ds = xr.open_dataset('topo.nc')
+        masks = SubbasinMasks(ds)
+        dobson = masks['Dobson Subbasin']
+
+    Args:
+        ds (xr.Dataset): topo dataset with `subbasin_id`, `subbasin_name`
+            and `subbasin_layer_index` variables
+    """
+
+    def __init__(self, ds) -> None:
+        self.ds = ds
+        names = [str(name) for name in ds['subbasin_name'].values]
+        self.ids = dict(zip(names, ds['subbasin'].values))
+        self.layers = dict(zip(names, ds['subbasin_layer_index'].values))
+
+    def __getitem__(self, name):
+        layer = self.ds['subbasin_id'].isel(subbasin_layer=self.layers[name])
+        mask = layer == self.ids[name]
+        mask.name = 'subbasin_mask'
+        mask.attrs = {'long_name': name}
+        return mask
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
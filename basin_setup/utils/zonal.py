@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+
+def zonal_stats(labels, values=None, nodata=None, cell_area=1):
+    """Cell count, area and statistics of `values` for every label in a
+    single pass over the grid. Counts and sums are reduced with
+    `np.bincount`, the minimum and maximum with `reduceat` over the cells
+    sorted by label.
+
+    Args:
+        labels (np.ndarray): integer label for each cell
+        values (np.ndarray, optional): values to summarize, i.e. the DEM.
+            NaN values are counted in the zone but not in the statistics.
+            Defaults to None, only count the cells.
+        nodata (int, optional): label of cells outside of every zone, as
+            well as negative labels. Defaults to None.
+        cell_area (float, optional): area of a cell. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: `cells` and `area` and the `mean`, `min` and `max` of
+            `values` indexed by the labels that are in the grid
+    """
+
+    labels = np.asarray(labels).ravel()
+
+    valid = labels >= 0
+    if nodata is not None:
+        valid &= labels != nodata
+
+    ids = labels[valid].astype(np.intp)
+    counts = np.bincount(ids)
+    zones = np.flatnonzero(counts)
+
+    df = pd.DataFrame(index=pd.Index(zones, name='label'))
+    df['cells'] = counts[zones]
+    df['area'] = df['cells'] * cell_area
+
+    if values is None:
+        return df
+
+    values = np.asarray(values, dtype=np.float64).ravel()[valid]
+    finite = ~np.isnan(values)
+    ids = ids[finite]
+    values = values[finite]
+
+    n = np.bincount(ids, minlength=len(counts))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(ids, weights=values, minlength=len(counts)) / n
+    df['mean'] = mean[zones]
+
+    # zones without any values are NaN
+    minimum = np.full(len(counts), np.nan)
+    maximum = np.full(len(counts), np.nan)
+
+    present = np.flatnonzero(n)
+    if len(present):
+        order = np.argsort(ids, kind='stable')
+        starts = np.cumsum(n[present]) - n[present]
+        values = values[order]
+        minimum[present] = np.minimum.reduceat(values, starts)
+        maximum[present] = np.maximum.reduceat(values, starts)
+
+    df['min'] = minimum[zones]
+    df['max'] = maximum[zones]
+
+    return df
+
+
+def hypsometry(labels, values, band_size, origin=None, nodata=None):
+    """Fraction of the area of every label in each elevation band in a
+    single `np.bincount` over the label and band of every cell
+
+    Args:
+        labels (np.ndarray): integer label for each cell
+        values (np.ndarray): elevation of each cell, NaN cells are left out
+        band_size (float): height of the bands
+        origin (float, optional): bottom of the lowest band. Defaults to
+            None, the minimum value rounded down to `band_size`.
+        nodata (int, optional): label of cells outside of every zone, as
+            well as negative labels. Defaults to None.
+
+    Returns:
+        pd.DataFrame: area fraction of each band with a column for the
+            bottom of each band and indexed by the labels that have values
+    """
+
+    labels = np.asarray(labels).ravel()
+    values = np.asarray(values, dtype=np.float64).ravel()
+
+    valid = (labels >= 0) & ~np.isnan(values)
+    if nodata is not None:
+        valid &= labels != nodata
+
+    ids = labels[valid].astype(np.intp)
+    values = values[valid]
+
+    if len(values) == 0:
+        return pd.DataFrame(index=pd.Index([], name='label'),
+                            columns=pd.Index([], name='band'))
+
+    if origin is None:
+        origin = np.floor(values.min() / band_size) * band_size
+
+    bands = np.floor((values - origin) / band_size).astype(np.intp)
+    if bands.min() < 0:
+        raise ValueError('Values below the bottom of the lowest band')
+
+    n_bands = bands.max() + 1
+    counts = np.bincount(ids * n_bands + bands,
+                         minlength=(ids.max() + 1) * n_bands)
+    counts = counts.reshape(-1, n_bands)
+
+    zones = np.flatnonzero(counts.sum(axis=1))
+    fractions = counts[zones] / counts[zones].sum(axis=1, keepdims=True)
+
+    return pd.DataFrame(
+        fractions,
+        index=pd.Index(zones, name='label'),
+        columns=pd.Index(origin + np.arange(n_bands) * band_size,
+                         name='band')
+    )
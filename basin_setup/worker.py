@@ -0,0 +1,246 @@
+import importlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import traceback
+
+from basin_setup.utils import config
+
+# Commands the worker can run, the same entry points as the console scripts
+COMMANDS = {
+    'generate_topo': 'basin_setup.cli.generate_topo:main',
+    'grm': 'basin_setup.cli.grm:main',
+}
+
+# Modules imported when the worker starts so the jobs don't pay for them
+WARM_MODULES = [
+    'basin_setup.generate_topo',
+    'basin_setup.generate_topo.batch',
+    'basin_setup.grm',
+]
+
+DEFAULT_SOCKET = os.path.join(
+    tempfile.gettempdir(), 'basin_setup_worker.sock')
+
+
+def load_command(command):
+    """Import the entry point for a command
+
+    Args:
+        command (str): name of the command in `COMMANDS`
+
+    Returns:
+        function: main function that takes a list of arguments
+    """
+
+    if command not in COMMANDS:
+        raise ValueError('Unknown command {}, must be one of {}'.format(
+            command, sorted(COMMANDS.keys())))
+
+    module, function = COMMANDS[command].split(':')
+    return getattr(importlib.import_module(module), function)
+
+
+def run_job(job):
+    """Run a job in the current process. Jobs are run one at a time since
+    the working directory is changed to the one the job was submitted from.
+
+    Args:
+        job (dict): `command`, `args` and optional `cwd` of the job
+
+    Returns:
+        dict: `status` of ok or error, the `result` of the command or the
+            `error` and `traceback`, and the `elapsed` seconds
+    """
+
+    start = time.time()
+    cwd = os.getcwd()
+
+    response = {'status': 'ok', 'result': None}
+    try:
+        main = load_command(job.get('command'))
+
+        os.chdir(job.get('cwd') or cwd)
+        response['result'] = main(list(job.get('args', [])))
+
+    except SystemExit as e:
+        # argparse and the config check exit instead of raising
+        if e.code != 0:
+            response = {
+                'status': 'error',
+                'error': 'Exited with status {}'.format(e.code)
+            }
+
+    except Exception as e:
+        response = {
+            'status': 'error',
+            'error': '{}: {}'.format(type(e).__name__, e),
+            'traceback': traceback.format_exc()
+        }
+
+    finally:
+        os.chdir(cwd)
+
+    response['elapsed'] = time.time() - start
+
+    return response
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """Read a json job from the connection and write back the response,
+    one line each
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # connection from `ping`
+            return
+
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            self.respond({
+                'status': 'error',
+                'error': 'Invalid job: {}'.format(e)
+            })
+            return
+
+        if job.get('command') == 'shutdown':
+            self.respond({'status': 'ok', 'result': None})
+            threading.Thread(target=self.server.shutdown).start()
+            return
+
+        log = self.server._logger
+        log.info('Running {} {}'.format(
+            job.get('command'), ' '.join(job.get('args', []))))
+
+        response = run_job(job)
+
+        log.info('Finished {} with status {} in {:0.1f}s'.format(
+            job.get('command'), response['status'], response['elapsed']))
+
+        self.respond(response)
+
+    def respond(self, response):
+        self.wfile.write(json.dumps(response, default=str).encode() + b'\n')
+
+
+class Worker(socketserver.UnixStreamServer):
+    """Long running worker that accepts `generate_topo` and `grm` jobs on a
+    Unix socket. The imports, the parsed CoreConfig and the vegetation
+    lookup tables are kept for the life of the worker so each job only
+    pays for its own work.
+
+    Jobs are run one at a time in the order they are received. Run
+    multiple workers on different sockets to process jobs in parallel.
+
+    Args:
+        socket_path (str, optional): path of the Unix socket. Defaults to
+            `DEFAULT_SOCKET`.
+    """
+
+    # clients waiting for the current job to finish
+    request_queue_size = 128
+
+    def __init__(self, socket_path=DEFAULT_SOCKET) -> None:
+
+        self._logger = logging.getLogger(__name__)
+        self.socket_path = socket_path
+
+        if os.path.exists(socket_path):
+            if ping(socket_path):
+                raise Exception(
+                    'A worker is already running on {}'.format(socket_path))
+
+            # left behind by a worker that didn't shutdown
+            os.remove(socket_path)
+
+        super().__init__(socket_path, JobHandler)
+
+    def warm(self):
+        """Import the modules and parse the CoreConfig the jobs use"""
+
+        start = time.time()
+        for module in WARM_MODULES:
+            importlib.import_module(module)
+        for command in COMMANDS:
+            load_command(command)
+        config.master_config()
+
+        self._logger.info('Worker ready in {:0.1f}s'.format(
+            time.time() - start))
+
+    def serve_forever(self, poll_interval=0.5):
+        self.warm()
+        self._logger.info('Listening on {}'.format(self.socket_path))
+        super().serve_forever(poll_interval=poll_interval)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def submit(command, args, socket_path=DEFAULT_SOCKET, cwd=None,
+           timeout=None):
+    """Submit a job to a worker and wait for the response
+
+    Args:
+        command (str): command in `COMMANDS` or `shutdown`
+        args (list): command line arguments for the command
+        socket_path (str, optional): path of the worker socket. Defaults to
+            `DEFAULT_SOCKET`.
+        cwd (str, optional): working directory for relative paths in the
+            arguments. Defaults to the current working directory.
+        timeout (float, optional): seconds to wait for the job. Defaults to
+            None, wait until it finishes.
+
+    Returns:
+        dict: response from `run_job`
+    """
+
+    job = {
+        'command': command,
+        'args': list(args),
+        'cwd': os.path.abspath(cwd or os.getcwd())
+    }
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path)
+        s.sendall(json.dumps(job).encode() + b'\n')
+
+        with s.makefile('rb') as f:
+            response = f.readline()
+
+    if not response:
+        raise Exception('Worker on {} closed the connection'.format(
+            socket_path))
+
+    return json.loads(response)
+
+
+def ping(socket_path=DEFAULT_SOCKET):
+    """Check if a worker is listening on the socket
+
+    Args:
+        socket_path (str, optional): path of the worker socket. Defaults to
+            `DEFAULT_SOCKET`.
+
+    Returns:
+        bool: True if a worker accepted the connection
+    """
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(socket_path)
+        except OSError:
+            return False
+
+    return True
@@ -0,0 +1,68 @@
+"""
+Start up time of the command line tools. The `timeraw_` benchmarks run in
+a fresh interpreter so the imports are not cached, `track_importtime` is
+the cumulative import time reported by `python -X importtime`.
+"""
+
+import subprocess
+import sys
+
+MODULES = [
+    'basin_setup.cli.generate_topo',
+    'basin_setup.cli.delineate',
+    'basin_setup.cli.grm',
+]
+
+HELP = """
+import sys
+from {module} import main
+sys.argv = ['{module}', '--help']
+try:
+    main()
+except SystemExit:
+    pass
+"""
+
+
+def import_time(module):
+    """Cumulative import time of a module in a new interpreter
+
+    Args:
+        module (str): module to import
+
+    Returns:
+        int: cumulative import time in microseconds
+    """
+
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True
+    ).stderr
+
+    # import time: self [us] | cumulative | imported package
+    for line in stderr.splitlines():
+        columns = line.split('|')
+        if len(columns) == 3 and columns[2].strip() == module:
+            return int(columns[1])
+
+    raise ValueError('{} not found in the import times'.format(module))
+
+
+class Startup():
+
+    params = MODULES
+    param_names = ['module']
+
+    def timeraw_import(self, module):
+        return 'import ' + module
+
+    def timeraw_help(self, module):
+        return HELP.format(module=module)
+
+    def track_importtime(self, module):
+        return import_time(module)
+
+    track_importtime.unit = 'microseconds'
@@ -0,0 +1,107 @@
+"""Helpers shared by the benchmark suites"""
+
+import contextlib
+import functools
+import os
+import time
+import tracemalloc
+from unittest import mock
+
+# Approximate number of cells in the synthetic domains
+SIZES = [1e5, 1e6, 1e7, 1e8]
+
+
+def peak_memory(func, *args, **kwargs):
+    """Peak memory allocated while calling `func`. Numpy registers its
+    allocations with tracemalloc so this captures the full grid copies
+    made by each stage, but not memory used by the GDAL subprocesses.
+
+    Args:
+        func (callable): function to profile
+        *args: arguments passed to `func`
+        **kwargs: keyword arguments passed to `func`
+
+    Returns:
+        int: peak memory in bytes
+    """
+
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+class StepTimer():
+    """Record the wall time of workflow steps and split the CPU time into
+    time spent in Python and time spent in the subprocesses the step
+    launched (GDAL and TauDEM).
+
+    Steps are recorded by patching the functions a workflow calls, e.g.
+
+        timer = StepTimer()
+        with timer.patch(delineate, ['pitremove', 'calcD8Flow']):
+            delineate.ernestafy(...)
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.tags = ()
+
+    @contextlib.contextmanager
+    def step(self, name):
+        """Time the block as step `name`, keyed with the current tags"""
+
+        start = os.times()
+        wall = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = os.times()
+            elapsed = {
+                'wall': time.perf_counter() - wall,
+                'python_cpu': (end.user - start.user) +
+                              (end.system - start.system),
+                'subprocess_cpu': (end.children_user - start.children_user) +
+                                  (end.children_system - start.children_system),  # noqa
+            }
+
+            # steps called more than once are summed
+            record = self.records.setdefault(
+                self.tags + (name,), dict.fromkeys(elapsed, 0.0))
+            for key, value in elapsed.items():
+                record[key] += value
+
+    @contextlib.contextmanager
+    def tagged(self, *tags):
+        """Key all steps recorded in the block with `tags`, i.e. the
+        threshold or the flight
+        """
+
+        previous, self.tags = self.tags, tuple(tags)
+        try:
+            yield
+        finally:
+            self.tags = previous
+
+    def wrap(self, func, name):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.step(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    @contextlib.contextmanager
+    def patch(self, obj, names):
+        """Patch the attributes `names` of `obj` so every call is recorded
+        as a step
+        """
+
+        with contextlib.ExitStack() as stack:
+            for name in names:
+                stack.enter_context(mock.patch.object(
+                    obj, name, self.wrap(getattr(obj, name), name)))
+            yield self
@@ -0,0 +1,104 @@
+"""
+Benchmarks for `delineate.ernestafy` on synthetic DEMs with known
+drainage. Every delineation step is tracked per threshold with the wall
+time and the CPU time split between Python and the TauDEM/GDAL
+subprocesses.
+"""
+
+import os
+import shutil
+import tempfile
+
+from basin_setup import delineate
+
+from . import synthetic
+from .common import SIZES, StepTimer
+
+THRESHOLDS = [1000, 10000]
+
+# Steps 1-3 only run for the first threshold
+FLOW_STEPS = [
+    'pitremove',
+    'calcD8Flow',
+    'calcD8DrainageArea',
+]
+
+THRESHOLD_STEPS = [
+    'defineStreamsByThreshold',
+    'outlets_2_streams',
+    'calcD8DrainageAreaBasin',
+    'delineate_streams',
+    'produce_shapefiles',
+    'output_streamflow',
+]
+
+
+def run_delineate(paths, thresholds=THRESHOLDS, timer=None):
+    """Run the delineation for every threshold the same way `delineate`
+    does from the command line, recording the steps to `timer`.
+
+    Args:
+        paths (dict): synthetic domain from `synthetic.delineate_domain`
+        thresholds (list): thresholds to delineate
+        timer (StepTimer, optional): timer to record the steps to
+
+    Returns:
+        str: output folder, removing it is left to the caller
+    """
+
+    timer = timer or StepTimer()
+    output = tempfile.mkdtemp(prefix='delineate_')
+    temp = os.path.join(output, 'temp')
+    os.mkdir(temp)
+
+    with timer.patch(delineate, FLOW_STEPS + THRESHOLD_STEPS):
+        for i, threshold in enumerate(thresholds):
+            with timer.tagged(threshold):
+                delineate.ernestafy(
+                    paths['dem'],
+                    paths['pour_points'],
+                    output=output,
+                    temp=temp,
+                    threshold=threshold,
+                    rerun=i > 0,
+                    out_streams=True
+                )
+
+    return output
+
+
+class DelineateSteps():
+    """Wall time and CPU split for every delineation step and threshold"""
+
+    params = [SIZES, THRESHOLDS, FLOW_STEPS + THRESHOLD_STEPS]
+    param_names = ['cells', 'threshold', 'step']
+    timeout = 7200
+
+    def setup_cache(self):
+        records = {}
+        for cells in SIZES:
+            timer = StepTimer()
+            output = run_delineate(
+                synthetic.delineate_domain(int(cells)), timer=timer)
+            shutil.rmtree(output)
+            records[cells] = timer.records
+
+        return records
+
+    def setup(self, records, cells, threshold, step):
+        if (threshold, step) not in records[cells]:
+            raise NotImplementedError('{} is not run for threshold {}'.format(
+                step, threshold))
+
+    def track_wall(self, records, cells, threshold, step):
+        return records[cells][(threshold, step)]['wall']
+
+    def track_python_cpu(self, records, cells, threshold, step):
+        return records[cells][(threshold, step)]['python_cpu']
+
+    def track_subprocess_cpu(self, records, cells, threshold, step):
+        return records[cells][(threshold, step)]['subprocess_cpu']
+
+    track_wall.unit = 'seconds'
+    track_python_cpu.unit = 'seconds'
+    track_subprocess_cpu.unit = 'seconds'
@@ -0,0 +1,129 @@
+"""
+Benchmarks for the `GenerateTopo` pipeline on synthetic domains of
+increasing size. Each stage is timed on its own and the peak memory
+allocated by the stage is tracked in bytes.
+"""
+
+from basin_setup.generate_topo import GenerateTopo
+from basin_setup.generate_topo.vegetation import Landfire200
+
+from . import synthetic
+from .common import SIZES, peak_memory
+
+# Order the stages are run in `GenerateTopo.run`
+PIPELINE = [
+    'set_extents',
+    'load_basin_shapefiles',
+    'load_dem',
+    'load_vegetation',
+    'create_masks',
+    'create_netcdf',
+]
+
+
+class _StageBenchmark():
+    """Time and track the peak memory of a single `GenerateTopo` stage.
+    All the stages before `stage` are run in the setup.
+    """
+
+    params = SIZES
+    param_names = ['cells']
+    number = 1
+    repeat = (1, 5, 120.0)
+    timeout = 3600
+
+    stage = None
+
+    def setup(self, cells):
+        paths = synthetic.generate_topo_domain(int(cells))
+        self.subject = GenerateTopo(paths['config'])
+
+        for stage in PIPELINE[:PIPELINE.index(self.stage)]:
+            getattr(self.subject, stage)()
+
+    def run_stage(self):
+        getattr(self.subject, self.stage)()
+
+    def time_stage(self, cells):
+        self.run_stage()
+
+    def track_peakmem_stage(self, cells):
+        return peak_memory(self.run_stage)
+
+    track_peakmem_stage.unit = 'bytes'
+
+
+class _VegetationBenchmark(_StageBenchmark):
+    """Time and track the peak memory of a single vegetation stage on
+    clipped Landfire images
+    """
+
+    def setup(self, cells):
+        self.stage, stage = 'load_vegetation', self.stage
+        super().setup(cells)
+        self.stage = stage
+
+        self.veg = Landfire200(self.subject.config)
+        self.veg.reproject(
+            self.subject.extents,
+            self.subject.cell_size,
+            self.subject.crs['init']
+        )
+        self.veg.load_clipped_images()
+
+        if self.stage == 'calculate_height':
+            self.veg.calculate_tau_and_k()
+
+    def run_stage(self):
+        getattr(self.veg, self.stage)()
+
+
+class SetExtents(_StageBenchmark):
+    stage = 'set_extents'
+
+
+class LoadBasinShapefiles(_StageBenchmark):
+    stage = 'load_basin_shapefiles'
+
+
+class LoadDem(_StageBenchmark):
+    stage = 'load_dem'
+
+
+class LoadVegetation(_StageBenchmark):
+    stage = 'load_vegetation'
+
+
+class CalculateTauAndK(_VegetationBenchmark):
+    stage = 'calculate_tau_and_k'
+
+
+class CalculateHeight(_VegetationBenchmark):
+    stage = 'calculate_height'
+
+
+class CreateMasks(_StageBenchmark):
+    stage = 'create_masks'
+
+
+class CreateNetcdf(_StageBenchmark):
+    stage = 'create_netcdf'
+
+
+class Run():
+    """Full `GenerateTopo.run`, peak memory is the process peak"""
+
+    params = SIZES
+    param_names = ['cells']
+    number = 1
+    repeat = (1, 3, 300.0)
+    timeout = 7200
+
+    def setup(self, cells):
+        self.paths = synthetic.generate_topo_domain(int(cells))
+
+    def time_run(self, cells):
+        GenerateTopo(self.paths['config']).run()
+
+    def peakmem_run(self, cells):
+        GenerateTopo(self.paths['config']).run()
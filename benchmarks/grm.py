@@ -0,0 +1,93 @@
+"""
+Benchmarks for `grm.run_grm` on synthetic lidar flights with dated file
+names. Every GRM step is tracked per flight with the wall time and the
+CPU time split between Python and the GDAL subprocesses.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+
+from basin_setup import grm
+
+from . import synthetic
+from .common import SIZES, StepTimer
+
+FLIGHTS = 3
+
+# Methods called by `grm.run_grm` for each flight
+FLIGHT_STEPS = [
+    '__init__',
+    'grid_match',
+    'add_to_collection',
+]
+
+
+def run_grm(paths, timer=None):
+    """Add every flight to a new lidar depths file the same way `grm`
+    does from the command line, recording the steps to `timer`.
+
+    Args:
+        paths (dict): synthetic domain from `synthetic.grm_domain`
+        timer (StepTimer, optional): timer to record the steps to
+
+    Returns:
+        str: output folder, removing it is left to the caller
+    """
+
+    timer = timer or StepTimer()
+    output = tempfile.mkdtemp(prefix='grm_')
+    temp = os.path.join(output, 'tmp')
+    os.mkdir(temp)
+
+    with timer.patch(grm.GRM, FLIGHT_STEPS):
+        for flight, image in enumerate(paths['images']):
+            with timer.tagged(flight):
+                grm.run_grm(
+                    image=image,
+                    topo=paths['topo'],
+                    basin='lakes',
+                    debug=False,
+                    output=output,
+                    temp=temp,
+                    resample='bilinear',
+                    date=grm.parse_fname_date(image),
+                    log=logging.getLogger(__name__)
+                )
+
+    return output
+
+
+class GRMSteps():
+    """Wall time and CPU split for every GRM step and flight"""
+
+    params = [SIZES, list(range(FLIGHTS)), FLIGHT_STEPS]
+    param_names = ['cells', 'flight', 'step']
+    timeout = 7200
+
+    def setup_cache(self):
+        records = {}
+        for cells in SIZES:
+            timer = StepTimer()
+            output = run_grm(
+                synthetic.grm_domain(int(cells), flights=FLIGHTS),
+                timer=timer
+            )
+            shutil.rmtree(output)
+            records[cells] = timer.records
+
+        return records
+
+    def track_wall(self, records, cells, flight, step):
+        return records[cells][(flight, step)]['wall']
+
+    def track_python_cpu(self, records, cells, flight, step):
+        return records[cells][(flight, step)]['python_cpu']
+
+    def track_subprocess_cpu(self, records, cells, flight, step):
+        return records[cells][(flight, step)]['subprocess_cpu']
+
+    track_wall.unit = 'seconds'
+    track_python_cpu.unit = 'seconds'
+    track_subprocess_cpu.unit = 'seconds'
@@ -0,0 +1,114 @@
+"""
+Profile the generate_topo, delineate and grm workflows on a synthetic
+domain. A cProfile `.prof` file is always written, view it with snakeviz
+or convert it with flameprof. When pyinstrument is installed a html
+flamegraph and a speedscope json are written as well.
+
+    python -m benchmarks.profiling delineate --cells 1e6 --output profiles
+"""
+
+import argparse
+import cProfile
+import os
+import shutil
+
+from basin_setup.generate_topo import GenerateTopo
+
+from . import synthetic
+from .delineate import run_delineate
+from .grm import run_grm
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    Profiler = None
+
+
+def generate_topo(cells):
+    paths = synthetic.generate_topo_domain(cells)
+    GenerateTopo(paths['config']).run()
+
+
+def delineate(cells):
+    shutil.rmtree(run_delineate(synthetic.delineate_domain(cells)))
+
+
+def grm(cells):
+    shutil.rmtree(run_grm(synthetic.grm_domain(cells)))
+
+
+WORKFLOWS = {
+    'generate_topo': generate_topo,
+    'delineate': delineate,
+    'grm': grm,
+}
+
+# builds and caches the synthetic inputs for each workflow
+DOMAINS = {
+    'generate_topo': synthetic.generate_topo_domain,
+    'delineate': synthetic.delineate_domain,
+    'grm': synthetic.grm_domain,
+}
+
+
+def profile(workflow, cells, output):
+    """Profile a workflow with cProfile and pyinstrument
+
+    Args:
+        workflow (str): key in `WORKFLOWS`
+        cells (int): approximate number of cells in the synthetic domain
+        output (str): folder for the profile artifacts
+
+    Returns:
+        list: paths to the profile artifacts
+    """
+
+    os.makedirs(output, exist_ok=True)
+    name = os.path.join(output, '{}_{}'.format(workflow, cells))
+    func = WORKFLOWS[workflow]
+
+    # build the synthetic inputs outside of the profiles
+    DOMAINS[workflow](cells)
+
+    profiler = cProfile.Profile()
+    profiler.runcall(func, cells)
+    profiler.dump_stats(name + '.prof')
+    artifacts = [name + '.prof']
+
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        func(cells)
+        profiler.stop()
+
+        with open(name + '.html', 'w') as f:
+            f.write(profiler.output_html())
+        with open(name + '.speedscope.json', 'w') as f:
+            f.write(profiler.output(SpeedscopeRenderer()))
+
+        artifacts += [name + '.html', name + '.speedscope.json']
+
+    return artifacts
+
+
+def main():
+
+    p = argparse.ArgumentParser(
+        description='Profile a basin_setup workflow on a synthetic domain')
+
+    p.add_argument(dest='workflow', choices=list(WORKFLOWS),
+                   help='Workflow to profile')
+    p.add_argument('-c', '--cells', dest='cells', type=float, default=1e6,
+                   help='Approximate number of cells in the domain')
+    p.add_argument('-o', '--output', dest='output', default='profiles',
+                   help='Folder for the profile artifacts')
+
+    args = p.parse_args()
+
+    for artifact in profile(args.workflow, int(args.cells), args.output):
+        print(artifact)
+
+
+if __name__ == '__main__':
+    main()
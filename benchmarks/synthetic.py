@@ -0,0 +1,413 @@
+"""
+Synthetic inputs for the benchmark suites. Everything is generated from
+numpy so the benchmarks run offline and never need the real Landfire
+downloads. Generated domains are cached on disk by size so repeated
+benchmark runs (and runs across commits) reuse the same inputs.
+"""
+
+import os
+import tempfile
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+import xarray as xr
+from rasterio.transform import from_origin
+from shapely import affinity
+from shapely.geometry import Point
+
+from basin_setup import __veg_parameters__
+from basin_setup.generate_topo.vegetation import Landfire200
+
+CRS = 'EPSG:32611'
+NODATA = -9999
+
+# Upper left corner of every synthetic domain
+ORIGIN = (300000.0, 4200000.0)
+
+# Cell size of the synthetic source rasters and the generated topo
+CELL_SIZE = 10.0
+
+# Number of cells on each side of the basin outline that are not in the basin
+BORDER = 10
+
+DATA_DIR = os.environ.get(
+    'BASIN_SETUP_BENCHMARK_DATA',
+    os.path.join(tempfile.gettempdir(), 'basin_setup_benchmarks')
+)
+
+# Landfire height classes written to the synthetic height csv
+HEIGHT_CLASSES = {
+    101: 'Tree Height = 0-5 meters',
+    102: 'Tree Height = 5-10 meters',
+    103: 'Tree Height = 10-25 meters',
+    104: 'Tree Height = 25-50 meters',
+    111: 'Shrub Height = 0.5-1.0 meter',
+    121: 'Herb Height = 0-0.5 meter',
+}
+
+
+def grid_shape(n_cells):
+    """Square grid with approximately `n_cells` cells
+
+    Args:
+        n_cells (int): target number of cells
+
+    Returns:
+        tuple: (ny, nx)
+    """
+    n = int(np.ceil(np.sqrt(n_cells)))
+    return n, n
+
+
+def write_raster(file_name, data, cell_size=CELL_SIZE, origin=ORIGIN,
+                 nodata=NODATA, crs=CRS):
+    """Write a single band GeoTIFF
+
+    Args:
+        file_name (str): output file name
+        data (np.ndarray): 2D array to write
+        cell_size (float): cell size of the raster
+        origin (tuple): upper left corner (x, y)
+        nodata (float): nodata value
+        crs (str): crs of the raster
+    """
+
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+
+    profile = {
+        'driver': 'GTiff',
+        'height': data.shape[0],
+        'width': data.shape[1],
+        'count': 1,
+        'dtype': data.dtype,
+        'crs': crs,
+        'transform': from_origin(origin[0], origin[1], cell_size, cell_size),
+        'nodata': nodata,
+        'tiled': True,
+        'compress': 'lzw',
+    }
+    with rasterio.open(file_name, 'w', **profile) as dst:
+        dst.write(data, 1)
+
+
+def dem(ny, nx, cell_size=CELL_SIZE):
+    """Synthetic mountain DEM with a single main valley draining south.
+
+    The main channel runs down the center column and exits at the bottom
+    row. Cosine ridges on both valley walls create tributaries that drain
+    into the main channel, so the flow network is known ahead of time.
+
+    Args:
+        ny (int): number of rows
+        nx (int): number of columns
+        cell_size (float): cell size in meters
+
+    Returns:
+        np.ndarray: float32 elevations
+    """
+
+    rows = np.arange(ny, dtype=np.float32)[:, np.newaxis]
+    cols = np.arange(nx, dtype=np.float32)[np.newaxis, :]
+
+    # distance up valley and from the main channel in meters
+    up_valley = (ny - 1 - rows) * cell_size
+    from_channel = np.abs(cols - (nx - 1) / 2) * cell_size
+
+    ridges = 20 * np.cos(2 * np.pi * rows / max(ny / 8, 1)) * \
+        np.minimum(from_channel / (cell_size * 5), 1)
+
+    elevation = 2000 + 0.05 * up_valley + 0.2 * from_channel + ridges
+
+    return elevation.astype(np.float32)
+
+
+def basin_outline(file_name, ny, nx, cell_size=CELL_SIZE, origin=ORIGIN):
+    """Elliptical basin outline inset `BORDER` cells from the domain edge
+
+    Args:
+        file_name (str): output shapefile name
+        ny (int): number of rows in the domain
+        nx (int): number of columns in the domain
+        cell_size (float): cell size in meters
+        origin (tuple): upper left corner (x, y)
+    """
+
+    center = Point(
+        origin[0] + nx * cell_size / 2,
+        origin[1] - ny * cell_size / 2
+    )
+    radius_x = (nx / 2 - BORDER) * cell_size
+    radius_y = (ny / 2 - BORDER) * cell_size
+
+    outline = affinity.scale(center.buffer(1, resolution=64),
+                             radius_x, radius_y)
+
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    gpd.GeoDataFrame(
+        {'name': ['synthetic']}, geometry=[outline], crs=CRS
+    ).to_file(file_name)
+
+
+def landfire_200(folder, ny, nx, seed=0):
+    """Create a Landfire 2.0.0 style vegetation folder with a veg type
+    raster, a veg height raster and the height class csv.
+
+    Args:
+        folder (str): vegetation folder, used as `vegetation_folder`
+        ny (int): number of rows
+        nx (int): number of columns
+        seed (int): random seed
+    """
+
+    rng = np.random.default_rng(seed)
+
+    veg_params = pd.read_csv(__veg_parameters__)
+    veg_types = veg_params.loc[
+        veg_params['tau'].notnull(), 'landfire200'].unique()
+    veg_types = rng.choice(veg_types, size=min(40, len(veg_types)),
+                           replace=False)
+
+    write_raster(
+        os.path.join(folder, Landfire200.VEGETATION_TYPE),
+        rng.choice(veg_types, size=(ny, nx)).astype(np.int16)
+    )
+    write_raster(
+        os.path.join(folder, Landfire200.VEGETATION_HEIGHT),
+        rng.choice(list(HEIGHT_CLASSES), size=(ny, nx)).astype(np.int16)
+    )
+
+    height_csv = pd.DataFrame({
+        'VALUE': list(HEIGHT_CLASSES),
+        'CLASSNAMES': list(HEIGHT_CLASSES.values())
+    })
+    height_csv_file = os.path.join(folder, Landfire200.VEG_HEIGHT_CSV)
+    os.makedirs(os.path.dirname(height_csv_file), exist_ok=True)
+    height_csv.to_csv(height_csv_file, index=False)
+
+
+def write_config(file_name, sections):
+    """Write an ini file from a dictionary of sections
+
+    Args:
+        file_name (str): config file name
+        sections (dict): section name to dictionary of items
+    """
+
+    lines = []
+    for section, items in sections.items():
+        lines.append('[{}]'.format(section))
+        for key, value in items.items():
+            lines.append('{}: {}'.format(key, value))
+        lines.append('')
+
+    with open(file_name, 'w') as f:
+        f.write('\n'.join(lines))
+
+
+def generate_topo_domain(n_cells, data_dir=DATA_DIR):
+    """Build (or reuse) a synthetic generate_topo domain with approximately
+    `n_cells` cells in the final topo.
+
+    Args:
+        n_cells (int): approximate number of cells
+        data_dir (str): folder to cache the synthetic domains in
+
+    Returns:
+        dict: paths to the `config`, `dem`, `basin_shapefile`,
+            `vegetation_folder` and `output_folder`
+    """
+
+    ny, nx = grid_shape(n_cells)
+    folder = os.path.join(data_dir, 'generate_topo_{}x{}'.format(ny, nx))
+
+    paths = {
+        'config': os.path.join(folder, 'config.ini'),
+        'dem': os.path.join(folder, 'dem.tif'),
+        'basin_shapefile': os.path.join(folder, 'basin_outline.shp'),
+        'vegetation_folder': os.path.join(folder, 'landfire_200'),
+        'output_folder': os.path.join(folder, 'output'),
+    }
+
+    if not os.path.isfile(paths['config']):
+        write_raster(paths['dem'], dem(ny, nx))
+        basin_outline(paths['basin_shapefile'], ny, nx)
+        landfire_200(paths['vegetation_folder'], ny, nx)
+
+        # config is written last, it marks the domain as complete
+        write_config(paths['config'], {
+            'generate_topo': {
+                'basin_shapefile': paths['basin_shapefile'],
+                'dem_file': paths['dem'],
+                'vegetation_folder': paths['vegetation_folder'],
+                'vegetation_dataset': 'landfire_2.0.0',
+                'output_folder': paths['output_folder'],
+                'cell_size': CELL_SIZE,
+                'pad_domain': '{0}, {0}, {0}, {0}'.format(BORDER // 2),
+                'leave_intermediate_files': True,
+            },
+            'logging': {
+                'log_level': 'error',
+            },
+        })
+
+    return paths
+
+
+def channel_x(nx, cell_size=CELL_SIZE, origin=ORIGIN):
+    """x coordinate of the cell centers on the main channel of `dem`"""
+    return origin[0] + ((nx - 1) // 2 + 0.5) * cell_size
+
+
+def pour_points(file_name, ny, nx, cell_size=CELL_SIZE, origin=ORIGIN):
+    """Write a BNA of pour points along the main channel of `dem`. The
+    first point is the basin outlet, the others are gauges up valley.
+
+    Args:
+        file_name (str): output .bna file name
+        ny (int): number of rows
+        nx (int): number of columns
+        cell_size (float): cell size in meters
+        origin (tuple): upper left corner (x, y)
+    """
+
+    x = channel_x(nx, cell_size, origin)
+    rows = [ny - 1 - BORDER // 2, 2 * ny // 3, ny // 3]
+
+    with open(file_name, 'w') as f:
+        for i, row in enumerate(rows):
+            y = origin[1] - (row + 0.5) * cell_size
+            f.write('"gauge_{}","",1\n'.format(i))
+            f.write('{},{}\n'.format(x, y))
+
+
+def delineate_domain(n_cells, data_dir=DATA_DIR):
+    """Build (or reuse) a synthetic DEM with known drainage and pour
+    points on the main channel for delineate.
+
+    Args:
+        n_cells (int): approximate number of cells
+        data_dir (str): folder to cache the synthetic domains in
+
+    Returns:
+        dict: paths to the `dem` and `pour_points`
+    """
+
+    ny, nx = grid_shape(n_cells)
+    folder = os.path.join(data_dir, 'delineate_{}x{}'.format(ny, nx))
+
+    paths = {
+        'dem': os.path.join(folder, 'dem.tif'),
+        'pour_points': os.path.join(folder, 'pour_points.bna'),
+    }
+
+    if not os.path.isfile(paths['pour_points']):
+        write_raster(paths['dem'], dem(ny, nx))
+        pour_points(paths['pour_points'], ny, nx)
+
+    return paths
+
+
+def topo(file_name, ny, nx, cell_size, basin_name='Lakes Basin',
+         origin=ORIGIN):
+    """Write a minimal topo.nc with a dem and elliptical basin mask
+
+    Args:
+        file_name (str): output netcdf file name
+        ny (int): number of rows
+        nx (int): number of columns
+        cell_size (float): cell size in meters
+        basin_name (str): long name of the basin mask
+        origin (tuple): upper left corner (x, y)
+    """
+
+    x = origin[0] + (np.arange(nx) + 0.5) * cell_size
+    y = origin[1] - (np.arange(ny) + 0.5) * cell_size
+
+    row, col = np.mgrid[0:ny, 0:nx]
+    radius_y = ny / 2 - BORDER / 2
+    radius_x = nx / 2 - BORDER / 2
+    mask = ((row + 0.5 - ny / 2) / radius_y)**2 + \
+        ((col + 0.5 - nx / 2) / radius_x)**2 <= 1
+
+    ds = xr.Dataset(
+        {
+            'dem': (('y', 'x'), dem(ny, nx, cell_size)),
+            'mask': (('y', 'x'), mask.astype(np.uint8)),
+            'projection': ((), 0),
+        },
+        coords={'x': x, 'y': y}
+    )
+    ds['mask'].attrs = {'long_name': basin_name}
+    ds['projection'].attrs = {'spatial_ref': rasterio.crs.CRS.from_string(
+        CRS).to_wkt()}
+    ds.x.attrs = {'units': 'meters'}
+    ds.y.attrs = {'units': 'meters'}
+
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    ds.to_netcdf(file_name, format='NETCDF4')
+
+
+def lidar_depth(file_name, ny, nx, cell_size, seed=0):
+    """Write a synthetic ASO style snow depth GeoTIFF, depths outside an
+    elliptical flight footprint are nodata
+
+    Args:
+        file_name (str): output GeoTIFF file name
+        ny (int): number of rows
+        nx (int): number of columns
+        cell_size (float): cell size in meters
+        seed (int): random seed
+    """
+
+    rng = np.random.default_rng(seed)
+
+    depth = rng.gamma(2.0, 0.5, size=(ny, nx)).astype(np.float32)
+
+    row, col = np.mgrid[0:ny, 0:nx]
+    outside = ((row - ny / 2) / (ny / 2))**2 + \
+        ((col - nx / 2) / (nx / 2))**2 > 1
+    depth[outside] = NODATA
+
+    write_raster(file_name, depth, cell_size=cell_size)
+
+
+def grm_domain(n_cells, flights=3, ratio=5, data_dir=DATA_DIR):
+    """Build (or reuse) a synthetic topo.nc and lidar flights with dated
+    file names for grm. The flights have approximately `n_cells` cells and
+    are `ratio` times finer than the topo.
+
+    Args:
+        n_cells (int): approximate number of lidar cells
+        flights (int): number of lidar flights
+        ratio (int): topo cell size over the lidar cell size
+        data_dir (str): folder to cache the synthetic domains in
+
+    Returns:
+        dict: paths to the `topo` and list of `images`
+    """
+
+    ny, nx = grid_shape(n_cells)
+    ny, nx = ny - ny % ratio, nx - nx % ratio
+
+    folder = os.path.join(data_dir, 'grm_{}x{}'.format(ny, nx))
+    dates = pd.date_range('2019-03-25', periods=flights, freq='14D')
+
+    paths = {
+        'topo': os.path.join(folder, 'topo.nc'),
+        'images': [
+            os.path.join(folder, 'USCASY{}_synthetic_depth_{}m.tif'.format(
+                d.strftime('%Y%m%d'), int(CELL_SIZE)))
+            for d in dates
+        ],
+    }
+
+    for i, image in enumerate(paths['images']):
+        if not os.path.isfile(image):
+            lidar_depth(image, ny, nx, CELL_SIZE, seed=i)
+
+    if not os.path.isfile(paths['topo']):
+        topo(paths['topo'], ny // ratio, nx // ratio, CELL_SIZE * ratio)
+
+    return paths
@@ -40,8 +40,9 @@ setup(
     entry_points={
         'console_scripts': [
             'generate_topo=basin_setup.cli.generate_topo:main',
-            'delineate=basin_setup.delineate:main',
-            'grm=basin_setup.grm:main',
+            'delineate=basin_setup.cli.delineate:main',
+            'grm=basin_setup.cli.grm:main',
+            'basin_setup_worker=basin_setup.cli.worker:main',
         ]},
     test_suite='tests',
     url='https://github.com/USDA-ARS-NWRC/basin_setup',
@@ -38,6 +38,7 @@ class BasinSetupLakes(unittest.TestCase):
 
     @classmethod
     def tearDownClass(cls):
+        cls.remove_log_handlers()
         cls.remove_output_dir()
 
     def tearDown(self):
@@ -55,6 +56,17 @@ class BasinSetupLakes(unittest.TestCase):
         os.makedirs(folder)
         cls.output_dir = Path(folder)
 
+    @staticmethod
+    def remove_log_handlers():
+        """Remove the log file handlers from the root logger so later tests
+        don't log to a file in the removed output dir
+        """
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            if isinstance(handler, logging.FileHandler):
+                handler.close()
+                root.removeHandler(handler)
+
     @classmethod
     def remove_output_dir(cls):
         if hasattr(cls, 'output_dir') and \
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+import unittest
+
+# Modules that take most of the start up time, none of them should be
+# imported before the arguments are parsed
+HEAVY_MODULES = [
+    'geopandas',
+    'inicheck',
+    'netCDF4',
+    'numpy',
+    'pandas',
+    'pkg_resources',
+    'rasterio',
+    'spatialnc',
+    'xarray',
+]
+
+CHECK_IMPORTS = """
+import sys
+import {module}
+print(','.join(m for m in {heavy} if m in sys.modules))
+"""
+
+
+class TestStartup(unittest.TestCase):
+
+    CLI = [
+        'basin_setup.cli.generate_topo',
+        'basin_setup.cli.delineate',
+        'basin_setup.cli.grm',
+        'basin_setup.cli.worker',
+    ]
+
+    def test_no_heavy_imports(self):
+        for module in self.CLI:
+            with self.subTest(module=module):
+                output = subprocess.check_output([
+                    sys.executable,
+                    '-c',
+                    CHECK_IMPORTS.format(module=module, heavy=HEAVY_MODULES)
+                ], universal_newlines=True)
+
+                self.assertEqual(output.strip(), '')
+
+    def test_help(self):
+        for module in self.CLI:
+            with self.subTest(module=module):
+                output = subprocess.check_output(
+                    [sys.executable, '-m', module, '--help'],
+                    universal_newlines=True
+                )
+
+                self.assertIn('usage:', output)
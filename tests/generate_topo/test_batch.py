@@ -0,0 +1,152 @@
+import os
+from unittest.mock import patch
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.warp import transform_bounds
+
+from basin_setup.generate_topo import GenerateTopo
+from basin_setup.generate_topo.batch import (cluster_domains, shared_sources,
+                                             source_window)
+from tests.Lakes.lakes_test_case import BasinSetupLakes
+
+
+class TestSourceWindow(BasinSetupLakes):
+
+    EXTENTS = [319570.405027, 4157787.07547, 328270.405027, 4167087.07547]
+    SOURCE_CRS = 'EPSG:5070'
+    SOURCE_CELL_SIZE = 30
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        # Landfire like source in Albers covering more than the basins
+        left, bottom, right, top = transform_bounds(
+            cls.CRS['init'], cls.SOURCE_CRS, *cls.EXTENTS)
+        cls.origin = (
+            np.floor(left / 1000) * 1000 - 20000,
+            np.ceil(top / 1000) * 1000 + 20000
+        )
+        cls.transform = from_origin(
+            *cls.origin, cls.SOURCE_CELL_SIZE, cls.SOURCE_CELL_SIZE)
+
+        cls.shape = (
+            int((cls.origin[1] - bottom + 20000) / cls.SOURCE_CELL_SIZE),
+            int((right + 20000 - cls.origin[0]) / cls.SOURCE_CELL_SIZE)
+        )
+
+        cls.source = os.path.join(cls.output_dir, 'source.tif')
+        with rasterio.open(
+                cls.source, 'w', driver='GTiff', height=cls.shape[0],
+                width=cls.shape[1], count=1, dtype='uint8',
+                crs=cls.SOURCE_CRS, transform=cls.transform) as dst:
+            dst.write(np.ones(cls.shape, dtype=np.uint8), 1)
+
+    def test_union(self):
+        shifted = [v + 3000 for v in self.EXTENTS]
+        domains = [
+            (self.CRS['init'], self.EXTENTS),
+            (self.CRS['init'], shifted),
+        ]
+
+        left, bottom, right, top = source_window(self.source, domains)
+
+        # covers both basins in the source projection
+        for _, extents in domains:
+            basin = transform_bounds(
+                self.CRS['init'], self.SOURCE_CRS, *extents)
+            self.assertLessEqual(left, basin[0])
+            self.assertLessEqual(bottom, basin[1])
+            self.assertGreaterEqual(right, basin[2])
+            self.assertGreaterEqual(top, basin[3])
+
+        # snapped to the source grid
+        for edge in [left - self.origin[0], self.origin[1] - top,
+                     right - left, top - bottom]:
+            self.assertAlmostEqual(edge % self.SOURCE_CELL_SIZE, 0)
+
+        # a subset of the source
+        self.assertLess(
+            (right - left) * (top - bottom),
+            self.shape[0] * self.shape[1] * self.SOURCE_CELL_SIZE**2
+        )
+
+    def test_cluster(self):
+        close = [v + 3000 for v in self.EXTENTS]
+        far = [v + 300000 for v in self.EXTENTS]
+        domains = [
+            (self.CRS['init'], self.EXTENTS),
+            (self.CRS['init'], far),
+            (self.CRS['init'], close),
+        ]
+
+        self.assertListEqual(
+            cluster_domains(self.source, domains), [[0, 2], [1]])
+
+        # everything shares a subset with a large enough ratio
+        self.assertListEqual(
+            cluster_domains(self.source, domains, max_ratio=1e6),
+            [[0, 1, 2]])
+
+    def test_no_overlap(self):
+        extents = [v + 1e6 for v in self.EXTENTS]
+
+        with self.assertRaises(ValueError):
+            source_window(self.source, [(self.CRS['init'], extents)])
+
+
+class TestSharedSources(BasinSetupLakes):
+
+    def basin(self, offset):
+        config = self.base_config_copy()
+        config.cfg['generate_topo']['vegetation_dataset'] = None
+        config.cfg['generate_topo']['coordinate_extent'] = [
+            320000 + offset, 4158000, 325000 + offset, 4163000]
+
+        gt = GenerateTopo(config)
+        gt.set_extents()
+        gt.load_basin_shapefiles()
+
+        return gt
+
+    @patch('basin_setup.generate_topo.batch.gdal.gdal_translate')
+    def test_shared_sources(self, mock_translate):
+        topos = [self.basin(0), self.basin(2000)]
+
+        sources = shared_sources(topos, str(self.output_dir))
+
+        mock_translate.assert_called_once()
+        source, subset, extents = mock_translate.call_args[0]
+        self.assertEqual(
+            source, os.path.abspath(topos[0].config['dem_file']))
+        self.assertEqual(sources, [{'dem': subset}, {'dem': subset}])
+
+        # 100 m source cells with a 2 cell pad
+        self.assertListEqual(
+            [round(v - e, 3) for v, e in zip(
+                extents, [318520.405, 4157537.075, 329820.405, 4167937.075])],
+            [1200.0, 200.0, -2600.0, -4700.0]
+        )
+
+        topos[0].sources = sources[0]
+        self.assertEqual(topos[0].source_images(), {'dem': subset})
+
+    @patch('basin_setup.generate_topo.batch.gdal.gdal_translate')
+    def test_far_basin(self, mock_translate):
+        topos = [self.basin(0), self.basin(2000), self.basin(500000)]
+
+        sources = shared_sources(topos, str(self.output_dir))
+
+        # the far basin reads the source on its own
+        mock_translate.assert_called_once()
+        subset = mock_translate.call_args[0][1]
+        self.assertEqual(sources, [{'dem': subset}, {'dem': subset}, {}])
+
+    @patch('basin_setup.generate_topo.batch.gdal.gdal_translate')
+    def test_single_basin(self, mock_translate):
+        sources = shared_sources([self.basin(0)], str(self.output_dir))
+
+        mock_translate.assert_not_called()
+        self.assertEqual(sources, [{}])
@@ -0,0 +1,210 @@
+import os
+import shutil
+from unittest.mock import patch
+
+import netCDF4 as nc
+import numpy as np
+import rasterio
+import xarray as xr
+from rasterio.windows import Window
+
+from basin_setup.generate_topo import GenerateTopo
+from basin_setup.generate_topo.checkpoint import Checkpoint, file_fingerprint
+from basin_setup.generate_topo.shapefile import Shapefile
+from basin_setup.generate_topo.vegetation import Landfire140
+from tests.Lakes.lakes_test_case import BasinSetupLakes
+
+
+@patch.object(Landfire140, 'veg_height_csv',
+              new='tests/Lakes/data/landfire_1.4.0/LF_140EVH_05092014.csv')
+@patch.object(Landfire140, 'clipped_images', new={
+    'veg_type': 'tests/Lakes/data/landfire_1.4.0/clipped_veg_type.tif',
+    'veg_height': 'tests/Lakes/data/landfire_1.4.0/clipped_veg_height.tif'
+})
+class TestCheckpoint(BasinSetupLakes):
+
+    EXTENTS = [319570.405027, 4157787.07547, 328270.405027, 4167087.07547]
+    STAGES = ['load_dem', 'load_vegetation', 'create_masks']
+
+    def topo(self, output_folder, checkpoint=True):
+        """GenerateTopo with the domain set, the DEM is a synthetic grid
+        since gdalwarp is not used
+        """
+
+        config = self.base_config_copy()
+        config.cfg['generate_topo']['checkpoint'] = checkpoint
+        config.cfg['generate_topo']['coordinate_extent'] = self.EXTENTS
+        config.cfg['generate_topo']['output_folder'] = output_folder
+        config.cfg['generate_topo']['subbasin_encoding'] = 'labels'
+        config.cfg['generate_topo']['sub_basin_files'] = [
+            os.path.join(self.gold_dir, 'mask_150m.shp')]
+
+        gt = GenerateTopo(config)
+        gt.set_extents()
+        gt.crs = self.CRS
+        gt.basin_shapefiles = [
+            Shapefile(config.cfg['generate_topo']['basin_shapefile']),
+            Shapefile(os.path.join(self.gold_dir, 'mask_150m.shp')),
+        ]
+
+        return gt
+
+    def load_dem(self, gt):
+        gt.dem = xr.DataArray(
+            np.linspace(2000, 3500, len(gt.x) * len(gt.y),
+                        dtype=np.float32).reshape(len(gt.y), len(gt.x)),
+            coords={'y': gt.y[::-1] + 75, 'x': gt.x + 75},
+            dims=('y', 'x'),
+            name='dem',
+            attrs={'long_name': 'dem'}
+        ).rio.write_crs(self.CRS['init'])
+
+    def load_vegetation(self, gt):
+        veg = gt.vegetation()
+        veg.load_clipped_images()
+        veg.calculate_tau_and_k()
+        veg.calculate_height()
+        veg.set_attributes()
+        gt.veg = veg
+
+    def assertTopoEqual(self, file_a, file_b):
+        with nc.Dataset(file_a) as a, nc.Dataset(file_b) as b:
+            self.assertCountEqual(
+                list(a.variables.keys()), list(b.variables.keys()))
+
+            for name, variable in a.variables.items():
+                self.assertEqual(variable.dtype, b[name].dtype)
+                np.testing.assert_equal(variable.__dict__, b[name].__dict__)
+                np.testing.assert_array_equal(variable[:], b[name][:])
+
+    def test_restore(self):
+        direct = self.topo(os.path.join(self.output_dir, 'direct'))
+        self.load_dem(direct)
+        self.load_vegetation(direct)
+        direct.create_masks()
+        direct.create_netcdf()
+
+        for stage in self.STAGES:
+            direct.checkpoint.save(direct, stage, 'fingerprint')
+
+        restored = self.topo(os.path.join(self.output_dir, 'restored'))
+        for stage in self.STAGES:
+            direct.checkpoint.restore(restored, stage)
+        restored.create_netcdf()
+
+        self.assertTopoEqual(
+            os.path.join(self.output_dir, 'direct', 'topo.nc'),
+            os.path.join(self.output_dir, 'restored', 'topo.nc')
+        )
+
+    def test_fingerprint(self):
+        gt = self.topo(os.path.join(self.output_dir, 'fingerprint'))
+        fingerprints = {
+            stage: gt.stage_fingerprint(stage)
+            for stage in self.STAGES + ['create_netcdf']
+        }
+
+        # stable for the same inputs
+        self.assertEqual(
+            fingerprints['load_dem'], gt.stage_fingerprint('load_dem'))
+
+        # only the masks and the netcdf depend on the basin name
+        gt.config['basin_name'] = 'Lakes Basin'
+        for stage, changed in zip(
+                fingerprints, [False, False, True, True]):
+            self.assertEqual(
+                fingerprints[stage] != gt.stage_fingerprint(stage), changed)
+
+        # everything depends on the domain
+        gt.extents = [v + 150 for v in gt.extents]
+        for stage in fingerprints:
+            self.assertNotEqual(
+                fingerprints[stage], gt.stage_fingerprint(stage))
+
+    def test_file_fingerprint(self):
+        shapefile = os.path.join(self.gold_dir, 'basin_outline.shp')
+
+        fingerprint = file_fingerprint(shapefile)
+        self.assertCountEqual(
+            [os.path.splitext(f[0])[1] for f in fingerprint],
+            ['.cpg', '.dbf', '.prj', '.shp', '.shx']
+        )
+        self.assertListEqual(file_fingerprint('missing.tif'), [])
+
+    def test_resume(self):
+        folder = os.path.join(self.output_dir, 'resume')
+
+        gt = self.topo(folder)
+        self.load_dem(gt)
+        with patch.object(GenerateTopo, 'load_dem'):
+            gt.run_stage('load_dem')
+
+        # same inputs, restored instead of run
+        gt = GenerateTopo(gt.ucfg, resume=True)
+        gt.set_extents()
+        gt.crs = self.CRS
+        with patch.object(GenerateTopo, 'load_dem') as mock_load_dem:
+            gt.run_stage('load_dem')
+            mock_load_dem.assert_not_called()
+
+        self.assertEqual(gt.dem.dtype, np.float32)
+        self.assertEqual(gt.dem.rio.crs, self.CRS['init'].upper())
+
+        # changed inputs are run again
+        gt.extents = [v + 150 for v in gt.extents]
+        with patch.object(GenerateTopo, 'load_dem') as mock_load_dem:
+            gt.run_stage('load_dem')
+            mock_load_dem.assert_called_once()
+
+        # without resume the stage is always run
+        gt = GenerateTopo(gt.ucfg)
+        gt.set_extents()
+        gt.crs = self.CRS
+        with patch.object(GenerateTopo, 'load_dem') as mock_load_dem, \
+                patch.object(Checkpoint, 'save'):
+            gt.run_stage('load_dem')
+            mock_load_dem.assert_called_once()
+
+    def test_opt_in(self):
+        gt = self.topo(os.path.join(self.output_dir, 'opt_in'),
+                       checkpoint=False)
+        self.assertIsNone(gt.checkpoint)
+
+        # resume always saves the stages
+        gt = GenerateTopo(gt.ucfg, resume=True)
+        self.assertIsInstance(gt.checkpoint, Checkpoint)
+
+    def test_batch_subset(self):
+        folder = os.path.join(self.output_dir, 'subset')
+        os.makedirs(folder)
+        dem_file = os.path.join(self.basin_dir, 'data',
+                                'dem_epsg_32611_100m.tif')
+
+        gt = self.topo(folder)
+        fingerprint = gt.stage_fingerprint('load_dem')
+
+        # a batch run writes the shared subset to a new file every run
+        subsets = []
+        for i in range(2):
+            subsets.append(os.path.join(folder, 'subset_{}.tif'.format(i)))
+            shutil.copy(dem_file, subsets[-1])
+
+        gt.sources = {'dem': subsets[0]}
+        subset_fingerprint = gt.stage_fingerprint('load_dem')
+        self.assertNotEqual(fingerprint, subset_fingerprint)
+
+        gt.sources = {'dem': subsets[1]}
+        self.assertEqual(
+            subset_fingerprint, gt.stage_fingerprint('load_dem'))
+
+        # a different subset window is run again
+        with rasterio.open(dem_file) as src:
+            window = Window(0, 0, src.width - 1, src.height)
+            profile = src.profile
+            profile.update(width=window.width, height=window.height,
+                           transform=src.window_transform(window))
+            with rasterio.open(subsets[1], 'w', **profile) as dst:
+                dst.write(src.read(window=window))
+
+        self.assertNotEqual(
+            subset_fingerprint, gt.stage_fingerprint('load_dem'))
@@ -6,11 +6,13 @@ import xarray as xr
 from inicheck.config import UserConfig
 from inicheck.tools import cast_all_variables
 from rasterio import Affine
+from shapely.geometry import box
 
 from basin_setup.generate_topo import GenerateTopo
 from basin_setup.generate_topo.shapefile import Shapefile
 from basin_setup.generate_topo.vegetation import Landfire140, Landfire200
 from basin_setup.utils import domain_extent
+from basin_setup.utils.topo import SubbasinMasks
 from tests.Lakes.lakes_test_case import BasinSetupLakes
 
 # patch the landfire datasets for testing. Comment out to test with the
@@ -204,3 +206,166 @@ class TestVegetationOptions(BasinSetupLakes):
                 self.assertTrue(np.sum(ds[image].isnull().values) == 0)
             else:
                 self.assertTrue(np.all(ds[image].isnull().values))
+
+
+class TestCreateMasks(BasinSetupLakes):
+
+    EXTENTS = [319570.405027, 4157787.07547, 328270.405027, 4167087.07547]
+
+    def setUp(self):
+        self.subject = GenerateTopo(config_file=self.config_file)
+        self.subject.config['coordinate_extent'] = self.EXTENTS
+        self.subject.set_extents()
+
+        self.subject.dem = xr.DataArray(
+            np.zeros((len(self.subject.y), len(self.subject.x)),
+                     dtype=np.float32),
+            coords={
+                'y': self.subject.y[::-1] + 75,
+                'x': self.subject.x + 75
+            },
+            dims=('y', 'x'),
+            name='dem'
+        ).rio.write_crs(self.CRS['init'])
+
+        self.subject.basin_shapefiles = [
+            Shapefile(os.path.join(self.gold_dir, 'basin_outline.shp')),
+            Shapefile(os.path.join(self.gold_dir, 'mask_150m.shp')),
+        ]
+
+    def test_masks(self):
+        self.subject.create_masks()
+
+        self.assertCountEqual(
+            list(self.subject.masks.keys()),
+            ['mask', 'subbasin_mask']
+        )
+        self.assertEqual(self.subject.masks['mask'].dtype, np.uint8)
+
+    def test_labels(self):
+        self.subject.config['subbasin_encoding'] = 'labels'
+        self.subject.create_masks()
+
+        masks = self.subject.masks
+        self.assertCountEqual(
+            list(masks.keys()),
+            ['mask', 'subbasin_id', 'subbasin_name', 'subbasin_layer_index']
+        )
+        self.assertEqual(masks['subbasin_id'].dtype, np.uint16)
+        self.assertEqual(masks['subbasin_id'].dims,
+                         ('subbasin_layer', 'y', 'x'))
+        self.assertListEqual(list(masks['subbasin_name'].values),
+                             ['Mask 150m'])
+        self.assertListEqual(list(masks['subbasin_layer_index'].values), [0])
+        self.assertEqual(masks['subbasin_id'].attrs['flag_meanings'],
+                         'Mask_150m')
+
+        sub_basin = self.subject.basin_shapefiles[1].mask(
+            len(self.subject.x), len(self.subject.y), self.subject.transform)
+        np.testing.assert_array_equal(
+            masks['subbasin_id'].values[0], sub_basin)
+
+    def test_nested_labels(self):
+        # two halves of the basin that share a boundary and the whole basin
+        # nested over both of them
+        outline = self.subject.basin_shapefiles[0]
+        left, bottom, right, top = outline.polygon.total_bounds
+        middle = (left + right) / 2
+
+        sub_basins = []
+        for name, bounds in [('west', (left, bottom, middle, top)),
+                             ('east', (middle, bottom, right, top))]:
+            half = outline.polygon.copy()
+            half['geometry'] = half.geometry.intersection(
+                box(*bounds)).buffer(0)
+            file_name = os.path.join(self.output_dir, '{}.shp'.format(name))
+            half.to_file(file_name)
+            sub_basins.append(Shapefile(file_name))
+        sub_basins.append(outline)
+
+        self.subject.basin_shapefiles = [outline] + sub_basins
+        self.subject.config['subbasin_encoding'] = 'labels'
+        self.subject.create_masks()
+
+        masks = self.subject.masks
+        self.assertListEqual(
+            list(masks['subbasin_layer_index'].values), [0, 0, 1])
+        self.assertEqual(masks['subbasin_id'].shape[0], 2)
+
+        # every sub basin has its full mask, nothing is overwritten
+        subbasin_masks = SubbasinMasks(masks)
+        for name, shapefile in zip(['West', 'East', 'Basin Outline'],
+                                   sub_basins):
+            np.testing.assert_array_equal(
+                subbasin_masks[name].values,
+                shapefile.mask(len(self.subject.x), len(self.subject.y),
+                               self.subject.transform) == 1
+            )
+
+
+class TestZonalSummary(BasinSetupLakes):
+
+    EXTENTS = TestCreateMasks.EXTENTS
+
+    def setUp(self):
+        TestCreateMasks.setUp(self)
+
+        ny, nx = self.subject.dem.shape
+        rng = np.random.default_rng(0)
+        self.subject.dem.values = np.linspace(
+            1500, 2400, ny * nx, dtype=np.float32).reshape(ny, nx)
+
+        self.veg = {}
+        for key in ['veg_height', 'veg_tau', 'veg_k']:
+            self.veg[key] = self.subject.dem.copy(
+                data=rng.random((ny, nx)).astype(np.float32))
+            self.veg[key].name = key
+
+    def summary(self):
+        self.subject.create_masks()
+        ds = xr.merge([self.subject.dem, self.subject.masks] +
+                      list(self.veg.values()))
+        return ds, self.subject.zonal_summary(ds)
+
+    def assert_zone(self, summary, zone, mask):
+        dem = self.subject.dem.values[mask]
+
+        self.assertEqual(summary['zone_area'].values[zone],
+                         mask.sum() * self.subject.cell_size**2)
+        self.assertAlmostEqual(summary['zone_dem_mean'].values[zone],
+                               dem.mean(dtype=np.float64), places=3)
+        self.assertEqual(summary['zone_dem_min'].values[zone], dem.min())
+        self.assertEqual(summary['zone_dem_max'].values[zone], dem.max())
+        self.assertAlmostEqual(
+            summary['zone_veg_tau_mean'].values[zone],
+            self.veg['veg_tau'].values[mask].mean(dtype=np.float64))
+
+        edges = np.append(summary['elevation_band'].values,
+                          summary['elevation_band'].values[-1] + 100)
+        expected = np.histogram(dem, bins=edges)[0] / dem.size
+        np.testing.assert_allclose(
+            summary['zone_hypsometry'].values[zone], expected)
+
+    def test_masks(self):
+        ds, summary = self.summary()
+
+        self.assertListEqual(list(summary['zone_name'].values),
+                             ['Lakes', 'Sub Basin Name'])
+        self.assertEqual(summary['elevation_band'].values[0], 1500)
+        self.assertEqual(summary['elevation_band'].attrs['band_size'], 100)
+
+        self.assert_zone(summary, 0, ds['mask'].values == 1)
+        self.assert_zone(summary, 1, ds['subbasin_mask'].values == 1)
+
+    def test_labels(self):
+        self.subject.config['subbasin_encoding'] = 'labels'
+        self.subject.basin_shapefiles.append(self.subject.basin_shapefiles[0])
+        ds, summary = self.summary()
+
+        self.assertListEqual(list(summary['zone_name'].values),
+                             ['Lakes', 'Mask 150m', 'Basin Outline'])
+
+        masks = SubbasinMasks(ds)
+        self.assert_zone(summary, 0, ds['mask'].values == 1)
+        self.assert_zone(summary, 1, masks['Mask 150m'].values)
+        self.assert_zone(summary, 2, masks['Basin Outline'].values)
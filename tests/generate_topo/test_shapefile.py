@@ -1,6 +1,10 @@
+from unittest.mock import patch
+
 import numpy as np
+from rasterio import features
 
-from basin_setup.generate_topo.shapefile import Shapefile
+from basin_setup.generate_topo.shapefile import (Shapefile, rasterize_masks,
+                                                 simplify)
 from basin_setup.utils import domain_extent
 from tests.Lakes.lakes_test_case import BasinSetupLakes
 
@@ -29,3 +33,62 @@ class TestShapefile(BasinSetupLakes):
         mask = self.shape.mask(self.NX, self.NY, transform)
         self.assertTrue(mask.shape == (self.NY, self.NX))
         self.assertTrue(np.sum(mask == 1) == 11188)
+
+    def test_rasterize_masks(self):
+        transform, x, y = domain_extent.affine_transform_from_extents(
+            self.EXTENTS, self.CELL_SIZE)
+        shapefiles = [
+            self.shape,
+            Shapefile('tests/Lakes/gold/mask_150m.shp')
+        ]
+
+        serial = rasterize_masks(shapefiles, self.NX, self.NY, transform)
+        parallel = rasterize_masks(
+            shapefiles, self.NX, self.NY, transform, processes=2)
+
+        self.assertTrue(np.sum(parallel[0] == 1) == 11188)
+        for s, p in zip(serial, parallel):
+            self.assertEqual(s.dtype, p.dtype)
+            np.testing.assert_array_equal(s, p)
+
+    def test_mask_window(self):
+        transform, x, y = domain_extent.affine_transform_from_extents(
+            self.EXTENTS, self.CELL_SIZE)
+        full = features.rasterize(
+            self.shape.polygon.geometry,
+            out_shape=(self.NY, self.NX),
+            transform=transform,
+            dtype=np.uint8
+        )
+
+        np.testing.assert_array_equal(
+            self.shape.mask(self.NX, self.NY, transform), full)
+
+        # grid that only covers part of the basin
+        np.testing.assert_array_equal(
+            self.shape.mask(self.NX // 2, self.NY // 2, transform),
+            full[:self.NY // 2, :self.NX // 2]
+        )
+
+        # grid outside the basin
+        transform, x, y = domain_extent.affine_transform_from_extents(
+            [v + 1e5 for v in self.EXTENTS], self.CELL_SIZE)
+        self.assertEqual(
+            np.sum(self.shape.mask(self.NX, self.NY, transform)), 0)
+
+    def test_simplify(self):
+        geometry = self.shape.polygon.geometry[0]
+
+        # full resolution by default
+        self.assertIs(simplify(geometry, self.CELL_SIZE), geometry)
+
+        with patch.object(Shapefile, 'SIMPLIFY_TOLERANCE', new=0.05):
+            simplified = simplify(geometry, self.CELL_SIZE)
+
+        self.assertTrue(simplified.is_valid)
+        self.assertLessEqual(
+            len(simplified.exterior.coords), len(geometry.exterior.coords))
+        self.assertLess(
+            geometry.hausdorff_distance(simplified),
+            self.CELL_SIZE * 0.05 + 1e-6
+        )
@@ -0,0 +1,288 @@
+import os
+import shutil
+import unittest
+from unittest.mock import patch
+
+import netCDF4 as nc
+import numpy as np
+import xarray as xr
+from rasterio.transform import from_origin
+
+from basin_setup.generate_topo import GenerateTopo
+from basin_setup.generate_topo.tiles import is_grid, stitch
+from basin_setup.generate_topo.vegetation import Landfire140
+from basin_setup.utils import domain_extent
+from tests.Lakes.lakes_test_case import BasinSetupLakes
+
+
+class TestStitch(BasinSetupLakes):
+
+    CELL_SIZE = 150
+    NX = 58
+    NY = 62
+    HALO = 2
+    TILE_SIZE = 25
+    ENCODING = {
+        'x': {'dtype': 'f4'},
+        'y': {'dtype': 'f4'},
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.transform = from_origin(
+            319570.0, 4167087.0, cls.CELL_SIZE, cls.CELL_SIZE)
+        cls.extents = [
+            319570.0,
+            4167087.0 - cls.NY * cls.CELL_SIZE,
+            319570.0 + cls.NX * cls.CELL_SIZE,
+            4167087.0
+        ]
+
+        # values for the domain plus the halo around the outside
+        rng = np.random.default_rng(0)
+        shape = (cls.NY + 2 * cls.HALO, cls.NX + 2 * cls.HALO)
+        cls.dem = rng.random(shape, dtype=np.float32) * 1000
+        cls.mask = (rng.random(shape) > 0.5).astype(np.uint8)
+        cls.labels = rng.integers(0, 4, (2,) + shape, dtype=np.uint16)
+
+    def dataset(self, rows, cols):
+        """topo like dataset for a window of the padded arrays"""
+
+        x = self.transform.c + \
+            (np.arange(cols.start, cols.stop) - self.HALO + 0.5) * \
+            self.CELL_SIZE
+        y = self.transform.f - \
+            (np.arange(rows.start, rows.stop) - self.HALO + 0.5) * \
+            self.CELL_SIZE
+
+        ds = xr.Dataset(
+            {
+                'dem': (('y', 'x'), self.dem[rows, cols]),
+                'mask': (('y', 'x'), self.mask[rows, cols]),
+                'projection': ((), 0),
+                'subbasin_id': (('subbasin_layer', 'y', 'x'),
+                                self.labels[:, rows, cols]),
+                'subbasin_name': ('subbasin', np.array(
+                    ['Upper', 'Lower', 'Outlet'], dtype=object)),
+                'subbasin_layer_index': ('subbasin', np.array(
+                    [0, 0, 1], dtype=np.uint16)),
+            },
+            coords={'x': x, 'y': y, 'subbasin': [1, 2, 3]}
+        )
+        ds['dem'].attrs = {'long_name': 'dem', 'grid_mapping': 'projection'}
+        ds['mask'].attrs = {'long_name': 'Lakes',
+                            'grid_mapping': 'projection'}
+        ds['projection'].attrs = {'GeoTransform': 'tile'}
+        ds.attrs = {'Title': 'Topographic Images for SMRF/AWSM'}
+
+        return ds
+
+    def test_stitch(self):
+        full_file = os.path.join(self.output_dir, 'full.nc')
+        self.dataset(
+            slice(self.HALO, self.HALO + self.NY),
+            slice(self.HALO, self.HALO + self.NX)
+        ).to_netcdf(full_file, encoding=self.ENCODING)
+
+        tiles = domain_extent.tile_extents(
+            self.extents, self.CELL_SIZE, self.TILE_SIZE, halo=self.HALO)
+
+        tile_files = []
+        for tile in tiles:
+            window = tile.window
+            tile_file = os.path.join(
+                self.output_dir, 'tile_{}_{}.nc'.format(tile.row, tile.col))
+            self.dataset(
+                slice(window.row_off, window.row_off +
+                      window.height + 2 * self.HALO),
+                slice(window.col_off, window.col_off +
+                      window.width + 2 * self.HALO)
+            ).to_netcdf(tile_file, encoding=self.ENCODING)
+            tile_files.append(tile_file)
+
+        output_file = os.path.join(self.output_dir, 'topo.nc')
+        stitch(tile_files, tiles, self.transform, self.NX, self.NY,
+               output_file, self.TILE_SIZE)
+
+        full = nc.Dataset(full_file)
+        stitched = nc.Dataset(output_file)
+
+        self.assertCountEqual(
+            list(full.variables.keys()), list(stitched.variables.keys()))
+
+        for name, variable in full.variables.items():
+            self.assertEqual(variable.dtype, stitched.variables[name].dtype)
+            self.assertEqual(variable.dimensions,
+                             stitched.variables[name].dimensions)
+            np.testing.assert_array_equal(
+                variable[:], stitched.variables[name][:])
+
+        self.assertEqual(stitched['dem'].chunking(), [25, 25])
+        self.assertEqual(stitched['subbasin_id'].chunking(), [1, 25, 25])
+        self.assertEqual(
+            stitched['projection'].GeoTransform,
+            ' '.join([str(v) for v in self.transform.to_gdal()])
+        )
+        self.assertEqual(stitched['mask'].long_name, 'Lakes')
+
+        full.close()
+        stitched.close()
+
+
+class TestTiledConfig(BasinSetupLakes):
+
+    def config(self, **options):
+        ucfg = self.base_config_copy()
+        ucfg.cfg['generate_topo'].update({
+            'output_folder': self.output_dir,
+            'tile_size': 25,
+        })
+        ucfg.cfg['generate_topo'].update(options)
+
+        return ucfg
+
+    def test_unavailable_options(self):
+        for options, resume in [({'checkpoint': True}, False),
+                                ({}, True),
+                                ({'zonal_summary': True}, False)]:
+            with self.subTest(options=options, resume=resume):
+                with self.assertRaises(ValueError):
+                    GenerateTopo(self.config(**options), resume=resume)
+
+        gt = GenerateTopo(self.config())
+        self.assertIsNone(gt.checkpoint)
+
+
+class TestTiledStitch(BasinSetupLakes):
+    """Tiled run of the gold topo, the tiles are cut from the gold topo
+    instead of generated so it runs without the GDAL command line tools
+    """
+
+    GOLD = 'tests/Lakes/gold/landfire_140/topo.nc'
+    TILE_SIZE = 25
+
+    def cut_tiles(self, ucfg, tiles, temp_dir, processes=1, sources=None):
+        """Stand in for `run_tiles` writing the gold topo in each tile
+        with the halo, the halo off the domain repeats the edge cells
+        """
+
+        tile_files = []
+        with xr.open_dataset(self.GOLD, mask_and_scale=False) as gold:
+            for tile in tiles:
+                window = tile.window
+                halo = tile.core[0].start
+                rows = np.clip(np.arange(
+                    window.row_off - halo,
+                    window.row_off + window.height + halo), 0, gold.y.size - 1)
+                cols = np.clip(np.arange(
+                    window.col_off - halo,
+                    window.col_off + window.width + halo), 0, gold.x.size - 1)
+
+                folder = os.path.join(
+                    temp_dir, 'tile_{}_{}'.format(tile.row, tile.col))
+                os.makedirs(folder)
+                tile_file = os.path.join(folder, 'topo.nc')
+                gold.isel(y=rows, x=cols).to_netcdf(tile_file)
+                tile_files.append(tile_file)
+
+        return tile_files
+
+    def test_parity(self):
+        ucfg = self.base_config_copy()
+        ucfg.cfg['generate_topo'].update({
+            'output_folder': self.output_dir,
+            'tile_size': self.TILE_SIZE,
+            'leave_intermediate_files': False,
+        })
+
+        gt = GenerateTopo(ucfg)
+        with nc.Dataset(self.GOLD) as gold:
+            left, dx, _, top, _, dy = [
+                float(v)
+                for v in gold['projection'].GeoTransform.split()]
+            nx, ny = len(gold['x']), len(gold['y'])
+
+        gt.extents = [left, top + ny * dy, left + nx * dx, top]
+        gt.transform, gt.x, gt.y = \
+            domain_extent.affine_transform_from_extents(
+                gt.extents, gt.cell_size)
+
+        with patch('basin_setup.generate_topo.main.run_tiles',
+                   side_effect=self.cut_tiles):
+            gt.run_tiled()
+
+        gold = nc.Dataset(self.GOLD)
+        tiled = nc.Dataset(os.path.join(self.output_dir, 'topo.nc'))
+
+        self.assertCountEqual(
+            list(gold.variables.keys()), list(tiled.variables.keys()))
+
+        for name, variable in gold.variables.items():
+            self.assertEqual(variable.dtype, tiled.variables[name].dtype)
+            self.assertEqual(variable.dimensions,
+                             tiled.variables[name].dimensions)
+            if name in ['x', 'y']:
+                np.testing.assert_allclose(
+                    variable[:], tiled.variables[name][:], err_msg=name)
+            else:
+                np.testing.assert_array_equal(
+                    variable[:], tiled.variables[name][:], err_msg=name)
+
+            if is_grid(variable):
+                self.assertEqual(tiled.variables[name].chunking(),
+                                 [self.TILE_SIZE, self.TILE_SIZE])
+
+        gold.close()
+        tiled.close()
+
+        # the tile folders are removed
+        self.assertEqual(
+            os.listdir(os.path.join(self.output_dir, 'temp')), [])
+
+
+@unittest.skipIf(shutil.which('gdalwarp') is None,
+                 'GDAL command line tools are not installed')
+@patch.object(Landfire140, 'veg_height_csv',
+              new='tests/Lakes/data/landfire_1.4.0/LF_140EVH_05092014.csv')
+class TestTiledRun(BasinSetupLakes):
+
+    # the clipped Landfire images are warped like the full dataset
+    SOURCES = {
+        'veg_type': 'tests/Lakes/data/landfire_1.4.0/clipped_veg_type.tif',
+        'veg_height': 'tests/Lakes/data/landfire_1.4.0/clipped_veg_height.tif'
+    }
+
+    def run_topo(self, folder, tile_size=None):
+        ucfg = self.base_config_copy()
+        ucfg.cfg['generate_topo'].update({
+            'output_folder': os.path.join(self.output_dir, folder),
+            'tile_size': tile_size,
+            'leave_intermediate_files': False,
+        })
+        os.makedirs(ucfg.cfg['generate_topo']['output_folder'])
+
+        gt = GenerateTopo(ucfg)
+        gt.sources = dict(self.SOURCES)
+        gt.run()
+
+        return nc.Dataset(os.path.join(
+            ucfg.cfg['generate_topo']['output_folder'], 'topo.nc'))
+
+    def test_parity(self):
+        full = self.run_topo('full')
+        tiled = self.run_topo('tiled', tile_size=25)
+
+        self.assertCountEqual(
+            list(full.variables.keys()), list(tiled.variables.keys()))
+
+        for name, variable in full.variables.items():
+            self.assertEqual(variable.dtype, tiled.variables[name].dtype)
+            self.assertEqual(variable.dimensions,
+                             tiled.variables[name].dimensions)
+            np.testing.assert_array_equal(
+                variable[:], tiled.variables[name][:], err_msg=name)
+
+        full.close()
+        tiled.close()
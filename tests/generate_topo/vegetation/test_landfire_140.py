@@ -1,9 +1,15 @@
 import os
+import shutil
+import tracemalloc
+import unittest
 from unittest.mock import patch
 
+import numpy as np
 import xarray as xr
 
 from basin_setup.generate_topo.vegetation import Landfire140
+from basin_setup.generate_topo.vegetation.base_vegetation import (
+    class_lookup, read_veg_heights)
 from basin_setup.utils import domain_extent
 from tests.Lakes.lakes_test_case import BasinSetupLakes
 
@@ -63,6 +69,9 @@ class TestLandfire140(BasinSetupLakes):
             list(self.subject.veg_tau_k.keys()),
             ['veg_k', 'veg_tau', 'veg_type']
         )
+        self.assertEqual(self.subject.veg_tau_k['veg_type'].dtype, np.uint16)
+        self.assertEqual(self.subject.veg_tau_k['veg_tau'].dtype, np.float32)
+        self.assertEqual(self.subject.veg_tau_k['veg_k'].dtype, np.float32)
 
     def test_calculate_height(self):
         self.subject.load_clipped_images()
@@ -72,3 +81,50 @@ class TestLandfire140(BasinSetupLakes):
             list(self.subject.veg_height.coords.keys()),
             ['y', 'x', 'spatial_ref']
         )
+        self.assertEqual(self.subject.veg_height.dtype, np.float32)
+
+    def test_read_veg_heights(self):
+        csv_file = os.path.join(self.output_dir, 'veg_height.csv')
+        shutil.copy(self.subject.veg_height_csv, csv_file)
+
+        heights = read_veg_heights(csv_file)
+        self.assertIs(read_veg_heights(csv_file), heights)
+
+        # parsed again after the file changes
+        stat = os.stat(csv_file)
+        os.utime(csv_file, (stat.st_atime, stat.st_mtime + 10))
+        self.assertIsNot(read_veg_heights(csv_file), heights)
+        self.assertTrue(read_veg_heights(csv_file).equals(heights))
+
+
+class TestClassLookup(unittest.TestCase):
+
+    def test_lookup(self):
+        values = np.array([[3, 7], [7, 11]], dtype=np.int16)
+        classes = np.array([3, 7, 11])
+
+        result = class_lookup(values, classes, [0.5, 1.5, 2.5])
+
+        self.assertEqual(result.dtype, np.float32)
+        np.testing.assert_array_equal(result, [[0.5, 1.5], [1.5, 2.5]])
+
+    def test_negative(self):
+        values = np.array([-9999, 3, 3], dtype=np.int16)
+
+        result = class_lookup(values, np.array([-9999, 3]), [0, 2])
+        np.testing.assert_array_equal(result, [0, 2, 2])
+
+    def test_memory(self):
+        values = np.random.randint(0, 3000, (1000, 1000)).astype(np.int16)
+        classes = np.unique(values)
+
+        tracemalloc.start()
+        try:
+            result = class_lookup(values, classes, classes / 10)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # the float32 output, np.unique(return_inverse=True) used ~29 bytes
+        self.assertLess(peak, 5 * values.size)
+        np.testing.assert_allclose(result, values / 10, rtol=1e-6)
@@ -1,6 +1,7 @@
 import os
 from unittest.mock import patch
 
+import numpy as np
 import xarray as xr
 from inicheck.tools import cast_all_variables
 
@@ -70,6 +71,9 @@ class TestLandfire200(BasinSetupLakes):
             list(self.subject.veg_tau_k.keys()),
             ['veg_k', 'veg_tau', 'veg_type']
         )
+        self.assertEqual(self.subject.veg_tau_k['veg_type'].dtype, np.uint16)
+        self.assertEqual(self.subject.veg_tau_k['veg_tau'].dtype, np.float32)
+        self.assertEqual(self.subject.veg_tau_k['veg_k'].dtype, np.float32)
 
     def test_calculate_height(self):
         self.subject.load_clipped_images()
@@ -79,3 +83,4 @@ class TestLandfire200(BasinSetupLakes):
             list(self.subject.veg_height.coords.keys()),
             ['y', 'x', 'spatial_ref']
         )
+        self.assertEqual(self.subject.veg_height.dtype, np.float32)
@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from basin_setup.hydrology.accumulation import (NODATA, accumulate,
+                                                bounded_map, edge_cells,
+                                                flow_accumulation,
+                                                tile_windows,
+                                                tiled_flow_accumulation)
+from basin_setup.hydrology.clip import priority_flood
+
+
+class TestBoundedMap(unittest.TestCase):
+
+    def test_bounded_map(self):
+        submitted = []
+        used = []
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            submit = executor.submit
+
+            def counted(*args):
+                submitted.append(args)
+                return submit(*args)
+
+            executor.submit = counted
+            for result in bounded_map(executor, 3, pow, range(10),
+                                      [2] * 10):
+                # never more than 3 calls waiting to be used
+                self.assertLessEqual(len(submitted) - len(used), 3)
+                used.append(result)
+
+        self.assertEqual(used, [i ** 2 for i in range(10)])
+
+
+class TestAccumulate(unittest.TestCase):
+
+    def test_accumulate(self):
+        # 0 -> 1 -> 3, 2 -> 3
+        acc = accumulate(np.array([1, 3, 3, -1]), np.ones(4))
+        np.testing.assert_array_equal(acc, [1, 2, 1, 4])
+
+    def test_weights(self):
+        acc = accumulate(np.array([1, 3, 3, -1]), [1, 0, 5, 1])
+        np.testing.assert_array_equal(acc, [1, 1, 5, 7])
+
+    def test_flow_accumulation(self):
+        fdir = np.array([
+            [1, 1, 7],
+            [0, 3, 7]
+        ], dtype=np.uint8)
+
+        np.testing.assert_array_equal(
+            flow_accumulation(fdir, contamination=False), [
+                [1, 3, 4],
+                [NODATA, 1, 5]
+            ])
+
+    def test_contamination(self):
+        # TauDEM leaves the border without a flow direction, everything
+        # drains to the center then out of the bottom
+        fdir = np.zeros((5, 6), dtype=np.uint8)
+        fdir[1:4, 1:5] = [
+            [1, 7, 5, 5],
+            [1, 7, 5, 5],
+            [1, 7, 5, 5],
+        ]
+        fdir[2, 1] = 0
+
+        np.testing.assert_array_equal(edge_cells(np.ones((3, 3))), [
+            [True, True, True],
+            [True, False, True],
+            [True, True, True],
+        ])
+
+        area = flow_accumulation(fdir)
+        self.assertTrue(np.all(area == NODATA))
+
+        # the ring inside the border drains out, the center drains east
+        # into the ring
+        fdir = np.zeros((7, 7), dtype=np.uint8)
+        fdir[1:6, 1:6] = 1
+        fdir[1:6, 1] = 5
+        fdir[1, 1:6] = 3
+        fdir[5, 1:6] = 7
+        area = flow_accumulation(fdir)
+
+        expected = np.full((7, 7), NODATA)
+        expected[2:5, 2:5] = [1, 2, 3]
+        np.testing.assert_array_equal(area, expected)
+        np.testing.assert_array_equal(
+            flow_accumulation(fdir, contamination=False)[2:5, 5], 4)
+
+    def test_tile_windows(self):
+        windows = tile_windows(5, 3, 2)
+
+        self.assertEqual(len(windows), 6)
+        self.assertEqual(windows[1].width, 1)
+        self.assertEqual(windows[-1].height, 1)
+
+
+class TestTiledFlowAccumulation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+
+        rng = np.random.default_rng(0)
+        dem = rng.random((90, 77)).cumsum(axis=0).cumsum(axis=1) + \
+            rng.random((90, 77)) * 50
+        dem[5:20, 5:30] = np.nan
+        cls.fdir = priority_flood(dem)
+
+        cls.flow_dir = os.path.join(cls.folder, 'flow_dir.tif')
+        with rasterio.open(cls.flow_dir, 'w', driver='GTiff', height=90,
+                           width=77, count=1, dtype='uint8',
+                           transform=from_origin(0, 900, 10, 10)) as dst:
+            dst.write(cls.fdir, 1)
+
+        cls.whole = flow_accumulation(cls.fdir).astype(np.float32)
+
+        # nodata on the border like TauDEM d8flowdir
+        taudem = cls.fdir.copy()
+        taudem[[0, -1], :] = 0
+        taudem[:, [0, -1]] = 0
+        cls.taudem_flow_dir = os.path.join(cls.folder, 'taudem_flow_dir.tif')
+        with rasterio.open(cls.taudem_flow_dir, 'w', driver='GTiff',
+                           height=90, width=77, count=1, dtype='uint8',
+                           nodata=0,
+                           transform=from_origin(0, 900, 10, 10)) as dst:
+            dst.write(taudem, 1)
+        cls.taudem_whole = flow_accumulation(taudem).astype(np.float32)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def tiled(self, tile_size, processes=1, flow_dir=None, **kwargs):
+        output = os.path.join(self.folder, 'drain_area.tif')
+        tiled_flow_accumulation(flow_dir or self.flow_dir, output,
+                                tile_size=tile_size, processes=processes,
+                                **kwargs)
+
+        with rasterio.open(output) as src:
+            self.assertEqual(src.nodata, NODATA)
+            return src.read(1)
+
+    def test_matches_whole(self):
+        for tile_size in [16, 25, 100]:
+            np.testing.assert_array_equal(self.tiled(tile_size), self.whole)
+
+    def test_processes(self):
+        np.testing.assert_array_equal(self.tiled(30, processes=2),
+                                      self.whole)
+
+    def test_contamination(self):
+        # the cells below the nodata block and the border are contaminated
+        self.assertTrue(np.any(self.whole == NODATA))
+        self.assertTrue(np.any(self.taudem_whole[1:-1, 1:-1] > 0))
+
+        for tile_size in [16, 25, 100]:
+            np.testing.assert_array_equal(
+                self.tiled(tile_size, flow_dir=self.taudem_flow_dir),
+                self.taudem_whole)
+
+    def test_no_contamination(self):
+        np.testing.assert_array_equal(
+            self.tiled(25, contamination=False),
+            flow_accumulation(self.fdir, contamination=False))
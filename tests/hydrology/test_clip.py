@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from basin_setup.hydrology.clip import (clip_dem, clip_window, clipped_edges,
+                                        drains_across, priority_flood,
+                                        snap_seeds)
+from basin_setup.hydrology.graph import FlowGraph
+
+
+def two_valleys():
+    """Two valleys draining south split by a ridge down the middle, the
+    left valley has a pit
+    """
+
+    rows, cols = np.indices((100, 100))
+    dem = np.where(cols < 50, np.abs(cols - 25), np.abs(cols - 75)) + \
+        (99 - rows) * 0.5
+    dem[40, 25] -= 10
+
+    return dem.astype(np.float32)
+
+
+class TestPriorityFlood(unittest.TestCase):
+
+    def test_drains_out(self):
+        dem = two_valleys().astype(np.float64)
+        dem[0, :5] = np.nan
+        graph = FlowGraph(priority_flood(dem))
+
+        # everything drains to the edge of the grid or the nodata
+        labels = np.where(graph.receivers < 0, 0, -1)
+        labels[np.isnan(dem).ravel()] = -1
+        labels = graph.sweep(labels)[0].reshape(dem.shape)
+
+        self.assertTrue(np.all(labels[~np.isnan(dem)] == 0))
+
+        # the pit drains down the valley
+        self.assertEqual(graph.receivers[40 * 100 + 25], 41 * 100 + 25)
+
+    def test_edges(self):
+        fdir = priority_flood(np.ones((3, 3)))
+
+        # only the center cell is flooded, from the first edge cell
+        self.assertEqual(np.count_nonzero(fdir), 1)
+        self.assertEqual(fdir[1, 1], 4)
+
+
+class TestClip(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.transform = from_origin(0, 1000, 10, 10)
+
+        self.dem = os.path.join(self.folder, 'dem.tif')
+        with rasterio.open(self.dem, 'w', driver='GTiff', height=100,
+                           width=100, count=1, dtype='float32',
+                           transform=self.transform, nodata=-9999) as dst:
+            dst.write(two_valleys(), 1)
+
+        # the bottom of the left valley
+        self.points = os.path.join(self.folder, 'points.bna')
+        with open(self.points, 'w') as f:
+            f.write('"outlet","",1\n255,5\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_clip_window(self):
+        window = clip_window(self.dem, self.points, factor=10, buffer=1)
+
+        self.assertEqual(window, Window(0, 0, 60, 100))
+        self.assertListEqual(clipped_edges(self.dem, window),
+                             [False, False, False, True])
+
+    def test_clip_dem(self):
+        output = os.path.join(self.folder, 'clipped.tif')
+        clip_dem(self.dem, Window(10, 20, 30, 40), output)
+
+        with rasterio.open(output) as src:
+            self.assertEqual(src.shape, (40, 30))
+            self.assertEqual(src.transform.c, 100)
+            self.assertEqual(src.transform.f, 800)
+            np.testing.assert_array_equal(
+                src.read(1), two_valleys()[20:60, 10:40])
+
+    def test_outside(self):
+        with open(self.points, 'w') as f:
+            f.write('"outlet","",1\n-255,5\n')
+
+        with self.assertRaises(ValueError):
+            clip_window(self.dem, self.points)
+
+
+class TestDrainsAcross(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+        # everything drains south
+        self.flow_dir = os.path.join(self.folder, 'flow_dir.tif')
+        with rasterio.open(self.flow_dir, 'w', driver='GTiff', height=5,
+                           width=7, count=1, dtype='uint8',
+                           transform=from_origin(0, 50, 10, 10)) as dst:
+            dst.write(np.full((5, 7), 7, dtype=np.uint8), 1)
+
+        self.points = os.path.join(self.folder, 'points.bna')
+        with open(self.points, 'w') as f:
+            f.write('"outlet","",1\n35,5\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_top(self):
+        self.assertTrue(drains_across(
+            self.flow_dir, self.points, [True, False, False, False]))
+        self.assertFalse(drains_across(
+            self.flow_dir, self.points, [False, False, True, True]))
+
+    def test_nearest(self):
+        # the pour point could be snapped into the next columns
+        self.assertTrue(drains_across(
+            self.flow_dir, self.points, [False, False, False, True],
+            rule='nearest', max_distance=2))
+        self.assertFalse(drains_across(
+            self.flow_dir, self.points, [False, False, False, True],
+            rule='nearest', max_distance=1))
+
+    def test_taudem_edges(self):
+        # d8flowdir leaves the edge cells without a flow direction
+        fdir = np.full((6, 6), 7, dtype=np.int16)
+        fdir[[0, -1], :] = -32768
+        fdir[:, [0, -1]] = -32768
+
+        with rasterio.open(self.flow_dir, 'w', driver='GTiff', height=6,
+                           width=6, count=1, dtype='int16', nodata=-32768,
+                           transform=from_origin(0, 60, 10, 10)) as dst:
+            dst.write(fdir, 1)
+
+        # outlet in the middle of the fourth column
+        with open(self.points, 'w') as f:
+            f.write('"outlet","",1\n35,25\n')
+
+        self.assertTrue(drains_across(
+            self.flow_dir, self.points, [True, False, False, False]))
+        self.assertFalse(drains_across(
+            self.flow_dir, self.points, [False, False, True, True]))
+
+    def test_snap_seeds(self):
+        graph = FlowGraph(np.full((5, 5), 7, dtype=np.uint8))
+
+        seeds = snap_seeds(graph, np.array([2]), max_distance=2)
+        np.testing.assert_array_equal(seeds, [2, 7, 12])
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+
+from basin_setup.hydrology.distance import (NODATA, flow_distance,
+                                            height_above_drainage,
+                                            step_lengths, write_flow_products)
+from basin_setup.hydrology.graph import FlowGraph
+
+from .test_watersheds import TRANSFORM, y_network
+
+DIAGONAL = 10 * np.sqrt(2)
+
+
+def valley_dem():
+    """Higher to the north and away from the center column"""
+    rows, cols = np.indices((5, 5))
+    return (100 - 10 * rows + np.abs(cols - 2)).astype(np.float64)
+
+
+class TestDistance(unittest.TestCase):
+
+    def setUp(self):
+        self.fdir, self.streams = y_network()
+        self.graph = FlowGraph(self.fdir)
+
+    def test_step_lengths(self):
+        steps = step_lengths(self.graph, TRANSFORM).reshape(5, 5)
+
+        self.assertAlmostEqual(steps[0, 0], DIAGONAL)
+        self.assertEqual(steps[3, 2], 10)
+        self.assertEqual(steps[1, 0], 10)
+
+        # drains off the grid
+        self.assertEqual(steps[4, 2], 0)
+
+    def test_flow_distance(self):
+        distance = flow_distance(self.graph, np.array([22]), TRANSFORM)
+        distance = distance.reshape(5, 5)
+
+        np.testing.assert_allclose(distance[:, 2], [40, 30, 20, 10, 0])
+        np.testing.assert_allclose(distance[4], [20, 10, 0, 10, 20])
+        self.assertAlmostEqual(distance[0, 0], 20 + 2 * DIAGONAL)
+
+    def test_flow_distance_outside(self):
+        # the last row doesn't drain to the outlet
+        distance = flow_distance(self.graph, np.array([17]), TRANSFORM)
+        self.assertTrue(np.all(np.isnan(distance.reshape(5, 5)[4])))
+
+    def test_height_above_drainage(self):
+        dem = valley_dem()
+        hand = height_above_drainage(self.graph, dem.ravel(),
+                                     self.streams.ravel()).reshape(5, 5)
+
+        np.testing.assert_array_equal(hand[self.streams], 0)
+
+        # (1, 0) drains to the stream at (1, 1), (0, 1) to (2, 2)
+        self.assertEqual(hand[1, 0], dem[1, 0] - dem[1, 1])
+        self.assertEqual(hand[0, 1], dem[0, 1] - dem[2, 2])
+
+
+class TestWriteFlowProducts(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        fdir, streams = y_network()
+
+        profile = {
+            'driver': 'GTiff',
+            'height': 5,
+            'width': 5,
+            'count': 1,
+            'transform': TRANSFORM
+        }
+
+        self.flow_dir = os.path.join(self.folder, 'flow_dir.tif')
+        self.streams = os.path.join(self.folder, 'streams.tif')
+        for path, data in [(self.flow_dir, fdir), (self.streams, streams)]:
+            with rasterio.open(path, 'w', dtype='uint8', **profile) as dst:
+                dst.write(data.astype(np.uint8), 1)
+
+        self.filled = os.path.join(self.folder, 'filled.tif')
+        with rasterio.open(self.filled, 'w', dtype='float32', nodata=-9999,
+                           **profile) as dst:
+            dst.write(valley_dem().astype(np.float32), 1)
+
+        # the outlet one cell up from the bottom
+        self.points = os.path.join(self.folder, 'points.bna')
+        with open(self.points, 'w') as f:
+            f.write('"outlet","",1\n25,15\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_write_flow_products(self):
+        hand = os.path.join(self.folder, 'hand.tif')
+        distance = os.path.join(self.folder, 'flow_distance.tif')
+
+        heights, distances = write_flow_products(
+            self.flow_dir, self.filled, self.streams, self.points,
+            hand=hand, distance=distance)
+
+        for path, data in [(hand, heights), (distance, distances)]:
+            with rasterio.open(path) as src:
+                self.assertEqual(src.nodata, NODATA)
+                np.testing.assert_array_equal(src.read(1), data)
+
+        # outside of the basin
+        np.testing.assert_array_equal(heights[4], NODATA)
+        np.testing.assert_array_equal(distances[4], NODATA)
+
+        np.testing.assert_allclose(distances[:4, 2], [30, 20, 10, 0])
+        self.assertEqual(heights[1, 0], 1)
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from basin_setup.hydrology.graph import FlowGraph
+
+
+class TestFlowGraph(unittest.TestCase):
+
+    def setUp(self):
+        # a 2x3 grid, the top row drains east then everything drains
+        # south off the grid from the last column
+        self.fdir = np.array([
+            [1, 1, 7],
+            [3, 1, 7]
+        ], dtype=np.uint8)
+        self.graph = FlowGraph(self.fdir)
+
+    def test_receivers(self):
+        np.testing.assert_array_equal(
+            self.graph.receivers, [1, 2, 5, 0, 5, -1])
+        self.assertEqual(self.graph.size, 6)
+
+    def test_donors(self):
+        np.testing.assert_array_equal(self.graph.counts, [1, 1, 1, 0, 0, 2])
+
+        donors, receivers = self.graph.upstream(np.array([5, 0]))
+        np.testing.assert_array_equal(donors, [2, 4, 3])
+        np.testing.assert_array_equal(receivers, [5, 5, 0])
+
+    def test_no_donors(self):
+        donors, receivers = self.graph.upstream(np.array([3]))
+        self.assertEqual(len(donors), 0)
+        self.assertEqual(len(receivers), 0)
+
+    def test_sweep(self):
+        labels = np.full(6, -1)
+        labels[5] = 7
+        labels[1] = 3
+
+        labels, distance = self.graph.sweep(labels)
+        np.testing.assert_array_equal(labels, [3, 3, 7, 3, 7, 7])
+        np.testing.assert_array_equal(distance, [1, 0, 1, 2, 1, 0])
+
+    def test_sweep_unreached(self):
+        # the top row stops at a cell without a direction
+        self.fdir[0, 1] = 0
+        graph = FlowGraph(self.fdir)
+
+        labels = np.full(6, -1)
+        labels[2] = 0
+        labels, distance = graph.sweep(labels)
+
+        np.testing.assert_array_equal(labels, [-1, -1, 0, -1, -1, -1])
+        np.testing.assert_array_equal(distance, [-1, -1, 0, -1, -1, -1])
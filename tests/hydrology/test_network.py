@@ -0,0 +1,185 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+
+from basin_setup.hydrology.graph import FlowGraph
+from basin_setup.hydrology.network import (delineate_network, strahler,
+                                           stream_network)
+from basin_setup.hydrology.watersheds import stream_links
+
+from .test_watersheds import TRANSFORM, tollgate_taudem, y_network
+
+
+class TestStrahler(unittest.TestCase):
+
+    def test_strahler(self):
+        # two order 1 links make an order 2 link that an order 1 link
+        # joins, 0 and 1 -> 2, 2 and 3 -> 4
+        order, magnitude = strahler([2, 2, 4, 4, -1], [0, 1, 3, 2, 4])
+
+        self.assertListEqual(order, [1, 1, 2, 1, 2])
+        self.assertListEqual(magnitude, [1, 1, 2, 1, 3])
+
+
+class TestStreamNetwork(unittest.TestCase):
+
+    def setUp(self):
+        self.fdir, self.streams = y_network()
+        self.graph = FlowGraph(self.fdir)
+
+    def network(self, outlets):
+        outlets = np.ravel_multi_index(np.transpose(outlets), (5, 5))
+        links = stream_links(self.graph, self.streams.ravel(), outlets)
+        watersheds = self.graph.sweep(links)[0]
+        return stream_network(self.graph, links, watersheds, TRANSFORM)
+
+    def test_junction(self):
+        table, lines = self.network([(4, 2)])
+
+        self.assertEqual(table.index.name, 'link')
+        self.assertListEqual(list(table['downstream']), [2, 2, -1])
+        self.assertListEqual(list(table['upstream_1']), [-1, -1, 0])
+        self.assertListEqual(list(table['upstream_2']), [-1, -1, 1])
+        self.assertListEqual(list(table['order']), [1, 1, 2])
+        self.assertListEqual(list(table['magnitude']), [1, 1, 2])
+        self.assertListEqual(list(table['contributing_area']), [3, 3, 25])
+        np.testing.assert_allclose(
+            table['length'], [20 * np.sqrt(2), 20 * np.sqrt(2), 20])
+
+        # down into the junction cell
+        self.assertListEqual(lines[0], [(5, 45), (15, 35), (25, 25)])
+        self.assertListEqual(lines[2], [(25, 25), (25, 15), (25, 5)])
+
+    def test_outlets(self):
+        # the link below an outlet carries on the order
+        table, lines = self.network([(3, 2), (4, 2)])
+
+        self.assertListEqual(list(table['downstream']), [2, 2, 3, -1])
+        self.assertListEqual(list(table['order']), [1, 1, 2, 2])
+        self.assertListEqual(list(table['magnitude']), [1, 1, 2, 2])
+        self.assertListEqual(
+            list(table['contributing_area']), [3, 3, 20, 25])
+        self.assertListEqual(lines[3], [(25, 5)])
+
+    def test_no_streams(self):
+        self.streams[:] = False
+        table, lines = self.network([(4, 2)])
+
+        # the outlet is its own link
+        self.assertEqual(len(table), 1)
+        self.assertEqual(table['contributing_area'][0], 25)
+
+
+class TestDelineateNetwork(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        fdir, streams = y_network()
+
+        profile = {
+            'driver': 'GTiff',
+            'height': 5,
+            'width': 5,
+            'count': 1,
+            'dtype': 'uint8',
+            'transform': TRANSFORM,
+            'crs': 'EPSG:32611'
+        }
+
+        self.flow_dir = os.path.join(self.folder, 'flow_dir.tif')
+        self.streams = os.path.join(self.folder, 'streams.tif')
+        for path, data in [(self.flow_dir, fdir), (self.streams, streams)]:
+            with rasterio.open(path, 'w', **profile) as dst:
+                dst.write(data.astype(np.uint8), 1)
+
+        self.points = os.path.join(self.folder, 'points.bna')
+        with open(self.points, 'w') as f:
+            f.write('"outlet","",1\n25,5\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_delineate_network(self):
+        watersheds = os.path.join(self.folder, 'watersheds.tif')
+        network = os.path.join(self.folder, 'net.shp')
+        links = os.path.join(self.folder, 'links.csv')
+
+        labels, table = delineate_network(
+            self.flow_dir, self.streams, self.points, watersheds=watersheds,
+            network=network, links=links)
+
+        with rasterio.open(watersheds) as src:
+            np.testing.assert_array_equal(src.read(1), labels)
+
+        gdf = gpd.read_file(network)
+        self.assertListEqual(list(gdf['LINKNO']), [0, 1, 2])
+        self.assertListEqual(list(gdf['DSLINKNO']), [2, 2, -1])
+        self.assertListEqual(list(gdf['strmOrder']), [1, 1, 2])
+        self.assertListEqual(list(gdf['DSContArea']), [300, 300, 2500])
+
+        df = pd.read_csv(links, index_col='link')
+        pd.testing.assert_frame_equal(df, table, check_dtype=False)
+
+
+@unittest.skipIf(shutil.which('streamnet') is None, 'TauDEM is not installed')
+class TestTauDEMParity(unittest.TestCase):
+    """Compare the native network with streamnet on the Tollgate example"""
+
+    THRESHOLD = 1000
+
+    @classmethod
+    def setUpClass(cls):
+        from basin_setup import delineate
+
+        cls.folder = tempfile.mkdtemp()
+        tollgate_taudem(cls.folder, cls.THRESHOLD)
+
+        def path(name):
+            return os.path.join(cls.folder, name)
+
+        with rasterio.open(path('w.tif')) as src:
+            cls.taudem = src.read(1, masked=True).filled(-1).ravel()
+        cls.tree = delineate.tree_links(path('tree.dat'), path('coord.dat'))
+
+        labels, cls.table = delineate_network(
+            path('p.tif'), path('src.tif'), path('outlets.shp'))
+        cls.native = labels.ravel()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def test_basin(self):
+        np.testing.assert_array_equal(self.native >= 0, self.taudem >= 0)
+
+    def test_watersheds(self):
+        # the same partition of the basin up to the link numbers
+        basin = self.native >= 0
+        pairs = np.unique(np.stack(
+            [self.native[basin], self.taudem[basin]]), axis=1)
+
+        self.assertEqual(len(np.unique(pairs[0])), pairs.shape[1])
+        self.assertEqual(len(np.unique(pairs[1])), pairs.shape[1])
+
+    def test_links(self):
+        basin = self.native >= 0
+        pairs = np.unique(np.stack(
+            [self.native[basin], self.taudem[basin]]), axis=1)
+        to_taudem = dict(zip(*pairs.tolist()))
+        to_taudem[-1] = -1
+
+        table = self.table.loc[pairs[0]]
+        tree = self.tree.loc[pairs[1]]
+
+        np.testing.assert_array_equal(table['order'], tree['order'])
+        np.testing.assert_array_equal(table['magnitude'], tree['magnitude'])
+        np.testing.assert_array_equal(
+            [to_taudem[d] for d in table['downstream']], tree['downstream'])
+        np.testing.assert_array_equal(
+            table['contributing_area'], tree['contributing_area'])
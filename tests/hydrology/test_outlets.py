@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from basin_setup.hydrology.outlets import (move_outlets_to_streams, read_bna,
+                                           snap_outlets, stencil)
+
+
+class TestSnapOutlets(unittest.TestCase):
+
+    TRANSFORM = from_origin(0, 50, 10, 10)
+
+    def setUp(self):
+        # everything drains east to the stream in the last column, the
+        # first column is a stream that isn't downslope
+        self.fdir = np.ones((5, 5), dtype=np.uint8)
+        self.fdir[:, 4] = 7
+        self.streams = np.zeros((5, 5), dtype=bool)
+        self.streams[:, 0] = True
+        self.streams[:, 4] = True
+
+        # cell (2, 1), on the stream at (0, 4), outside
+        self.x = np.array([15.0, 42.0, 75.0])
+        self.y = np.array([25.0, 48.0, 25.0])
+
+    def snap(self, **kwargs):
+        return snap_outlets(self.x, self.y, self.fdir, self.streams,
+                            self.TRANSFORM, **kwargs)
+
+    def test_downslope(self):
+        x, y, distance = self.snap()
+
+        np.testing.assert_array_equal(distance, [3, 0, -1])
+
+        # moved to the cell center, the others keep their location
+        np.testing.assert_array_equal(x, [45, 42, 75])
+        np.testing.assert_array_equal(y, [25, 48, 25])
+
+    def test_max_distance(self):
+        _, _, distance = self.snap(max_distance=2)
+        np.testing.assert_array_equal(distance, [-1, 0, -1])
+
+    def test_nearest(self):
+        x, y, distance = self.snap(rule='nearest')
+
+        np.testing.assert_array_equal(distance, [1, 0, -1])
+        np.testing.assert_array_equal(x, [5, 42, 75])
+        np.testing.assert_array_equal(y, [25, 48, 25])
+
+    def test_no_direction(self):
+        # the walk stops at cells without a flow direction
+        self.fdir[2, 2] = 0
+        _, _, distance = self.snap()
+        self.assertEqual(distance[0], -1)
+
+    def test_rule(self):
+        with self.assertRaises(ValueError):
+            self.snap(rule='taudem')
+
+    def test_stencil(self):
+        drow, dcol, distance = stencil(2)
+
+        self.assertEqual(len(drow), 13)
+        self.assertEqual((drow[0], dcol[0]), (0, 0))
+        self.assertTrue(np.all(np.diff(distance) >= 0))
+        self.assertEqual(distance[-1], 2)
+
+
+class TestMoveOutletsToStreams(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        transform = from_origin(0, 50, 10, 10)
+
+        fdir = np.ones((5, 5), dtype=np.int16)
+        fdir[0, 0] = -32768
+        streams = np.zeros((5, 5), dtype=np.int16)
+        streams[:, 4] = 1
+
+        self.flow_dir = os.path.join(self.folder, 'flow_dir.tif')
+        self.streams = os.path.join(self.folder, 'streams.tif')
+        for path, data in [(self.flow_dir, fdir), (self.streams, streams)]:
+            with rasterio.open(path, 'w', driver='GTiff', height=5, width=5,
+                               count=1, dtype=data.dtype, nodata=-32768,
+                               transform=transform,
+                               crs='EPSG:32611') as dst:
+                dst.write(data, 1)
+
+        self.pour_points = os.path.join(self.folder, 'pour_points.bna')
+        with open(self.pour_points, 'w') as f:
+            f.write('"Lakes","",1\n15.0,25.0\n"Upper Lakes","",1\n'
+                    '5.0,45.0\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_read_bna(self):
+        df = read_bna(self.pour_points)
+
+        self.assertListEqual(list(df['Primary ID']), ['Lakes', 'Upper Lakes'])
+        self.assertListEqual(list(df['x']), [15, 5])
+        self.assertListEqual(list(df['y']), [25, 45])
+
+    def test_move(self):
+        output = os.path.join(self.folder, 'corrected_points.shp')
+        move_outlets_to_streams(
+            self.flow_dir, self.streams, self.pour_points, output)
+
+        df = gpd.read_file(output)
+        self.assertListEqual(list(df['Primary ID']), ['Lakes', 'Upper Lakes'])
+        self.assertListEqual(list(df['Dist_moved']), [3, -1])
+        self.assertEqual(df.geometry[0].x, 45)
+        self.assertEqual(df.geometry[1].x, 5)
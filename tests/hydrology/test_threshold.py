@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from basin_setup.hydrology.accumulation import flow_accumulation
+from basin_setup.hydrology.clip import priority_flood
+from basin_setup.hydrology.threshold import ThresholdSearch
+
+
+class TestThresholdSearch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+
+        rng = np.random.default_rng(1)
+        fdir = priority_flood(rng.random((40, 40)) * 10 +
+                              np.indices((40, 40)).sum(axis=0))
+        drain_area = flow_accumulation(fdir).astype(np.float32)
+
+        profile = {
+            'driver': 'GTiff',
+            'height': 40,
+            'width': 40,
+            'count': 1,
+            'transform': from_origin(0, 400, 10, 10)
+        }
+
+        cls.flow_dir = os.path.join(cls.folder, 'flow_dir.tif')
+        with rasterio.open(cls.flow_dir, 'w', dtype='uint8',
+                           **profile) as dst:
+            dst.write(fdir, 1)
+
+        cls.drain_area = os.path.join(cls.folder, 'drain_area.tif')
+        with rasterio.open(cls.drain_area, 'w', dtype='float32', nodata=-1,
+                           **profile) as dst:
+            dst.write(drain_area, 1)
+
+        # the cell draining the most
+        cls.basin = drain_area.max()
+        row, col = np.unravel_index(drain_area.argmax(), drain_area.shape)
+        cls.points = os.path.join(cls.folder, 'points.bna')
+        with open(cls.points, 'w') as f:
+            f.write('"outlet","",1\n{},{}\n'.format(
+                col * 10 + 5, 400 - row * 10 - 5))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def setUp(self):
+        self.search = ThresholdSearch(self.flow_dir, self.drain_area,
+                                      self.points)
+
+    def test_subbasins(self):
+        counts = [self.search.subbasins(t)[0] for t in [5, 20, 100, 2000]]
+
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertEqual(counts[-1], 1)
+
+        # the subbasins split the area draining to the outlet
+        count, area = self.search.subbasins(20)
+        self.assertAlmostEqual(area * count, self.basin * 100)
+
+    def test_search_subbasins(self):
+        for threshold in [5, 30]:
+            count = self.search.subbasins(threshold)[0]
+
+            found = self.search.search(subbasins=count)
+            self.assertEqual(self.search.subbasins(found)[0], count)
+
+    def test_search_mean_area(self):
+        count, area = self.search.subbasins(30)
+
+        found = self.search.search(mean_area=area)
+        self.assertEqual(self.search.subbasins(found)[1], area)
+
+    def test_table(self):
+        self.search.search(subbasins=3)
+        df = self.search.table()
+
+        self.assertEqual(df.index.name, 'threshold')
+        self.assertListEqual(list(df.columns), ['subbasins', 'mean_area'])
+        self.assertTrue(df.index.is_monotonic_increasing)
+
+    def test_target(self):
+        with self.assertRaises(ValueError):
+            self.search.search()
+
+        with self.assertRaises(ValueError):
+            self.search.search(subbasins=3, mean_area=100)
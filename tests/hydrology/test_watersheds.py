@@ -0,0 +1,206 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from basin_setup.hydrology.graph import FlowGraph
+from basin_setup.hydrology.watersheds import (delineate_watersheds,
+                                              outlet_cells, stream_links)
+
+TRANSFORM = from_origin(0, 50, 10, 10)
+
+TOLLGATE = os.path.join(os.path.dirname(__file__), '..', '..', 'examples',
+                        'delineate_tollgate')
+
+
+def tollgate_taudem(folder, threshold):
+    """Run the TauDEM steps of the delineation on the Tollgate example,
+    the outputs are named like TauDEM's defaults in `folder`
+    """
+
+    from basin_setup import delineate
+
+    def path(name):
+        return os.path.join(folder, name)
+
+    delineate.pitremove(os.path.join(TOLLGATE, 'topo_50m.tif'),
+                        outfile=path('filled.tif'))
+    delineate.calcD8Flow(path('filled.tif'), d8dir_file=path('p.tif'),
+                         d8slope_file=path('sd8.tif'))
+    delineate.calcD8DrainageArea(path('p.tif'), areaD8_out=path('ad8.tif'))
+    delineate.defineStreamsByThreshold(
+        path('ad8.tif'), threshold_streams_out=path('src.tif'),
+        threshold=threshold)
+    delineate.outlets_2_streams(
+        path('p.tif'), path('src.tif'),
+        os.path.join(TOLLGATE, 'tollgate_weirs_xyz.bna'),
+        new_pour_points=path('outlets.shp'))
+
+    delineate.calcD8DrainageAreaBasin(path('p.tif'), path('outlets.shp'),
+                                      areaD8_out=path('ad8_basin.tif'))
+    delineate.defineStreamsByThreshold(
+        path('ad8_basin.tif'), threshold_streams_out=path('src_basin.tif'),
+        threshold=threshold)
+    delineate.delineate_streams(
+        path('filled.tif'), path('p.tif'), path('ad8_basin.tif'),
+        path('src_basin.tif'), path('outlets.shp'),
+        stream_orderfile=path('ord.tif'), treefile=path('tree.dat'),
+        coordfile=path('coord.dat'), netfile=path('net.shp'),
+        wfile=path('w.tif'))
+
+
+def y_network():
+    """Two stream sources in the top corners that join in the center and
+    flow south off the grid, the other cells drain toward the center
+    column
+    """
+
+    fdir = np.ones((5, 5), dtype=np.uint8)
+    fdir[:, 2] = 7
+    fdir[:, 3:] = 5
+    fdir[0, 0] = fdir[1, 1] = 8
+    fdir[0, 4] = fdir[1, 3] = 6
+
+    streams = np.zeros((5, 5), dtype=bool)
+    streams[[0, 1, 0, 1, 2, 3, 4], [0, 1, 4, 3, 2, 2, 2]] = True
+
+    return fdir, streams
+
+
+class TestStreamLinks(unittest.TestCase):
+
+    def setUp(self):
+        self.fdir, self.streams = y_network()
+        self.graph = FlowGraph(self.fdir)
+
+    def watersheds(self, outlets):
+        outlets = np.ravel_multi_index(np.transpose(outlets), (5, 5))
+        links = stream_links(self.graph, self.streams.ravel(), outlets)
+        return links, self.graph.sweep(links)[0].reshape(5, 5)
+
+    def test_junction(self):
+        links, watersheds = self.watersheds([(4, 2)])
+
+        np.testing.assert_array_equal(
+            links.reshape(5, 5)[self.streams], [0, 1, 0, 1, 2, 2, 2])
+        np.testing.assert_array_equal(watersheds, [
+            [0, 2, 2, 2, 1],
+            [0, 0, 2, 1, 1],
+            [2, 2, 2, 2, 2],
+            [2, 2, 2, 2, 2],
+            [2, 2, 2, 2, 2]
+        ])
+
+    def test_outside_basin(self):
+        # the cells draining to the last row are not in the basin
+        _, watersheds = self.watersheds([(3, 2)])
+
+        np.testing.assert_array_equal(watersheds[4], -1)
+        np.testing.assert_array_equal(watersheds[3], 2)
+
+    def test_outlet_splits_link(self):
+        # the cell below an outlet starts a new link
+        links, watersheds = self.watersheds([(3, 2), (4, 2)])
+
+        self.assertEqual(links.max(), 3)
+        np.testing.assert_array_equal(watersheds[3], 2)
+        np.testing.assert_array_equal(watersheds[4], 3)
+
+    def test_outlet_off_stream(self):
+        # an outlet that is not on a stream is its own watershed
+        _, watersheds = self.watersheds([(4, 2), (2, 0)])
+
+        np.testing.assert_array_equal(watersheds[2], [2, 3, 3, 3, 3])
+
+    def test_outlet_cells(self):
+        cells = outlet_cells([25, 5, 60], [5, 45, 5], TRANSFORM, (5, 5))
+        np.testing.assert_array_equal(cells, [22, 0])
+
+
+class TestDelineateWatersheds(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        fdir, streams = y_network()
+
+        profile = {
+            'driver': 'GTiff',
+            'height': 5,
+            'width': 5,
+            'count': 1,
+            'transform': TRANSFORM,
+            'crs': None
+        }
+
+        self.flow_dir = os.path.join(self.folder, 'flow_dir.tif')
+        with rasterio.open(self.flow_dir, 'w', dtype='uint8',
+                           **profile) as dst:
+            dst.write(fdir, 1)
+
+        self.streams = os.path.join(self.folder, 'streams.tif')
+        with rasterio.open(self.streams, 'w', dtype='uint8',
+                           **profile) as dst:
+            dst.write(streams.astype(np.uint8), 1)
+
+        self.points = os.path.join(self.folder, 'points.bna')
+        with open(self.points, 'w') as f:
+            f.write('"outlet","",1\n25,5\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_delineate_watersheds(self):
+        output = os.path.join(self.folder, 'watersheds.tif')
+        watersheds = delineate_watersheds(self.flow_dir, self.streams,
+                                          self.points, output=output)
+
+        self.assertEqual(watersheds.shape, (5, 5))
+        np.testing.assert_array_equal(np.unique(watersheds), [0, 1, 2])
+
+        with rasterio.open(output) as src:
+            self.assertEqual(src.nodata, -1)
+            self.assertEqual(src.dtypes[0], 'int32')
+            np.testing.assert_array_equal(src.read(1), watersheds)
+
+
+@unittest.skipIf(shutil.which('streamnet') is None, 'TauDEM is not installed')
+class TestTauDEMParity(unittest.TestCase):
+    """Compare the native watersheds with streamnet on the Tollgate example"""
+
+    THRESHOLD = 1000
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        tollgate_taudem(cls.folder, cls.THRESHOLD)
+
+        def path(name):
+            return os.path.join(cls.folder, name)
+
+        with rasterio.open(path('w.tif')) as src:
+            cls.taudem = src.read(1, masked=True).filled(-1).ravel()
+
+        cls.native = delineate_watersheds(
+            path('p.tif'), path('src.tif'), path('outlets.shp')).ravel()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def test_basin(self):
+        np.testing.assert_array_equal(self.native >= 0, self.taudem >= 0)
+
+    def test_watersheds(self):
+        # the same partition of the basin up to the link numbers
+        basin = self.native >= 0
+        pairs = np.unique(np.stack(
+            [self.native[basin], self.taudem[basin]]), axis=1)
+
+        self.assertEqual(len(np.unique(pairs[0])), pairs.shape[1])
+        self.assertEqual(len(np.unique(pairs[1])), pairs.shape[1])
+        self.assertEqual(len(np.unique(self.native[basin])),
+                         len(np.unique(self.taudem[basin])))
@@ -1,6 +1,19 @@
 import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.transform import from_origin
+
+from basin_setup import delineate
+from basin_setup.hydrology.network import delineate_network
 
 from .basin_setup_test_case import BSTestCase
+from .hydrology.test_distance import valley_dem
+from .hydrology.test_watersheds import TRANSFORM, y_network
 
 
 class TestDelineateCLI(BSTestCase):
@@ -24,3 +37,166 @@ class TestDelineateCLI(BSTestCase):
         Test the full run of the basin_setup command
         """
         self.run_test(self.cmd_str)
+
+
+class TestCatchmentTable(unittest.TestCase):
+
+    # link, start, end, downstream, upstream 1 and 2, order, monitor point
+    # and magnitude as written by streamnet
+    TREE = (
+        '\t0\t0\t2\t1\t-1\t-1\t1\t-1\t1\n'
+        '\t1\t3\t5\t-1\t0\t2\t2\t0\t2\n'
+        '\t2\t6\t7\t1\t-1\t-1\t1\t-1\t1\n'
+    )
+    AREA = [2, 3, 5, 5, 9, 12, 1, 4]
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        transform = from_origin(0, 40, 10, 10)
+
+        self.watersheds = os.path.join(self.folder, 'watersheds.tif')
+        self.dem = os.path.join(self.folder, 'dem.tif')
+
+        labels = np.array([
+            [0, 0, 2, 2],
+            [0, 1, 2, 2],
+            [1, 1, 1, -1],
+            [1, 1, 1, -1],
+        ], dtype=np.int32)
+        dem = np.arange(16, dtype=np.float32).reshape(4, 4)
+        dem[0, 0] = -9999
+
+        for path, data, nodata in [(self.watersheds, labels, -1),
+                                   (self.dem, dem, -9999)]:
+            with rasterio.open(path, 'w', driver='GTiff', height=4,
+                               width=4, count=1, dtype=data.dtype,
+                               transform=transform, nodata=nodata) as dst:
+                dst.write(data, 1)
+
+        self.tree = os.path.join(self.folder, 'tree.dat')
+        with open(self.tree, 'w') as f:
+            f.write(self.TREE)
+
+        self.coord = os.path.join(self.folder, 'coord.dat')
+        with open(self.coord, 'w') as f:
+            for i, area in enumerate(self.AREA):
+                f.write('\t{0}\t{0}\t{1}\t{2}\t{3}\n'.format(
+                    i * 10.5, 8 - i, 100 - i, area))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_read_tree(self):
+        tree = delineate.read_tree(self.tree)
+
+        self.assertListEqual(list(tree.index), [0, 1, 2])
+        self.assertListEqual(list(tree['downstream']), [1, -1, 1])
+        self.assertListEqual(list(tree['upstream_2']), [-1, 2, -1])
+
+    def test_catchment_table(self):
+        df = delineate.catchment_table(
+            self.watersheds, self.dem, self.tree, self.coord)
+
+        self.assertListEqual(list(df.index), [0, 1, 2])
+        self.assertEqual(df.index.name, 'DN')
+        self.assertListEqual(list(df['cells']), [3, 7, 4])
+        self.assertListEqual(list(df['area']), [300, 700, 400])
+
+        # the DEM nodata cell is not in the elevations
+        np.testing.assert_allclose(
+            df['mean_elevation'], [2.5, 71 / 7, 4.5])
+        self.assertListEqual(list(df['min_elevation']), [1, 5, 2])
+        self.assertListEqual(list(df['max_elevation']), [4, 14, 7])
+
+        self.assertListEqual(list(df['downstream']), [1, -1, 1])
+        self.assertListEqual(list(df['contributing_area']), [5, 12, 4])
+
+    def test_catchment_table_links(self):
+        # the link table of the native stream network
+        links = pd.DataFrame({
+            'downstream': [1, -1, 1],
+            'contributing_area': [5, 12, 4]
+        })
+
+        df = delineate.catchment_table(self.watersheds, self.dem,
+                                       links=links)
+        pd.testing.assert_frame_equal(
+            df, delineate.catchment_table(
+                self.watersheds, self.dem, self.tree, self.coord))
+
+    def test_ars_streamflow_files(self):
+        output = os.path.join(self.folder, 'basin_catchments.csv')
+        delineate.create_ars_streamflow_files(
+            self.tree, self.coord, 100, self.watersheds, self.dem,
+            output=output)
+
+        # below the header block
+        df = pd.read_csv(output, skiprows=7, index_col='DN')
+        self.assertListEqual(list(df['downstream']), [1, -1, 1])
+
+
+class TestOutputStreamflow(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        work = os.path.join(self.folder, 'work')
+        os.mkdir(work)
+        fdir, streams = y_network()
+
+        profile = {
+            'driver': 'GTiff',
+            'height': 5,
+            'width': 5,
+            'count': 1,
+            'transform': TRANSFORM,
+            'crs': 'EPSG:32611'
+        }
+
+        self.imgs = {
+            key: os.path.join(work, name) for key, name in [
+                ('flow_dir', 'flow_dir.tif'),
+                ('thresh_streams', 'streams.tif'),
+                ('filled', 'filled.tif'),
+                ('corrected_points', 'points.bna'),
+                ('watersheds', 'watersheds.tif'),
+                ('net', 'net'),
+                ('links', 'links.csv'),
+            ]
+        }
+
+        for key, data in [('flow_dir', fdir), ('thresh_streams', streams)]:
+            with rasterio.open(self.imgs[key], 'w', dtype='uint8',
+                               **profile) as dst:
+                dst.write(data.astype(np.uint8), 1)
+
+        with rasterio.open(self.imgs['filled'], 'w', dtype='float32',
+                           nodata=-9999, **profile) as dst:
+            dst.write(valley_dem().astype(np.float32), 1)
+
+        with open(self.imgs['corrected_points'], 'w') as f:
+            f.write('"outlet","",1\n25,15\n')
+
+        self.links = delineate_network(
+            self.imgs['flow_dir'], self.imgs['thresh_streams'],
+            self.imgs['corrected_points'],
+            watersheds=self.imgs['watersheds'], network=self.imgs['net'],
+            links=self.imgs['links'])[1]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_move_flow_products(self):
+        output = os.path.join(self.folder, 'streamflow')
+        delineate.output_streamflow(
+            self.imgs, 10, self.imgs['filled'], output_dir=output,
+            package='move', links=self.links, flow_products=True)
+
+        final_output = os.path.join(output, 'thresh_10')
+        self.assertFalse(os.path.exists(self.imgs['corrected_points']))
+        for name in ['corrected_points.bna', 'watersheds.asc', 'links.csv',
+                     'hand.tif', 'flow_distance.tif']:
+            self.assertTrue(
+                os.path.isfile(os.path.join(final_output, name)), name)
+
+        with rasterio.open(os.path.join(final_output, 'hand.tif')) as src:
+            self.assertEqual(src.read(1)[1, 0], 1)
@@ -1,15 +1,24 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import logging
 import os
 import shutil
+import tempfile
 import unittest
 from subprocess import check_output
+from unittest.mock import patch
 
+import netCDF4 as nc
 import numpy as np
 import pandas as pd
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.warp import Resampling, reproject
+from spatialnc.topo import get_topo_stats
 
-from basin_setup.grm import parse_fname_date
+from basin_setup.grm import (BLOCK_RESAMPLE, GRM, aligned_factor, block_reduce,
+                             parse_fname_date, warp_grid, whole_blocks)
 
 from .basin_setup_test_case import BSTestCase
 
@@ -106,3 +115,294 @@ class TestGRM(unittest.TestCase):
         for p in not_parseable:
             dt = parse_fname_date(p)
             assert dt is None
+
+
+class TestGRMSummary(unittest.TestCase):
+    '''
+    Tests for the elevation band summaries of each flight
+    '''
+
+    def setUp(self):
+        gold = os.path.join(os.path.dirname(__file__), 'Lakes', 'gold',
+                            'landfire_140')
+        self.temp = tempfile.mkdtemp()
+        self.lidar = os.path.join(self.temp, 'lidar_depths_wy2019.nc')
+        shutil.copyfile(os.path.join(gold, 'lidar_depths_wy2019.nc'),
+                        self.lidar)
+
+        # skip the gdalinfo call in __init__
+        self.subject = GRM.__new__(GRM)
+        self.subject.topo = os.path.join(gold, 'topo.nc')
+        self.subject.band_size = 250
+        self.subject.log = logging.getLogger(__name__)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def test_add_summary(self):
+        self.subject.ds = nc.Dataset(self.lidar, mode='a')
+        depth = self.subject.ds.variables['depth'][:]
+        for index in range(depth.shape[0]):
+            self.subject.add_summary(index, depth[index])
+        self.subject.ds.close()
+
+        with nc.Dataset(self.subject.topo) as topo:
+            dem = topo.variables['dem'][:]
+            mask = topo.variables['mask'][:] == 1
+
+        with nc.Dataset(self.lidar) as ds:
+            bands = ds.variables['elevation_band'][:]
+            self.assertEqual(ds.variables['elevation_band'].band_size, 250)
+            self.assertNotIn('subbasin_depth', ds.variables)
+
+            for index in range(depth.shape[0]):
+                flight = np.ma.filled(depth[index].astype(float), np.nan)
+                self.assertAlmostEqual(
+                    ds.variables['basin_depth'][index],
+                    np.nanmean(flight[mask]), places=5)
+
+                for i, band in enumerate(bands):
+                    cells = mask & (dem >= band) & (dem < band + 250)
+                    values = flight[cells]
+                    self.assertAlmostEqual(
+                        ds.variables['band_depth'][index, i],
+                        np.nanmean(values), places=5)
+                    self.assertAlmostEqual(
+                        ds.variables['band_coverage'][index, i],
+                        np.mean(~np.isnan(values)), places=5)
+
+    def test_band_mismatch(self):
+        self.subject.ds = nc.Dataset(self.lidar, mode='a')
+        depth = self.subject.ds.variables['depth'][0]
+        self.subject.add_summary(0, depth)
+
+        self.subject.band_size = 100
+        with self.assertRaises(ValueError):
+            self.subject.add_summary(1, depth)
+        self.subject.ds.close()
+
+
+def gdal_reduce(data, factor, resample):
+    '''
+    Reduce an aligned grid with GDAL to compare to block_reduce
+    '''
+
+    fy, fx = factor
+    ny, nx = data.shape[0] // fy, data.shape[1] // fx
+    result = np.full((ny, nx), -9999, dtype=np.float64)
+
+    reproject(
+        np.where(np.isnan(data), -9999, data),
+        result,
+        src_transform=from_origin(0, data.shape[0], 1, 1),
+        dst_transform=from_origin(0, data.shape[0], fx, fy),
+        src_crs='EPSG:32611',
+        dst_crs='EPSG:32611',
+        src_nodata=-9999,
+        dst_nodata=-9999,
+        resampling=getattr(Resampling, resample)
+    )
+
+    return np.where(result == -9999, np.nan, result)
+
+
+class TestBlockReduce(unittest.TestCase):
+    '''
+    Parity of the block reduction with gdalwarp
+    '''
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.continuous = rng.random((48, 60)) * 3
+        self.continuous[rng.random((48, 60)) < 0.3] = np.nan
+
+        # few values to have ties for the median and mode
+        self.categorical = rng.integers(0, 4, (48, 60)).astype(float)
+        self.categorical[rng.random((48, 60)) < 0.3] = np.nan
+
+        for data in [self.continuous, self.categorical]:
+            data[:6, :6] = np.nan
+
+    def test_parity(self):
+        for resample in BLOCK_RESAMPLE:
+            for factor in [(3, 3), (2, 4), (16, 15)]:
+                for data in [self.continuous, self.categorical]:
+                    with self.subTest(resample=resample, factor=factor):
+                        np.testing.assert_allclose(
+                            block_reduce(data, factor, resample),
+                            gdal_reduce(data, factor, resample),
+                            rtol=1e-6)
+
+    def test_empty_block(self):
+        result = block_reduce(self.continuous, (3, 3), 'average')
+
+        self.assertTrue(np.all(np.isnan(result[:2, :2])))
+        self.assertFalse(np.all(np.isnan(result)))
+
+    def test_resample(self):
+        with self.assertRaises(ValueError):
+            block_reduce(self.continuous, (3, 3), 'bilinear')
+
+
+class TestGridMatch(unittest.TestCase):
+    '''
+    Tests for matching images that are aligned to the gdalwarp grid
+    '''
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.topo = os.path.join(os.path.dirname(__file__), 'Lakes', 'gold',
+                                 'landfire_140', 'topo.nc')
+        self.ts = get_topo_stats(self.topo)
+        self.extent, self.dx, self.dy = warp_grid(self.ts)
+
+        # image with a third of the grid cell size aligned to the grid,
+        # missing the east edge
+        self.px, self.py = self.dx / 3, self.dy / 3
+        self.left = self.extent[0] - 3 * self.px
+        self.top = self.extent[3] + 6 * self.py
+        self.transform = from_origin(self.left, self.top, self.px, self.py)
+
+        rng = np.random.default_rng(0)
+        data = rng.random((195, 171)).astype(np.float32) * 2
+        data[rng.random(data.shape) < 0.2] = -9999
+        self.data = data
+
+        self.subject = GRM.__new__(GRM)
+        self.subject.image_info = {'pixel size': [self.px, -self.py],
+                                   'origin': [self.left, self.top]}
+        self.subject.ts = self.ts
+        self.subject.temp = self.temp
+        self.subject.log = logging.getLogger(__name__)
+
+        # the last image column is half of a block
+        self.write_image(170)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def write_image(self, width):
+        self.subject.image = os.path.join(
+            self.temp, 'USCALB20190325_{}.tif'.format(width))
+
+        with rasterio.open(self.subject.image, 'w', driver='GTiff',
+                           height=195, width=width, count=1,
+                           dtype='float32', crs='EPSG:32611', nodata=-9999,
+                           transform=self.transform) as dst:
+            dst.write(self.data[:, :width], 1)
+
+    def read(self, resample):
+        self.subject.resample = resample
+        self.subject.grid_match()
+
+        with nc.Dataset(self.subject.working_file) as ds:
+            return (np.flipud(np.ma.filled(
+                ds.variables['Band1'][:].astype(float), np.nan)),
+                ds.variables['x'][:], ds.variables['y'][:])
+
+    def test_warp_grid(self):
+        extent, dx, dy = warp_grid(self.ts)
+        self.assertTupleEqual(extent, (319645, 4157862, 328195, 4167012))
+        self.assertAlmostEqual(dx, 8550 / 58)
+        self.assertAlmostEqual(dy, 9150 / 62)
+
+    def test_aligned_factor(self):
+        self.assertTupleEqual(
+            aligned_factor(self.subject.image_info, self.ts), (3, 3, 6, 3))
+
+        shifted = {'pixel size': [self.px, -self.py],
+                   'origin': [self.left + 20, self.top]}
+        self.assertIsNone(aligned_factor(shifted, self.ts))
+
+        # aligned to the topo cell edges instead of the gdalwarp grid
+        topo = {'pixel size': [50.0, -50.0],
+                'origin': [319570.405 - 3 * 50, 4167087.075 + 6 * 50]}
+        self.assertIsNone(aligned_factor(topo, self.ts))
+
+        coarse = {'pixel size': [self.px * 2, -self.py * 2],
+                  'origin': [self.left, self.top]}
+        self.assertIsNone(aligned_factor(coarse, self.ts))
+
+    def test_whole_blocks(self):
+        self.assertFalse(whole_blocks((3, 3, 6, 3), (195, 170), self.ts))
+        self.assertTrue(whole_blocks((3, 3, 6, 3), (195, 171), self.ts))
+        self.assertFalse(whole_blocks((3, 3, -1, 3), (195, 171), self.ts))
+        self.assertTrue(whole_blocks((3, 3, -3, 3), (30, 171), self.ts))
+
+    def expected(self, resample, width):
+        expected = np.full((self.ts['ny'], self.ts['nx']), -9999.0)
+        reproject(
+            self.data[:, :width],
+            expected,
+            src_transform=self.transform,
+            dst_transform=from_origin(self.extent[0], self.extent[3],
+                                      self.dx, self.dy),
+            src_crs='EPSG:32611',
+            dst_crs='EPSG:32611',
+            src_nodata=-9999,
+            dst_nodata=-9999,
+            resampling=getattr(Resampling, resample)
+        )
+
+        return np.where(expected == -9999, np.nan, expected)
+
+    def test_block_match(self):
+        for resample in BLOCK_RESAMPLE:
+            if resample == 'average':
+                self.write_image(171)
+
+            result, x, y = self.read(resample)
+
+            with self.subTest(resample=resample):
+                self.assertTrue(np.all(np.isnan(result[:, -1])))
+                np.testing.assert_allclose(
+                    result, self.expected(resample, self.data.shape[1]),
+                    rtol=1e-6)
+
+        # cell centers of the gdalwarp grid
+        np.testing.assert_allclose(
+            x, self.extent[0] + (np.arange(self.ts['nx']) + 0.5) * self.dx)
+        np.testing.assert_allclose(
+            y, self.extent[1] + (np.arange(self.ts['ny']) + 0.5) * self.dy)
+
+    def test_partial_blocks(self):
+        for resample in ['min', 'max', 'med', 'mode']:
+            result, _, _ = self.read(resample)
+
+            with self.subTest(resample=resample):
+                np.testing.assert_allclose(
+                    result, self.expected(resample, 170), rtol=1e-6)
+
+    @unittest.skipIf(shutil.which('gdalwarp') is None,
+                     'gdalwarp is not installed')
+    def test_gdalwarp(self):
+        self.write_image(171)
+
+        for resample in BLOCK_RESAMPLE:
+            block, block_x, block_y = self.read(resample)
+
+            with patch('basin_setup.grm.aligned_factor', return_value=None):
+                warp, warp_x, warp_y = self.read(resample)
+
+            with self.subTest(resample=resample):
+                np.testing.assert_allclose(block, warp, rtol=1e-6)
+                np.testing.assert_allclose(block_x, warp_x)
+                np.testing.assert_allclose(block_y, warp_y)
+
+    @patch('basin_setup.grm.check_output')
+    def test_gdalwarp_fallback(self, mock_gdalwarp):
+        self.subject.resample = 'bilinear'
+        self.subject.grid_match()
+        self.assertIn('gdalwarp', mock_gdalwarp.call_args[0][0])
+        self.assertIn('-te 319645 4157862 328195 4167012',
+                      mock_gdalwarp.call_args[0][0])
+
+        # the last column is partly on the image
+        self.subject.resample = 'average'
+        self.subject.grid_match()
+        self.assertEqual(mock_gdalwarp.call_count, 2)
+
+        self.write_image(171)
+        self.subject.image_info['origin'][0] += 20
+        self.subject.grid_match()
+        self.assertEqual(mock_gdalwarp.call_count, 3)
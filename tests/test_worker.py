@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from basin_setup import worker
+from basin_setup.cli.worker import main
+from basin_setup.utils import config
+
+
+def echo(argv):
+    return {'args': argv, 'cwd': os.getcwd()}
+
+
+@patch.dict(worker.COMMANDS, {'echo': 'tests.test_worker:echo'})
+class TestRunJob(unittest.TestCase):
+
+    def test_result(self):
+        cwd = os.getcwd()
+        folder = os.path.dirname(__file__)
+
+        response = worker.run_job(
+            {'command': 'echo', 'args': ['a', 'b'], 'cwd': folder})
+
+        self.assertEqual(response['status'], 'ok')
+        self.assertEqual(response['result'],
+                         {'args': ['a', 'b'], 'cwd': folder})
+        self.assertEqual(os.getcwd(), cwd)
+
+    def test_unknown_command(self):
+        response = worker.run_job({'command': 'delineate', 'args': []})
+
+        self.assertEqual(response['status'], 'error')
+        self.assertIn('Unknown command delineate', response['error'])
+
+    def test_exception(self):
+        response = worker.run_job({
+            'command': 'generate_topo',
+            'args': ['not_a_config.ini']
+        })
+
+        self.assertEqual(response['status'], 'error')
+        self.assertIn('Configuration file does not exist', response['error'])
+        self.assertIn('Traceback', response['traceback'])
+
+    def test_exit(self):
+        response = worker.run_job({'command': 'generate_topo', 'args': []})
+
+        self.assertEqual(response['status'], 'error')
+        self.assertEqual(response['error'], 'Exited with status 2')
+
+
+@patch.dict(worker.COMMANDS, {'echo': 'tests.test_worker:echo'})
+class TestWorker(unittest.TestCase):
+
+    def setUp(self):
+        # socket paths are limited to ~100 characters
+        self.folder = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.folder, 'worker.sock')
+
+        self.server = worker.Worker(self.socket_path)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.05})
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.folder)
+
+    def test_submit(self):
+        self.assertTrue(worker.ping(self.socket_path))
+
+        for n in range(2):
+            response = worker.submit(
+                'echo', [str(n)], self.socket_path, cwd=self.folder)
+
+            self.assertEqual(response['status'], 'ok')
+            self.assertEqual(response['result'],
+                             {'args': [str(n)], 'cwd': self.folder})
+
+        response = worker.submit('grm', [], self.socket_path)
+        self.assertEqual(response['status'], 'error')
+
+    def test_already_running(self):
+        with self.assertRaises(Exception):
+            worker.Worker(self.socket_path)
+
+    def test_shutdown(self):
+        response = worker.submit('shutdown', [], self.socket_path)
+        self.assertEqual(response['status'], 'ok')
+
+        self.thread.join(timeout=5)
+        self.assertFalse(self.thread.is_alive())
+
+        self.server.server_close()
+        self.assertFalse(os.path.exists(self.socket_path))
+        self.assertFalse(worker.ping(self.socket_path))
+
+
+class TestMasterConfig(unittest.TestCase):
+
+    def test_master_config(self):
+        # the CoreConfig is parsed once for all the jobs
+        config_file = os.path.join(
+            os.path.dirname(__file__), 'Lakes', 'config.ini')
+
+        ucfg, _ = config.read(config_file)
+        ucfg2, _ = config.read(config_file)
+
+        self.assertIs(ucfg.mcfg, config.master_config())
+        self.assertIs(ucfg2.mcfg, ucfg.mcfg)
+
+
+class TestWorkerCLI(unittest.TestCase):
+
+    def test_action_required(self):
+        with patch('sys.stderr'), self.assertRaises(SystemExit) as error:
+            main([])
+
+        self.assertEqual(error.exception.code, 2)
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.transform import Affine, from_origin
+
+from basin_setup import delineate
+from basin_setup.utils.ascii_grid import format_rows, write_ascii_grid
+
+
+class TestAsciiGrid(unittest.TestCase):
+
+    TRANSFORM = from_origin(319570.405027, 4167087.07547, 150, 150)
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def raster(self, data, nodata=None, transform=TRANSFORM,
+               crs='EPSG:32611'):
+        path = os.path.join(self.folder, 'grid.tif')
+        with rasterio.open(path, 'w', driver='GTiff', height=data.shape[0],
+                           width=data.shape[1], count=1, dtype=data.dtype,
+                           transform=transform, nodata=nodata,
+                           crs=crs) as dst:
+            dst.write(data, 1)
+
+        return path
+
+    def assert_gdal_equal(self, path, **kwargs):
+        """Compare to the output of GDAL's AAIGrid driver"""
+
+        gdal_file = os.path.join(self.folder, 'gdal.asc')
+        test_file = os.path.join(self.folder, 'test.asc')
+
+        rasterio.shutil.copy(path, gdal_file, driver='AAIGrid')
+        write_ascii_grid(path, test_file, **kwargs)
+
+        with open(gdal_file, 'rb') as f:
+            gdal = f.read()
+        with open(test_file, 'rb') as f:
+            self.assertEqual(f.read(), gdal)
+
+        if os.path.exists(os.path.join(self.folder, 'gdal.prj')):
+            with open(os.path.join(self.folder, 'gdal.prj')) as f:
+                gdal = f.read()
+            with open(os.path.join(self.folder, 'test.prj')) as f:
+                self.assertEqual(f.read(), gdal)
+
+    def test_watersheds(self):
+        data = self.rng.integers(-1, 5000, (37, 23)).astype(np.int32)
+        self.assert_gdal_equal(self.raster(data, nodata=-1))
+
+    def test_dtypes(self):
+        for dtype in ['uint8', 'int16', 'uint16', 'int32', 'uint32',
+                      'float32', 'float64']:
+            with self.subTest(dtype=dtype):
+                data = (self.rng.random((11, 7)) * 200).astype(dtype)
+                self.assert_gdal_equal(self.raster(data, nodata=3))
+
+    def test_float_marker(self):
+        # GDAL adds .0 to the first finite value without a decimal point
+        data = np.array([[np.nan, np.inf, 2], [3.5, 4, 1e21]])
+        self.assert_gdal_equal(self.raster(data))
+
+        data = np.array([[1e21, 2], [3.5, -4]])
+        self.assert_gdal_equal(self.raster(data, nodata=-9999))
+
+        data = np.full((3, 4), -0.0)
+        self.assert_gdal_equal(self.raster(data))
+
+    def test_chunks(self):
+        data = self.rng.random((50, 9)) * 1000
+        data[:20] = np.nan
+        data[25, 3] = 10
+        self.assert_gdal_equal(self.raster(data), chunk_cells=10)
+
+    def test_cell_size(self):
+        data = self.rng.integers(0, 10, (5, 6)).astype(np.int16)
+        transform = Affine(150, 0, 10.5, 0, -100, 200)
+        self.assert_gdal_equal(self.raster(data, transform=transform))
+
+    def test_no_crs(self):
+        data = self.rng.integers(0, 10, (5, 6)).astype(np.int16)
+        self.assert_gdal_equal(self.raster(data, crs=None))
+        self.assertFalse(
+            os.path.exists(os.path.join(self.folder, 'test.prj')))
+
+    def test_format_rows(self):
+        self.assertEqual(
+            format_rows(np.array([[1, -2], [30, 4]])), '1 -2 \n30 4 \n')
+        self.assertEqual(
+            format_rows(np.array([[0.5, 1]]), integer=False), '0.5 1 \n')
+
+    def test_convert2ascii(self):
+        path = self.raster(np.arange(12, dtype=np.int32).reshape(3, 4))
+        outfile = os.path.join(self.folder, 'watersheds.asc')
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future = delineate.convert2ascii(path, outfile, executor=executor)
+            self.assertIsNone(future.result())
+
+        self.assertIsNone(delineate.convert2ascii(path, outfile))
+        with open(outfile) as f:
+            self.assertTrue(f.read().endswith('\n8 9 10 11 \n'))
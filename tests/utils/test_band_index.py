@@ -0,0 +1,89 @@
+import os
+import unittest
+
+import netCDF4 as nc
+import numpy as np
+
+from basin_setup.utils.band_index import BandIndex, cached_band_index
+
+TOPO = os.path.join(os.path.dirname(__file__), '..', 'Lakes', 'gold',
+                    'landfire_140', 'topo.nc')
+
+
+class TestBandIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dem = np.array([
+            [np.nan, 105.0, 180.0, 250.0],
+            [90.0, 130.0, 210.0, 290.0],
+            [95.0, 150.0, 240.0, 300.0],
+        ])
+        self.mask = np.array([
+            [1, 1, 1, 1],
+            [0, 1, 1, 1],
+            [1, 1, 1, 0],
+        ])
+        self.subbasin = np.array([
+            [0, 1, 1, 0],
+            [0, 1, 0, 0],
+            [1, 0, 0, 0],
+        ])
+        self.index = BandIndex(self.dem, self.mask, band_size=100,
+                               subbasins=[('North', self.subbasin)])
+
+    def test_index(self):
+        np.testing.assert_array_equal(self.index.bands, [0, 100, 200])
+        np.testing.assert_array_equal(self.index.band_cells, [1, 4, 4])
+
+        # the cells of each band are together and in the basin
+        for i, band in enumerate(self.index.bands):
+            start = self.index.offsets[i]
+            cells = self.index.cells[
+                start:start + self.index.band_cells[i]]
+            dem = self.dem.ravel()[cells]
+            self.assertTrue(np.all((dem >= band) & (dem < band + 100)))
+            self.assertTrue(np.all(self.mask.ravel()[cells] == 1))
+
+    def test_summarize(self):
+        depth = np.array([
+            [1.0, 2.0, np.nan, 3.0],
+            [9.0, 4.0, 5.0, 6.0],
+            [7.0, 8.0, np.nan, 9.0],
+        ])
+
+        summary = self.index.summarize(depth)
+
+        np.testing.assert_allclose(summary['band_mean'], [7, 14 / 3, 14 / 3])
+        np.testing.assert_allclose(summary['band_coverage'],
+                                   [1, 0.75, 0.75])
+        self.assertAlmostEqual(summary['basin_mean'], 35 / 7)
+        self.assertAlmostEqual(summary['basin_coverage'], 7 / 9)
+        np.testing.assert_allclose(summary['subbasin_mean'], [13 / 3])
+        np.testing.assert_allclose(summary['subbasin_coverage'], [0.75])
+
+    def test_summarize_masked(self):
+        depth = np.ma.masked_array(np.ones((3, 4)), mask=self.dem > 200)
+
+        summary = self.index.summarize(depth)
+
+        np.testing.assert_allclose(summary['band_mean'], [1, 1, np.nan])
+        np.testing.assert_allclose(summary['band_coverage'], [1, 1, 0])
+
+    def test_from_topo(self):
+        index = BandIndex.from_topo(TOPO, band_size=50)
+
+        with nc.Dataset(TOPO) as ds:
+            dem = ds.variables['dem'][:]
+            mask = ds.variables['mask'][:] == 1
+
+        self.assertEqual(len(index.cells), mask.sum())
+        edges = np.append(index.bands, index.bands[-1] + 50)
+        np.testing.assert_array_equal(
+            index.band_cells, np.histogram(dem[mask], bins=edges)[0])
+        self.assertListEqual(index.subbasin_names, [])
+
+    def test_cached(self):
+        index = cached_band_index(TOPO)
+
+        self.assertIs(cached_band_index(TOPO), index)
+        self.assertIsNot(cached_band_index(TOPO, band_size=50), index)
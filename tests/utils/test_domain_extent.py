@@ -1,5 +1,7 @@
 import os
 
+import numpy as np
+
 from basin_setup.utils import domain_extent
 from tests.Lakes.lakes_test_case import BasinSetupLakes
 
@@ -71,3 +73,87 @@ class TestConditionToCellsize(BasinSetupLakes):
             extents,
             [320294.0, 4158508.5, 327544.0, 4166358.5]
         )
+
+
+class TestTileExtents(BasinSetupLakes):
+
+    EXTENTS = [319570.405027, 4157787.07547, 328270.405027, 4167087.07547]
+    CELL_SIZE = 150
+
+    def test_tiles_cover_domain(self):
+        tiles = domain_extent.tile_extents(
+            self.EXTENTS, self.CELL_SIZE, tile_size=25)
+
+        # 58 x 62 cells
+        self.assertTrue(len(tiles) == 9)
+
+        cells = np.zeros((62, 58), dtype=int)
+        for tile in tiles:
+            cells[tile.window.toslices()] += 1
+        self.assertTrue(np.all(cells == 1))
+
+        self.assertListEqual(
+            [tile.window.width for tile in tiles[:3]], [25, 25, 8])
+        self.assertListEqual(
+            [tile.window.height for tile in tiles[::3]], [25, 25, 12])
+
+    def test_tiles_aligned(self):
+        tiles = domain_extent.tile_extents(
+            self.EXTENTS, self.CELL_SIZE, tile_size=25)
+
+        _, x, _ = domain_extent.affine_transform_from_extents(
+            self.EXTENTS, self.CELL_SIZE)
+
+        for tile in tiles:
+            self.assertEqual(tile.extents[0], x[tile.window.col_off])
+            self.assertAlmostEqual(
+                tile.extents[3],
+                self.EXTENTS[3] - tile.window.row_off * self.CELL_SIZE)
+
+        self.assertEqual(tiles[-1].extents[2], self.EXTENTS[2])
+        self.assertAlmostEqual(tiles[-1].extents[1], self.EXTENTS[1])
+
+    def test_halo(self):
+        tiles = domain_extent.tile_extents(
+            self.EXTENTS, self.CELL_SIZE, tile_size=25, halo=2)
+
+        tile = tiles[4]
+        self.assertListEqual(
+            tile.halo_extents,
+            [
+                tile.extents[0] - 300,
+                tile.extents[1] - 300,
+                tile.extents[2] + 300,
+                tile.extents[3] + 300
+            ]
+        )
+        self.assertEqual(tile.core, (slice(2, 27), slice(2, 27)))
+
+
+class TestBoundsWindow(BasinSetupLakes):
+
+    def setUp(self):
+        self.transform, _, _ = domain_extent.affine_transform_from_extents(
+            [1000, 1000, 2000, 2000], 10)
+
+    def test_snapped(self):
+        window = domain_extent.bounds_window(
+            [1015, 1505, 1031, 1521], self.transform, 100, 100)
+
+        self.assertEqual(window.col_off, 1)
+        self.assertEqual(window.row_off, 47)
+        self.assertEqual(window.width, 3)
+        self.assertEqual(window.height, 3)
+
+    def test_pad_and_clip(self):
+        window = domain_extent.bounds_window(
+            [990, 1985, 1031, 2010], self.transform, 100, 100, pad=2)
+
+        self.assertEqual(window.col_off, 0)
+        self.assertEqual(window.row_off, 0)
+        self.assertEqual(window.width, 6)
+        self.assertEqual(window.height, 4)
+
+    def test_outside(self):
+        self.assertIsNone(domain_extent.bounds_window(
+            [3000, 3000, 3100, 3100], self.transform, 100, 100))
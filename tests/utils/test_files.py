@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from basin_setup.utils import files
+from basin_setup.utils.files import link_or_copy
+
+
+class TestLinkOrCopy(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.src = os.path.join(self.folder, 'tree.dat')
+        self.dst = os.path.join(self.folder, 'streamflow')
+        os.mkdir(self.dst)
+
+        with open(self.src, 'w') as f:
+            f.write('\t0\t0\t2\t-1\t-1\t-1\t1\t0\t1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_hardlink(self):
+        dst = os.path.join(self.dst, 'tree.dat')
+
+        self.assertEqual(link_or_copy(self.src, dst), 'hardlink')
+        self.assertTrue(os.path.samefile(self.src, dst))
+
+        # the original can be removed by the cleanup
+        os.remove(self.src)
+        self.assertIn('-1', self.read(dst))
+
+    def test_folder(self):
+        link_or_copy(self.src, self.dst)
+        self.assertTrue(
+            os.path.samefile(self.src, os.path.join(self.dst, 'tree.dat')))
+
+    def test_replace(self):
+        dst = os.path.join(self.dst, 'tree.dat')
+        with open(dst, 'w') as f:
+            f.write('old')
+
+        link_or_copy(self.src, dst)
+        self.assertEqual(self.read(dst), self.read(self.src))
+
+    @patch.object(files, 'reflink', side_effect=OSError('not supported'))
+    @patch('os.link', side_effect=OSError('cross device link'))
+    def test_fallback(self, mock_link, mock_reflink):
+        dst = os.path.join(self.dst, 'tree.dat')
+
+        self.assertEqual(link_or_copy(self.src, dst), 'copy')
+        self.assertFalse(os.path.samefile(self.src, dst))
+        self.assertEqual(self.read(dst), self.read(self.src))
+
+    @patch('os.link', side_effect=OSError('cross device link'))
+    def test_reflink(self, mock_link):
+        dst = os.path.join(self.dst, 'tree.dat')
+
+        # reflinks only work on copy on write filesystems
+        method = link_or_copy(self.src, dst)
+        self.assertIn(method, ['reflink', 'copy'])
+        self.assertEqual(self.read(dst), self.read(self.src))
+
+    def test_copy(self):
+        dst = os.path.join(self.dst, 'tree.dat')
+
+        self.assertEqual(link_or_copy(self.src, dst, 'copy'), 'copy')
+        self.assertFalse(os.path.samefile(self.src, dst))
+
+    def test_move(self):
+        dst = os.path.join(self.dst, 'tree.dat')
+        content = self.read(self.src)
+
+        self.assertEqual(link_or_copy(self.src, dst, 'move'), 'move')
+        self.assertFalse(os.path.exists(self.src))
+        self.assertEqual(self.read(dst), content)
+
+    def test_strategy(self):
+        with self.assertRaises(ValueError):
+            link_or_copy(self.src, self.dst, 'symlink')
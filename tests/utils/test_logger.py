@@ -0,0 +1,59 @@
+import logging
+import tracemalloc
+import unittest
+
+import numpy as np
+
+from basin_setup.utils.logger import BasinSetupLogger, log_peak_memory
+
+
+class Stages():
+
+    def __init__(self):
+        self._logger = logging.getLogger(__name__)
+
+    @log_peak_memory
+    def allocate(self, n):
+        return np.ones(n, dtype=np.uint8).sum()
+
+
+class TestPeakMemory(unittest.TestCase):
+
+    def test_log_peak_memory(self):
+        stages = Stages()
+
+        with self.assertLogs(__name__, level='DEBUG') as logs:
+            self.assertEqual(stages.allocate(200 * 1024**2), 200 * 1024**2)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertRegex(
+            logs.output[0],
+            r'allocate peak memory [\d.]+ MB \([\d.]+ MB retained\)')
+        self.assertEqual(Stages.allocate.__name__, 'allocate')
+
+        # the peak of the stage, not the high water mark of the process
+        peak = float(logs.output[0].split()[3])
+        self.assertGreaterEqual(peak, 200)
+        self.assertLess(peak, 250)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_not_debug(self):
+        stages = Stages()
+
+        with self.assertLogs(__name__, level='INFO') as logs:
+            stages.allocate(1024)
+            stages._logger.info('done')
+
+        self.assertEqual(logs.output, ['INFO:{}:done'.format(__name__)])
+
+
+class TestBasinSetupLogger(unittest.TestCase):
+
+    def test_existing_loggers(self):
+        # loggers from a previous run in the worker keep logging
+        log = logging.getLogger('basin_setup.test_existing_loggers')
+        other = logging.getLogger('test_existing_loggers')
+        BasinSetupLogger({'log_level': 'info'})
+
+        self.assertFalse(log.disabled)
+        self.assertTrue(other.disabled)
@@ -0,0 +1,120 @@
+import os
+import pickle
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from rasterio.transform import from_origin
+
+from basin_setup.utils import shared_grid
+from basin_setup.utils.shared_grid import SharedGrid
+
+
+def fill_row(grid, row):
+    grid.array[row] = row
+    return grid.array.sum()
+
+
+class SharedGridTests():
+
+    TRANSFORM = from_origin(319570.0, 4167087.0, 150, 150)
+
+    def create(self, shape=(4, 5), dtype=np.float32):
+        return SharedGrid.create(
+            shape,
+            dtype,
+            backend=self.BACKEND,
+            transform=self.TRANSFORM,
+            crs='EPSG:32611',
+            nodata=-9999
+        )
+
+    def test_create(self):
+        with self.create() as grid:
+            self.assertEqual(grid.array.shape, (4, 5))
+            self.assertEqual(grid.array.dtype, np.float32)
+            self.assertTrue(np.all(grid.array == 0))
+
+    def test_pickle(self):
+        with self.create() as grid:
+            state = pickle.dumps(grid)
+
+            # only the metadata is pickled
+            self.assertLess(len(state), grid.array.nbytes + 1000)
+
+            attached = pickle.loads(state)
+            self.assertEqual(attached.transform, self.TRANSFORM)
+            self.assertEqual(attached.crs, 'EPSG:32611')
+            self.assertEqual(attached.nodata, -9999)
+
+            # same buffer
+            attached.array[1, 2] = 5
+            self.assertEqual(grid.array[1, 2], 5)
+            attached.close()
+
+    def test_workers(self):
+        with self.create(shape=(4, 1000)) as grid:
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                list(executor.map(fill_row, [grid] * 4, range(4)))
+
+            np.testing.assert_array_equal(
+                grid.array,
+                np.repeat(np.arange(4), 1000).reshape(4, 1000)
+            )
+
+    def test_from_array(self):
+        values = np.arange(20, dtype=np.int16).reshape(4, 5)
+        with SharedGrid.from_array(values, backend=self.BACKEND) as grid:
+            np.testing.assert_array_equal(grid.array, values)
+            self.assertEqual(grid.array.dtype, np.int16)
+
+    def test_unlink(self):
+        grid = self.create()
+        name = grid.name
+        grid.close()
+        grid.unlink()
+
+        with self.assertRaises(FileNotFoundError):
+            SharedGrid(name, (4, 5), np.float32, backend=self.BACKEND)
+
+    def test_backend(self):
+        with self.assertRaises(ValueError):
+            SharedGrid.create((4, 5), np.float32, backend='pickle')
+
+
+@unittest.skipIf(shared_grid.shared_memory is None,
+                 'multiprocessing.shared_memory needs python 3.8')
+class TestSharedGrid(SharedGridTests, unittest.TestCase):
+
+    BACKEND = 'shared_memory'
+
+    def test_detach(self):
+        with self.create() as grid:
+            with self.assertRaises(ValueError):
+                grid.detach()
+
+
+class TestSharedGridMemmap(SharedGridTests, unittest.TestCase):
+
+    BACKEND = 'memmap'
+
+    def test_file(self):
+        with self.create() as grid:
+            self.assertTrue(os.path.isfile(grid.name))
+            self.assertEqual(os.path.getsize(grid.name), 4 * 5 * 4)
+
+    def test_detach(self):
+        grid = self.create(shape=(2, 4, 1000))
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            list(executor.map(fill_row, [grid] * 2, range(2)))
+
+        array = grid.detach()
+
+        # the file is freed and the values are still there
+        self.assertFalse(os.path.exists(grid.name))
+        self.assertIsNone(grid.array)
+        np.testing.assert_array_equal(array[1], np.ones((4, 1000)))
+
+        layers = list(np.asarray(array))
+        del array
+        self.assertEqual(layers[1].sum(), 4000)
@@ -0,0 +1,143 @@
+import json
+import os
+from unittest.mock import patch
+
+import numpy as np
+import rasterio
+from inicheck.tools import cast_all_variables, check_config
+from rasterio.transform import from_origin
+
+from basin_setup.utils.tile_index import TileIndex, source_files
+from tests.Lakes.lakes_test_case import BasinSetupLakes
+
+
+class TestTileIndex(BasinSetupLakes):
+
+    # 2 x 2 tiles of 10 km
+    TILE_SIZE = 10000
+    ORIGIN = (310000, 4180000)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.tile_dir = os.path.join(cls.output_dir, 'dem_tiles')
+        os.makedirs(cls.tile_dir)
+
+        for row in range(2):
+            for col in range(2):
+                cls.write_tile(row, col)
+
+        # not a raster, ignored for a directory
+        with open(os.path.join(cls.tile_dir, 'README.txt'), 'w') as f:
+            f.write('DEM tiles')
+
+    @classmethod
+    def write_tile(cls, row, col, value=1):
+        transform = from_origin(
+            cls.ORIGIN[0] + col * cls.TILE_SIZE,
+            cls.ORIGIN[1] - row * cls.TILE_SIZE,
+            100,
+            100
+        )
+        file_name = os.path.join(
+            cls.tile_dir, 'dem_{}_{}.tif'.format(row, col))
+
+        with rasterio.open(
+                file_name, 'w', driver='GTiff', height=100, width=100,
+                count=1, dtype='float32', crs='EPSG:32611',
+                transform=transform) as dst:
+            dst.write(np.full((100, 100), value, dtype=np.float32), 1)
+
+        return file_name
+
+    def tile(self, row, col):
+        return os.path.join(self.tile_dir, 'dem_{}_{}.tif'.format(row, col))
+
+    def test_source_files(self):
+        self.assertEqual(len(source_files(self.tile_dir)), 4)
+        self.assertListEqual(
+            source_files(os.path.join(self.tile_dir, 'dem_0_*.tif')),
+            [self.tile(0, 0), self.tile(0, 1)]
+        )
+        self.assertListEqual(source_files(self.tile(1, 1)), [self.tile(1, 1)])
+
+    def test_intersecting(self):
+        index = TileIndex(self.tile_dir)
+
+        # upper left tile only
+        self.assertListEqual(
+            index.intersecting([312000, 4172000, 318000, 4178000],
+                               'EPSG:32611'),
+            [self.tile(0, 0)]
+        )
+
+        # across the bottom two tiles
+        self.assertListEqual(
+            index.intersecting([315000, 4162000, 325000, 4165000],
+                               'EPSG:32611'),
+            [self.tile(1, 0), self.tile(1, 1)]
+        )
+
+        # extents in another projection
+        self.assertListEqual(
+            index.intersecting([-119.01, 37.60, -118.96, 37.63],
+                               'EPSG:4326'),
+            [self.tile(1, 1)]
+        )
+
+        with self.assertRaises(ValueError):
+            index.intersecting([0, 0, 1000, 1000], 'EPSG:32611')
+
+    def test_sidecar(self):
+        TileIndex(self.tile_dir)
+
+        index_file = os.path.join(self.tile_dir, TileIndex.INDEX_FILE)
+        with open(index_file) as f:
+            index = json.load(f)
+
+        self.assertCountEqual(
+            list(index.keys()),
+            ['dem_{}_{}.tif'.format(r, c) for r in range(2) for c in range(2)]
+        )
+        self.assertListEqual(
+            index['dem_0_1.tif']['bounds'],
+            [320000.0, 4170000.0, 330000.0, 4180000.0]
+        )
+
+        # the tiles are not opened again once indexed
+        with patch('basin_setup.utils.tile_index.rasterio.open') as mock_open:
+            TileIndex(self.tile_dir)
+            mock_open.assert_not_called()
+
+    def test_changed_tile(self):
+        TileIndex(self.tile_dir)
+
+        file_name = self.write_tile(1, 0, value=2)
+        stat = os.stat(file_name)
+        os.utime(file_name, (stat.st_atime, stat.st_mtime + 10))
+
+        with patch('basin_setup.utils.tile_index.rasterio.open',
+                   wraps=rasterio.open) as mock_open:
+            TileIndex(self.tile_dir)
+            mock_open.assert_called_once_with(file_name)
+
+    def test_config(self):
+        for dem_file in [self.tile_dir,
+                         os.path.join(self.tile_dir, '*.tif')]:
+            config = self.base_config_copy()
+            config.raw_cfg['generate_topo']['dem_file'] = dem_file
+            config.apply_recipes()
+            config = cast_all_variables(config, config.mcfg)
+
+            _, errors = check_config(config)
+            self.assertListEqual(errors, [])
+
+        config = self.base_config_copy()
+        config.raw_cfg['generate_topo']['dem_file'] = os.path.join(
+            self.tile_dir, '*.nc')
+        config.apply_recipes()
+        config = cast_all_variables(config, config.mcfg)
+
+        _, errors = check_config(config)
+        self.assertEqual(len(errors), 1)
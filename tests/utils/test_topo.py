@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from basin_setup.utils.topo import SubbasinMasks
+
+
+class TestSubbasinMasks(unittest.TestCase):
+
+    def setUp(self):
+        self.ds = xr.Dataset(
+            {
+                'subbasin_id': (('subbasin_layer', 'y', 'x'), np.array(
+                    [[[0, 1, 1], [2, 2, 1]],
+                     [[3, 3, 3], [3, 3, 0]]], dtype=np.uint16)),
+                'subbasin_name': ('subbasin', np.array(
+                    ['Upper', 'Lower', 'Outlet'], dtype=object)),
+                'subbasin_layer_index': ('subbasin', np.array(
+                    [0, 0, 1], dtype=np.uint16)),
+            },
+            coords={'subbasin': [1, 2, 3], 'y': [1, 0], 'x': [0, 1, 2]}
+        )
+        self.subject = SubbasinMasks(self.ds)
+
+    def test_names(self):
+        self.assertListEqual(
+            list(self.subject), ['Upper', 'Lower', 'Outlet'])
+        self.assertTrue(len(self.subject) == 3)
+
+    def test_mask(self):
+        mask = self.subject['Lower']
+        self.assertIsInstance(mask, xr.DataArray)
+        np.testing.assert_array_equal(
+            mask.values, [[False, False, False], [True, True, False]])
+        self.assertEqual(mask.attrs['long_name'], 'Lower')
+
+    def test_nested_mask(self):
+        # the outlet overlaps both the upper and lower sub basins
+        mask = self.subject['Outlet']
+        np.testing.assert_array_equal(
+            mask.values, [[True, True, True], [True, True, False]])
+
+    def test_missing(self):
+        with self.assertRaises(KeyError):
+            self.subject['Middle']
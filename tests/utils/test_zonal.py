@@ -0,0 +1,110 @@
+import unittest
+
+import numpy as np
+
+from basin_setup.utils.zonal import hypsometry, zonal_stats
+
+
+class TestZonalStats(unittest.TestCase):
+
+    def setUp(self):
+        self.labels = np.array([
+            [-1, 0, 0, 2],
+            [-1, 0, 2, 2],
+            [5, 5, 2, 9],
+        ])
+        self.values = np.array([
+            [1.0, 2.0, 4.0, 10.0],
+            [1.0, 6.0, 20.0, 30.0],
+            [7.0, np.nan, 40.0, 3.0],
+        ])
+
+    def test_counts(self):
+        df = zonal_stats(self.labels, nodata=9, cell_area=4)
+
+        self.assertListEqual(list(df.index), [0, 2, 5])
+        self.assertListEqual(list(df['cells']), [3, 4, 2])
+        self.assertListEqual(list(df['area']), [12, 16, 8])
+
+    def test_values(self):
+        df = zonal_stats(self.labels, self.values)
+
+        self.assertListEqual(list(df.index), [0, 2, 5, 9])
+
+        # the NaN cell is counted but not in the statistics
+        self.assertListEqual(list(df['cells']), [3, 4, 2, 1])
+        np.testing.assert_allclose(df['mean'], [4, 25, 7, 3])
+        np.testing.assert_array_equal(df['min'], [2, 10, 7, 3])
+        np.testing.assert_array_equal(df['max'], [6, 40, 7, 3])
+
+    def test_reference(self):
+        rng = np.random.default_rng(0)
+        labels = rng.integers(0, 50, (100, 120))
+        values = rng.random((100, 120))
+
+        df = zonal_stats(labels, values)
+
+        for label in [0, 17, 49]:
+            zone = values[labels == label]
+            self.assertEqual(df.loc[label, 'cells'], zone.size)
+            self.assertAlmostEqual(df.loc[label, 'mean'], zone.mean())
+            self.assertEqual(df.loc[label, 'min'], zone.min())
+            self.assertEqual(df.loc[label, 'max'], zone.max())
+
+    def test_all_nan(self):
+        df = zonal_stats([[1, 2]], [[np.nan, 3]])
+
+        self.assertListEqual(list(df['cells']), [1, 1])
+        self.assertTrue(np.isnan(df.loc[1, 'mean']))
+        self.assertTrue(np.isnan(df.loc[1, 'max']))
+        self.assertEqual(df.loc[2, 'min'], 3)
+
+    def test_empty(self):
+        df = zonal_stats(np.full((2, 2), -1), np.ones((2, 2)))
+        self.assertTrue(df.empty)
+        self.assertIn('max', df.columns)
+
+
+class TestHypsometry(unittest.TestCase):
+
+    def test_fractions(self):
+        labels = np.array([
+            [0, 0, 1, 1],
+            [0, 0, 1, -1],
+        ])
+        values = np.array([
+            [1.0, 12.0, 25.0, 5.0],
+            [15.0, np.nan, 28.0, 40.0],
+        ])
+
+        df = hypsometry(labels, values, 10)
+
+        self.assertListEqual(list(df.index), [0, 1])
+        self.assertListEqual(list(df.columns), [0, 10, 20])
+        np.testing.assert_allclose(df.values, [
+            [1 / 3, 2 / 3, 0],
+            [1 / 3, 0, 2 / 3],
+        ])
+
+    def test_origin(self):
+        df = hypsometry([[3, 3, 0]], [[105.0, 120.0, 300.0]], 50,
+                        origin=100, nodata=0)
+
+        self.assertListEqual(list(df.index), [3])
+        self.assertListEqual(list(df.columns), [100])
+        np.testing.assert_allclose(df.values, [[1]])
+
+        with self.assertRaises(ValueError):
+            hypsometry([[3, 3]], [[105.0, 20.0]], 50, origin=100)
+
+    def test_reference(self):
+        rng = np.random.default_rng(0)
+        labels = rng.integers(0, 20, (100, 120))
+        values = rng.random((100, 120)) * 1000
+
+        df = hypsometry(labels, values, 100, origin=0)
+
+        for label in [0, 7, 19]:
+            zone = values[labels == label]
+            expected = np.histogram(zone, bins=np.arange(0, 1001, 100))[0]
+            np.testing.assert_allclose(df.loc[label], expected / zone.size)